@@ -15,7 +15,9 @@ tool in the "GEM2_Oil_Seep_Detection_Analysis" Python Toolbox.
 SUMMARY
 Applies chlorophyll_a values from the MODIS chlorophyll_a data, downloaded with
 the "1a_Download Chlorophyll_a NetCDF Files" script tool, to the dark targets
-feature classes in the Yearly Data geodatabases. The value is a measure of the
+feature classes in the Yearly Data geodatabases. The values are read from the
+regional chlorophyll_a store (see "chloroStore.py"), which is created from the
+NetCDF files when it does not already exist. The value is a measure of the
 concentration of chlorophyll_a in mg/m-3. The analysis is performed over a range of
 days input by user to assess chlorophyll_a over dark targets over a greater period of
 time.
@@ -26,15 +28,30 @@ produced by "1_Condition Yearly Dark Targets Data". The script will iterate thro
 the geodatabases and apply the chlorophyll_a values for that acquisition day to
 the dark targets.
 
-- Neighbourhood Cell Size (default user input): Integer parameter indicating the
-size of the neighbourhood window to be used in the focal statistics calculation
-to determine the mean pixel value within the neighbourhood window.
+- Neighbourhood Cell Size (default user input): List of integers indicating the
+sizes of the neighbourhood windows to be used in the focal statistics calculation
+to determine the mean pixel value within each neighbourhood window. Every size
+is computed from the same summed-area table for each day, so requesting several
+sizes costs a single pass through the chlorophyll_a files.
 
 - Chlorophyll Day Range Size From Date of Acquisition (user input): Integer parameter
 indicating the range of days +/- from the date of acquistion of the dark features
 feature class. Range of days must be equal or lesser than the range of days input in
 the 1a_Download Chlorophyll_a NetCDF Files step.
 
+- Calculate Polygon Mean Chlorophyll_a (optional user input): Boolean parameter
+indicating whether the mean chlorophyll_a value over the footprint of each dark
+target polygon is also calculated (zonal mode), in addition to the neighbourhood
+values. The polygons of a feature class are rasterized once onto the MODIS grid.
+
+- Number of Worker Processes (optional user input): Integer parameter capping the
+number of worker processes used to apply the values. With more than 1 worker, the
+yearly GDBs are processed in parallel, each GDB by a single worker (the workers
+add fields to and update the feature classes of their GDB, so the feature classes
+of a GDB are never shared between workers, whose schema locks would conflict).
+Each worker writes its own log file, merged into "chloro.log" once processing is
+done.
+
 OUTPUT
 - "chlor_a" and "chlor_5x5" Attribute Fields (automated output): Attribute fields
 that are joined to the acquisition day feature classes found within the various
@@ -42,15 +59,37 @@ dark targets yearly geodatabases. The "chlor_a" attribute field contains the
 extracted raster value of the chlorophyll at the location of the dark target's
 centroid. The "chlor_5x5_" attribute field contains the extracted raster value of
 the mean of the pixel value within the specified neighbourhood window. ('5x5' in
-this case)
+this case) One such field is created for each requested neighbourhood cell size.
+The value of each size is taken from the closest day for which that size has a
+valid mean, as if the tool were run once per size. The "chloro_dayRange" field
+holds the day offset of the smallest neighbourhood size of the feature class, and
+is rewritten when a smaller size is added to a feature class that has some.
+Values from every day in the range are held in memory and written to the feature
+class in a single pass once all days have been processed.
+
+- "chlor_a_zonal" and "chloro_zonal_dayRange" Attribute Fields (automated output,
+zonal mode only): Mean chlorophyll_a value of the grid cells whose centre lies
+inside the dark target polygon (or of the centroid cell for targets smaller than
+a cell), and the offset of the day from which the value was taken.
 
 ADDITIONAL FUNCTIONS (explained in script below)
+- processGDB
+- processFeatureClass
+- prepareFeatureClass
+- applyDay
+- writeValues
+- rankOffsets
+- executeParallel
 - yearDay
-- adapted from ESRI's Join_Field.py functions
-    - joindataGen
-    - percentile
-    - join_field
-- cleanWorkspace"""
+- targetCentroids
+- targetCells
+- summedAreaTable
+- focalMeans
+- targetEdges
+- rasterizeTargets
+- zonalMeans
+- dayDisplay
+- runWorkerTask (module level, parallel mode)"""
 
 # Libraries
 # =========
@@ -59,6 +98,51 @@ import os
 import sys
 import datetime
 import logging
+import traceback
+import multiprocessing
+import numpy
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import chloroStore                          # get module reference for reload
+reload(chloroStore)                         # reload step 1
+import workerLog                            # get module reference for reload
+reload(workerLog)                           # reload step 1
+
+
+class targetValues(object):
+    """
+    Chlorophyll_a values retained for the dark targets of a feature class. The values of
+    each day are retained for the dark targets without a value from a closer day (rank of
+    the day in yDay, kept for each neighbourhood size) and held in memory until written to
+    the feature class.
+    """
+    def __init__(self, fc, fldNames, newSizes, needZonal, yDay, oidList, centroids):
+        self.fc = fc
+        self.fldNames = fldNames
+        self.newSizes = newSizes
+        self.needZonal = needZonal
+        self.yDay = yDay
+        self.oidList = oidList
+        self.oidIndex = dict((oid, i) for i, oid in enumerate(oidList))
+        self.centroids = centroids
+        self.foundDays = set()
+        self.chlorValues = None
+        self.chlorRank = len(yDay)
+        self.focalRanks = []
+        self.focalResults = []
+        for size in newSizes:
+            focalRanks = numpy.empty(len(oidList))
+            focalRanks.fill(numpy.inf)
+            self.focalRanks.append(focalRanks)
+            focalValues = numpy.empty(len(oidList))
+            focalValues.fill(numpy.nan)
+            self.focalResults.append(focalValues)
+        self.zonalRanks = numpy.empty(len(oidList))
+        self.zonalRanks.fill(numpy.inf)
+        self.zonalResults = numpy.empty(len(oidList))
+        self.zonalResults.fill(numpy.nan)
+        self.zonalCells = None
+        self.zonalLabels = None
 
 
 class applyChloro(object):
@@ -83,9 +167,10 @@ class applyChloro(object):
             name="cell_size",
             datatype="GPLong",
             parameterType="Required",
-            direction="Input")
+            direction="Input",
+            multiValue=True)
 
-        params1.value = 5
+        params1.values = [5]
 
         params2 = arcpy.Parameter(
             displayName="Input: Chlorophyll Day Range Size From Date of Acquisition",
@@ -94,18 +179,30 @@ class applyChloro(object):
             parameterType="Required",
             direction="Input")
 
-        params = [params0, params1, params2]
+        params3 = arcpy.Parameter(
+            displayName="Input: Calculate Polygon Mean Chlorophyll_a (zonal)",
+            name="zonal_mode",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        params3.value = False
+
+        params4 = arcpy.Parameter(
+            displayName="Input: Number of Worker Processes (parallel mode)",
+            name="worker_count",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params4.value = 1
+
+        params = [params0, params1, params2, params3, params4]
 
         return params
 
     def isLicensed(self):
-        """Set whether tool is licensed to execute. This script requires Spatial Analyst extension to function."""
-        try:
-            if arcpy.CheckExtension("Spatial") != "Available":
-                raise Exception
-        except Exception:
-            return False
-
+        """Set whether tool is licensed to execute."""
         return True
 
     def updateParameters(self, parameters):
@@ -130,157 +227,343 @@ class applyChloro(object):
         arcpy.AddMessage("\nApplying available chlorophyll_a values to dark targets...")
         logging.info("Starting applyChloro.py script...")
 
-        arcpy.CheckOutExtension("Spatial")
-        logging.info("Check Out Extension: Spatial Analyst extension checked out\n")
-
         # Define variables from parameters
         working_folder = parameters[0].valueAsText
         chloro_folder = os.path.join(os.path.dirname(working_folder), "Auxiliary", "Chlorophyll")
         if not os.path.exists(chloro_folder):
             os.makedirs(chloro_folder)
-        cell_size = parameters[1].value
-
-        focal_field = "chlor_a_" + str(cell_size) + "x" + str(cell_size)
+        # Neighbourhood sizes sorted smallest first: a larger window always contains the smaller one,
+        # so the smallest size decides which day is retained for every focal field
+        cellSizes = sorted(set([int(size) for size in parameters[1].valueAsText.split(";")]))
 
         dayRange = parameters[2].value
 
+        zonalMode = parameters[3].value == True
+
+        workerCount = parameters[4].value
+        if workerCount is None:
+            workerCount = 1
 
         # Determine list of yearly GDBs in workspace
         arcpy.env.workspace = working_folder
         gdbList = arcpy.ListWorkspaces("*", "FileGDB")
         arcpy.AddMessage("Workspace contains the following " + str(len(gdbList)) + " GDBs: " + str(gdbList))
 
-        # Iterate through yearly GDBs
-        for gdb in gdbList:
-            arcpy.AddMessage("\nProcessing " + str(gdb))
-            logging.info("Processing '%s' geodatabase\n", gdb)
-            gdbDesc = arcpy.Describe(gdb)
-            gdbYear = gdbDesc.baseName
-
-            # Determine list of .nc files in corresponding yearly chlorophyll folder
-            chloro_year = os.path.join(chloro_folder, gdbYear)
-            arcpy.env.workspace = chloro_year
-            ncList = arcpy.ListFiles('*.nc')
-
-            # Determine list of feature classes in current GDB
-            arcpy.env.workspace = gdb
-            fcList = arcpy.ListFeatureClasses()
-            arcpy.AddMessage("\nGDB contains the following " + str(len(fcList)) + " feature classes: " + str(fcList))
-
-            # Iterate through feature classes in GDB
-            for fc in fcList:
-
-                # Check if chlorophyll_a has already been added to current feature class
-                arcpy.AddMessage("\nVerifying " + fc + "...")
-                logging.info("Processing '%s' feature class", fc)
-                fldList = arcpy.ListFields(fc)
-                fldNames = []
-                for fld in fldList:
-                    fldNames.append(fld.name)
-
-                # If no chlorophyll_a data already in feature class, proceed with applying values
-                if not focal_field in fldNames:
-
-                    dayCounter = 0
-
-                    # Create points feature class from current feature class to extract chlorophyll raster values
-                    arcpy.AddMessage("Creating points feature class...")
-                    targetLyr = "targetLyr"
-                    arcpy.MakeFeatureLayer_management(fc, targetLyr)
-                    logging.info("Make Feature Layer: '%s' layer created from '%s' feature class", targetLyr, fc)
-                    pointFC = fc + "_point"
-                    arcpy.FeatureToPoint_management(targetLyr, pointFC, "CENTROID")
-                    logging.info("Feature To Point: '%s' points feature class created from centroid of features in '%s' layer", pointFC, targetLyr)
-
-                    # Determine year and day of year to load appropriate .nc file as raster
-                    yDay = self.yearDay(fc.split("_")[1], dayRange)
-
-
-                    arcpy.AddMessage('\nProcessing chlorophyll for the following days: {} ...'.format(yDay))
-                    # Iterate through list of year's .nc files to find corresponding file to current feature class
-                    for day in yDay:
-                        chloro_file = "A" + day
-                        arcpy.AddMessage('\nProcessing {}'.format(chloro_file) + ' chlorophyll file')
-                        for ncFile in ncList:
-                            # Check for .nc file and feature class match
-                               if ncFile.startswith(chloro_file):
-
-                                    # Make NetCDF raster layer from .nc file
-                                    arcpy.AddMessage("Preparing chlorophyll_a raster layer...")
-                                    ncFilePath = os.path.join(chloro_year, ncFile)
-                                    chlor_a = "chlor_a"
-                                    arcpy.MakeNetCDFRasterLayer_md(ncFilePath, 'chlor_a', "lon", "lat", chloro_file)
-                                    logging.info("Make NetCDF Raster Layer: '%s' raster layer created from '%s'", chloro_file, ncFilePath)
-
-                                    # Apply extent to raster layer (to limit processing to pertinent region)
-                                    chloro_extent = arcpy.Extent(-160.0, 40.0, -40.0, 89.989002)
-                                    chloro_rectExtract = arcpy.sa.ExtractByRectangle(chloro_file, chloro_extent, "INSIDE")
-                                    logging.info("Extract By Rectangle: Extent (-160 (W), 40 (S), -40 (E), 89.989002 (N)) applied to '%s'", chloro_file)
-
-                                    # Calculate focal statistics (mean value of focal window)
-                                    arcpy.AddMessage("Calculating focal statistics...")
-                                    neighborhood = arcpy.sa.NbrRectangle(cell_size, cell_size, "CELL")
-                                    chloro_focal = arcpy.sa.FocalStatistics(chloro_rectExtract, neighborhood, "MEAN", "DATA")
-                                    logging.info("Focal Statistics: '%s' raster created by calculating mean value of '%s'x'%s' neighbourhood calculated for cells from '%s'", chloro_focal, str(cell_size), str(cell_size), chloro_file)
-
-                                    if not chlor_a in fldNames:
-                                        # Extract point values from raster
-                                        arcpy.AddMessage("Extracting raster chlorophyll_a values to points...")
-                                        extractFC = fc + "_extract"
-                                        arcpy.sa.ExtractValuesToPoints(pointFC, chloro_rectExtract, extractFC)
-                                        arcpy.AlterField_management(extractFC, "RASTERVALU", chlor_a)
-                                        logging.info("Extract Values to Points: '%s' feature class created with point values calculated from '%s' raster layer with '%s' feature class", extractFC, chloro_file, pointFC)
-
-                                    # Extract focal values from raster
-                                    arcpy.AddMessage("Extracting raster chlorophyll_a mean values to points...")
-                                    finalExtractFC = fc + "_final_extract" + str(dayCounter)
-                                    arcpy.sa.ExtractValuesToPoints(extractFC, chloro_focal, finalExtractFC)
-                                    focal_field_Day = "chlor_a_" + str(cell_size) + "x" + str(cell_size) + '_' + str(day)
-                                    arcpy.AlterField_management(finalExtractFC, "RASTERVALU", focal_field_Day)
-                                    logging.info("Extract Values to Points: '%s' feature class created with point values calculated from '%s' raster layer with '%s' feature class", finalExtractFC, chloro_focal, extractFC)
-
-                                    # Join point and focal values to feature class
-                                    arcpy.AddMessage("Joining values to feature class...")
-                                    self.join_field(fc, "OBJECTID", finalExtractFC, "ORIG_FID", "chlor_a;" + focal_field_Day)
-                                    logging.info("Join Field: chlor_a and chlor_a focal values joined to '%s' feature class from '%s' table", fc, finalExtractFC)
-
-                                    # add field with day difference in range
-                                    arcpy.AddField_management(fc,"chloro_dayRange","DOUBLE")
-                                    arcpy.AddField_management(fc,'chlor_a_{0}x{0}'.format(cell_size),"DOUBLE")
-                                    arcpy.AddMessage('Added field')
-
-                                    with arcpy.da.UpdateCursor(fc, [focal_field_Day, 'chloro_dayRange',focal_field]) as cursor:
-                                         for row in cursor:
-                                             if row[0] != -9999 and row[1] == None:
-                                                row[1] = self.dayDisplay(dayCounter)
-                                                row[2] = row[0]
-                                                cursor.updateRow(row)
-                                    if dayCounter != 0:
-                                        arcpy.DeleteField_management(fc,chlor_a)
-                                    arcpy.DeleteField_management(fc,focal_field_Day)
-                                    dayCounter += 1
-                                    break
-
-                                    # Break iteration through .nc files once processing with corresponding .nc file and feature class is complete
-
-
-                # If chlorophyll_a values found in feature class, no further processing required for current feature class
-                else:
-                    arcpy.AddMessage("Chlorophyll_a values already applied to feature class. Continuing...")
-                    logging.info("Values already applied")
-
-
-                logging.info("Processing for '%s' feature class complete\n", fc)
-
-            # Delete extra feature classes used during geoprocessing
-            self.cleanWorkspace(gdb)
-
-        arcpy.CheckInExtension("Spatial")
-        logging.info("Check In Extension: Spatial Analyst extension checked back in")
+        # Process yearly GDBs in worker processes (parallel mode) or one after another
+        if workerCount > 1:
+            self.executeParallel(gdbList, workerCount, logPath, chloro_folder, cellSizes, dayRange, zonalMode)
+        else:
+            for gdb in gdbList:
+                self.processGDB(gdb, chloro_folder, cellSizes, dayRange, zonalMode)
+
         logging.info("applyChloro.py script finished\n\n")
 
         return
 
+    def processGDB(self, gdb, chloro_folder, cellSizes, dayRange, zonalMode):
+        """Apply chlorophyll_a values to the feature classes of a yearly GDB.
+
+        Parameters:
+            gdb = Yearly dark targets GDB to process.
+            chloro_folder = Local "Chlorophyll" folder containing the year folders of chlorophyll_a files.
+            cellSizes = List of neighbourhood cell sizes, smallest first.
+            dayRange = Range of days +/- from the date of acquisition.
+            zonalMode = Boolean indicating whether the polygon mean (zonal) values are also calculated.
+
+        Return:
+            Returns the list of feature classes processed."""
+        arcpy.AddMessage("\nProcessing " + str(gdb))
+        logging.info("Processing '%s' geodatabase\n", gdb)
+        gdbDesc = arcpy.Describe(gdb)
+        gdbYear = gdbDesc.baseName
+
+        # MODIS chlorophyll_a rasters are in geographic coordinates (WGS 1984)
+        chloroSR = arcpy.SpatialReference(4326)
+
+        # Ingest the .nc files of the corresponding yearly chlorophyll folder, then list the available files (file or regional store)
+        chloro_year = os.path.join(chloro_folder, gdbYear)
+        if os.path.isdir(chloro_year):
+            chloroStore.ingestFolder(chloro_year)
+        ncList = chloroStore.listSources(chloro_year)
+
+        # Determine list of feature classes in current GDB
+        arcpy.env.workspace = gdb
+        fcList = arcpy.ListFeatureClasses()
+        arcpy.AddMessage("\nGDB contains the following " + str(len(fcList)) + " feature classes: " + str(fcList))
+
+        # Iterate through feature classes in GDB
+        for fc in fcList:
+            self.processFeatureClass(fc, chloro_year, ncList, cellSizes, dayRange, zonalMode, chloroSR)
+
+        return fcList
+
+    def processFeatureClass(self, fc, chloro_year, ncList, cellSizes, dayRange, zonalMode, chloroSR):
+        """Apply chlorophyll_a values of every available day in the range to the dark targets of a feature class.
+
+        Parameters:
+            fc = Dark targets feature class (in the current workspace) to process.
+            chloro_year = Chlorophyll_a year folder corresponding to the GDB of the feature class.
+            ncList = List of chlorophyll_a .nc files available in the year folder (file or regional store).
+            cellSizes = List of neighbourhood cell sizes, smallest first.
+            dayRange = Range of days +/- from the date of acquisition.
+            zonalMode = Boolean indicating whether the polygon mean (zonal) values are also calculated.
+            chloroSR = Spatial reference of the chlorophyll_a rasters.
+
+        Return:
+            No return"""
+        targetValues = self.prepareFeatureClass(fc, cellSizes, dayRange, zonalMode, chloroSR)
+
+        # If chlorophyll_a data not already in feature class for a requested size, proceed with applying values
+        if targetValues is not None:
+            arcpy.AddMessage('\nProcessing chlorophyll for the following days: {} ...'.format(targetValues.yDay))
+            # Iterate through list of year's .nc files to find corresponding file to current feature class
+            for dayIndex in range(len(targetValues.yDay)):
+                chloro_file = "A" + targetValues.yDay[dayIndex]
+                arcpy.AddMessage('\nProcessing {}'.format(chloro_file) + ' chlorophyll file')
+                for ncFile in ncList:
+                    # Check for .nc file and feature class match
+                    if ncFile.startswith(chloro_file):
+
+                        # Load regional chlorophyll_a values from the store (ingesting the .nc file first if required)
+                        arcpy.AddMessage("Preparing chlorophyll_a regional grid...")
+                        ncFilePath = os.path.join(chloro_year, ncFile)
+                        chloroGrid = chloroStore.loadGrid(ncFilePath)
+                        logging.info("Load Grid: regional chlorophyll_a values of '%s' loaded from store", ncFilePath)
+                        self.applyDay(targetValues, dayIndex, chloroGrid, chloroSR)
+                        chloroGrid.close()
+
+                        # Break iteration through .nc files once processing with corresponding .nc file and feature class is complete
+                        break
+
+            # Write values retained from every day to the feature class in a single pass
+            self.writeValues(targetValues)
+
+        logging.info("Processing for '%s' feature class complete\n", fc)
+
+        return
+
+    def prepareFeatureClass(self, fc, cellSizes, dayRange, zonalMode, chloroSR):
+        """Determine the chlorophyll_a fields still required by a feature class and read its dark target centroids.
+
+        Parameters:
+            fc = Dark targets feature class (in the current workspace, or full path) to process.
+            cellSizes = List of neighbourhood cell sizes, smallest first.
+            dayRange = Range of days +/- from the date of acquisition.
+            zonalMode = Boolean indicating whether the polygon mean (zonal) values are also calculated.
+            chloroSR = Spatial reference of the chlorophyll_a rasters.
+
+        Return:
+            Returns a targetValues object in which the values of each day are retained, or None if every value is already applied."""
+        # Check if chlorophyll_a has already been added to current feature class
+        arcpy.AddMessage("\nVerifying " + fc + "...")
+        logging.info("Processing '%s' feature class", fc)
+        fldList = arcpy.ListFields(fc)
+        fldNames = []
+        for fld in fldList:
+            fldNames.append(fld.name)
+
+        # Determine neighbourhood sizes (and zonal mean) not yet applied to current feature class
+        newSizes = [size for size in cellSizes if "chlor_a_{0}x{0}".format(size) not in fldNames]
+        needZonal = zonalMode and "chlor_a_zonal" not in fldNames
+
+        # If chlorophyll_a values found in feature class, no further processing required for current feature class
+        if len(newSizes) == 0 and not needZonal:
+            arcpy.AddMessage("Chlorophyll_a values already applied to feature class. Continuing...")
+            logging.info("Values already applied")
+            return None
+
+        # Read centroids of the dark targets in the chlorophyll_a coordinate system (read once for every day)
+        arcpy.AddMessage("Reading dark target centroids...")
+        oidList, centroids = self.targetCentroids(fc, chloroSR)
+        logging.info("Search Cursor: centroids of %d dark targets read from '%s' feature class", len(oidList), fc)
+
+        # Determine year and day of year of the .nc files to apply, closest day to the acquisition first
+        yDay = self.yearDay(os.path.basename(fc).split("_")[1], dayRange)
+
+        return targetValues(fc, fldNames, newSizes, needZonal, yDay, oidList, centroids)
+
+    def applyDay(self, values, dayIndex, chloroGrid, chloroSR):
+        """Calculate the chlorophyll_a values of a day for the dark targets of a feature class, and retain them for the dark targets
+        without a value from a closer day. Days can be applied in any order.
+
+        Parameters:
+            values = targetValues object returned by prepareFeatureClass.
+            dayIndex = Position of the day in values.yDay (0 for the acquisition day, then -1, +1, -2, ...).
+            chloroGrid = Regional chlorophyll_a grid of the day loaded from the chlorophyll_a store.
+            chloroSR = Spatial reference of the chlorophyll_a rasters.
+
+        Return:
+            No return"""
+        chloro_file = "A" + values.yDay[dayIndex]
+        chloroArray = chloroGrid.array
+        targetCount = len(values.oidList)
+        values.foundDays.add(dayIndex)
+
+        # Extract point values at the centroid cells of the dark targets
+        arcpy.AddMessage("Extracting raster chlorophyll_a values to points...")
+        rows, cols = self.targetCells(values.centroids, chloroGrid)
+        pointValues = numpy.empty(targetCount)
+        pointValues.fill(-9999.0)
+        inside = rows >= 0
+        pointValues[inside] = chloroArray[rows[inside], cols[inside]]
+        pointValues[numpy.isnan(pointValues)] = -9999.0
+        if dayIndex < values.chlorRank:
+            values.chlorValues = pointValues
+            values.chlorRank = dayIndex
+
+        if len(values.newSizes) > 0:
+            # Calculate focal statistics (mean value of focal window) for every neighbourhood size from a single summed-area table
+            arcpy.AddMessage("Calculating focal statistics...")
+            sumTable, countTable = self.summedAreaTable(chloroArray)
+            focalValues = [self.focalMeans(sumTable, countTable, rows, cols, size) for size in values.newSizes]
+            logging.info("Focal Statistics: mean values of %s neighbourhoods calculated from summed-area table of '%s'", str(["{0}x{0}".format(size) for size in values.newSizes]), chloro_file)
+
+            # Retain values of current day, for each size, for dark targets without a valid value of that size from a closer day
+            for j in range(len(values.newSizes)):
+                retain = (dayIndex < values.focalRanks[j]) & (focalValues[j] != -9999)
+                values.focalRanks[j][retain] = dayIndex
+                values.focalResults[j][retain] = focalValues[j][retain]
+                logging.info("Focal Statistics: %dx%d values of '%s' retained for %d dark targets", values.newSizes[j], values.newSizes[j], chloro_file, int(retain.sum()))
+
+        if values.needZonal:
+            # Rasterize dark target polygons onto the chlorophyll_a grid (same grid for every day, done once)
+            if values.zonalCells is None:
+                arcpy.AddMessage("Rasterizing dark target polygons...")
+                edges, edgeLabels = self.targetEdges(values.fc, chloroSR, values.oidIndex)
+                values.zonalCells, values.zonalLabels = self.rasterizeTargets(edges, edgeLabels, chloroGrid, rows, cols)
+                logging.info("Rasterize: %d grid cells labelled from polygons of '%s' feature class", len(values.zonalCells), values.fc)
+
+            # Calculate mean value over the footprint of each dark target
+            arcpy.AddMessage("Calculating zonal statistics...")
+            zonalValues = self.zonalMeans(chloroArray, values.zonalCells, values.zonalLabels, targetCount)
+            retain = (dayIndex < values.zonalRanks) & (zonalValues != -9999)
+            values.zonalRanks[retain] = dayIndex
+            values.zonalResults[retain] = zonalValues[retain]
+            logging.info("Zonal Statistics: polygon mean values of '%s' retained for %d dark targets", chloro_file, int(retain.sum()))
+
+    def writeValues(self, values):
+        """Write the values retained from every applied day to the feature class in a single pass.
+
+        Parameter:
+            values = targetValues object to which the days were applied.
+
+        Return:
+            No return"""
+        dayCount = len(values.foundDays)
+        if dayCount == 0:
+            return
+
+        # Offset of each retained day, counted over the days found (first day found 0, then -1, +1, -2, ...)
+        offsetList = numpy.empty(len(values.yDay))
+        offsetList.fill(numpy.nan)
+        for dayCounter, dayIndex in enumerate(sorted(values.foundDays)):
+            offsetList[dayIndex] = self.dayDisplay(dayCounter)
+
+        arcpy.AddMessage("\nApplying values to feature class...")
+        # Fields to write, with their values and whether an existing value is kept (day range of a previous run)
+        writeList = []
+        # Centroid value is only retained when a single day is available
+        if dayCount == 1 and len(values.newSizes) > 0:
+            writeList.append(("chlor_a", values.chlorValues, False))
+        if len(values.newSizes) > 0:
+            # Day range of the smallest neighbourhood size of the feature class (rewritten if the smallest size is a new one)
+            existingSizes = [int(name[8:].split("x")[0]) for name in values.fldNames
+                             if name.startswith("chlor_a_") and name[8:].split("x")[0].isdigit()]
+            rangeSize = min(existingSizes + values.newSizes)
+            if rangeSize in values.newSizes:
+                rangeRanks = values.focalRanks[values.newSizes.index(rangeSize)]
+                writeList.append(("chloro_dayRange", self.rankOffsets(rangeRanks, offsetList), False))
+            for j in range(len(values.newSizes)):
+                writeList.append(("chlor_a_{0}x{0}".format(values.newSizes[j]), values.focalResults[j], False))
+        if values.needZonal:
+            writeList.append(("chlor_a_zonal", values.zonalResults, False))
+            writeList.append(("chloro_zonal_dayRange", self.rankOffsets(values.zonalRanks, offsetList), True))
+        writeFields = [write[0] for write in writeList]
+        for field in writeFields:
+            if field not in values.fldNames:
+                arcpy.AddField_management(values.fc, field, "DOUBLE")
+        logging.info("Add Field: '%s' fields added to '%s' feature class", str(writeFields), values.fc)
+
+        with arcpy.da.UpdateCursor(values.fc, ["OID@"] + writeFields) as cursor:
+            for row in cursor:
+                i = values.oidIndex[row[0]]
+                for k in range(len(writeList)):
+                    value = writeList[k][1][i]
+                    if writeList[k][2] and row[k + 1] != None:
+                        continue
+                    row[k + 1] = None if numpy.isnan(value) else value
+                cursor.updateRow(row)
+        logging.info("Update Cursor: chlorophyll_a values of %d days applied to '%s' feature class", dayCount, values.fc)
+
+    def rankOffsets(self, ranks, offsetList):
+        """Convert the position of the day retained for each dark target to its day offset.
+
+        Parameters:
+            ranks = Numpy array of the position in yDay of the day retained for each dark target (inf where no value retained).
+            offsetList = Numpy array of the offset of each day position.
+
+        Return:
+            Returns a numpy array of day offsets (NaN where no value retained)."""
+        offsets = numpy.empty(len(ranks))
+        offsets.fill(numpy.nan)
+        retained = numpy.isfinite(ranks)
+        offsets[retained] = offsetList[ranks[retained].astype(numpy.int64)]
+
+        return offsets
+
+    def executeParallel(self, gdbList, workerCount, logPath, chloro_folder, cellSizes, dayRange, zonalMode):
+        """Apply chlorophyll_a values with a pool of worker processes (parallel mode). Each GDB is processed by a single worker:
+        the workers add fields to and update the feature classes of their GDB, and the schema locks of workers sharing the
+        feature classes of a GDB would conflict.
+
+        Parameters:
+            gdbList = List of yearly dark targets GDBs to process.
+            workerCount = Maximum number of worker processes.
+            logPath = Folder of the "chloro.log" file, in which the worker logs are written before being merged.
+            chloro_folder, cellSizes, dayRange, zonalMode = As for processGDB.
+
+        Return:
+            No return"""
+        # Ingest chlorophyll_a files beforehand, so that workers only read the regional store
+        arcpy.AddMessage("\nPreparing regional chlorophyll_a store...")
+        for gdb in gdbList:
+            chloro_year = os.path.join(chloro_folder, arcpy.Describe(gdb).baseName)
+            if os.path.isdir(chloro_year):
+                ingestCount = chloroStore.ingestFolder(chloro_year)
+                logging.info("Ingest: %d files of '%s' ingested into regional store", ingestCount, chloro_year)
+
+        # One worker task per GDB
+        tasks = [(gdb, chloro_folder, cellSizes, dayRange, zonalMode) for gdb in gdbList]
+        if len(tasks) == 0:
+            return
+
+        poolSize = min(workerCount, len(tasks))
+        arcpy.AddMessage("\nDispatching " + str(len(tasks)) + " tasks to " + str(poolSize) + " worker processes...")
+        logging.info("Parallel mode: %d tasks dispatched to %d worker processes\n", len(tasks), poolSize)
+
+        # Worker processes must be started with python rather than the ArcGIS application running the tool
+        if not os.path.basename(sys.executable).lower().startswith("python"):
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+        pool = multiprocessing.Pool(poolSize, workerLog.initWorkerLog, (logPath, "chloro"))
+        try:
+            results = pool.map(runWorkerTask, tasks, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+        # Merge worker logs into chloro.log
+        workerLog.mergeWorkerLogs(logPath, "chloro")
+
+        # Report results of every task
+        for gdb, fcList, error in results:
+            if error is None:
+                arcpy.AddMessage("Processed " + str(len(fcList)) + " feature classes of " + gdb)
+            else:
+                arcpy.AddError("Processing of " + gdb + " failed:\n" + error)
+                logging.info("Parallel mode: processing of '%s' failed", gdb)
+
+        return
+
     def yearDay(self, fc_dateString, fc_dateRange):
         """Calculate the day of the year for each RADARSAT-2 acquisition (to conform to MODIS naming convention) and for the days +/- date range desired
 
@@ -310,100 +593,197 @@ class applyChloro(object):
 
         return chloroDateList
 
-    def joindataGen(self,joinTable,fieldList,sortField):
-        """Code snippet from Esri's Join_Field.py (as a replacement to the Join Field geoprocessing tool, which suffers from exceedingly lengthy processing times.)
+    def targetCentroids(self, fc, spatialRef):
+        """Read the centroid of every dark target in a feature class, projected to the coordinate system of the chlorophyll_a rasters.
 
-        Define generator for join data"""
-        with arcpy.da.SearchCursor(joinTable,fieldList,sql_clause=['DISTINCT',
-                                                                   'ORDER BY '+sortField]) as cursor:
+        Parameters:
+            fc = Dark targets feature class from which the centroids are read.
+            spatialRef = Spatial reference of the chlorophyll_a rasters (MODIS geographic coordinates).
+
+        Return:
+            Returns a list of the ObjectIDs of the dark targets and a numpy array of their centroid (x, y) coordinates, in the same order.
+        Edits:
+              Replaces the centroid points feature class previously created with Feature To Point."""
+        oidList = []
+        coordList = []
+        with arcpy.da.SearchCursor(fc, ["OID@", "SHAPE@XY"], spatial_reference=spatialRef) as cursor:
             for row in cursor:
-                yield row
-
-    def percentile(self,n,pct):
-        """Code snippet from Esri's Join_Field.py (as a replacement to the Join Field geoprocessing tool, which suffers from exceedingly lengthy processing times.)
-
-        Function for progress reporting"""
-        return int(float(n)*float(pct)/100.0)
-
-    def join_field(self, inTable, inJoinField, joinTable, outJoinField, joinFields):
-        """Code snippet from Esri's Join_Field.py (as a replacement to the Join Field geoprocessing tool, which suffers from exceedingly lengthy processing times.)
-
-        Add join fields"""
-        arcpy.AddMessage('\nAdding join fields...')
-        fList = [f for f in arcpy.ListFields(joinTable) if f.name in joinFields.split(';')]
-        for i in range(len(fList)):
-            name = fList[i].name
-            type = fList[i].type
-            if type in ['Integer','OID']:
-                arcpy.AddField_management(inTable,name,field_type='LONG')
-            elif type == 'String':
-                arcpy.AddField_management(inTable,name,field_type='TEXT',field_length=fList[i].length)
-            elif type == 'Double':
-                arcpy.AddField_management(inTable,name,field_type='DOUBLE')
-            elif type == 'Date':
-                arcpy.AddField_management(inTable,name,field_type='DATE')
-            else:
-                arcpy.AddError('\nUnknown field type: {0} for field: {1}'.format(type,name))
-
-        # Write values to join fields
-        arcpy.AddMessage('\nJoining data...')
-        # Create generator for values
-        fieldList = [outJoinField] + joinFields.split(';')
-        joinDataGen = self.joindataGen(joinTable,fieldList,outJoinField)
-        version = sys.version_info[0]
-        if version == 2:
-            joinTuple = joinDataGen.next()
-        else:
-            joinTuple = next(joinDataGen)
-        #
-        fieldList = [inJoinField] + joinFields.split(';')
-        count = int(arcpy.GetCount_management(inTable).getOutput(0))
-        breaks = [self.percentile(count,b) for b in range(10,100,10)]
-        j = 0
-        with arcpy.da.UpdateCursor(inTable,fieldList,sql_clause=(None,'ORDER BY '+inJoinField)) as cursor:
+                oidList.append(row[0])
+                coordList.append(row[1])
+
+        return oidList, numpy.array(coordList, dtype=numpy.float64).reshape(-1, 2)
+
+    def targetCells(self, centroids, chloroGrid):
+        """Determine the grid row and column containing each dark target centroid.
+
+        Parameters:
+            centroids = Numpy array of centroid (x, y) coordinates, as returned by targetCentroids.
+            chloroGrid = Regional chlorophyll_a grid loaded from the chlorophyll_a store.
+
+        Return:
+            Returns two numpy integer arrays (rows, columns). Centroids falling outside of the grid are given a row and column of -1."""
+        cols = numpy.floor((centroids[:, 0] - chloroGrid.xMin) / chloroGrid.cellWidth).astype(numpy.int64)
+        rows = numpy.floor((chloroGrid.yMax - centroids[:, 1]) / chloroGrid.cellHeight).astype(numpy.int64)
+        outside = (rows < 0) | (rows >= chloroGrid.nRows) | (cols < 0) | (cols >= chloroGrid.nCols)
+        rows[outside] = -1
+        cols[outside] = -1
+
+        return rows, cols
+
+    def summedAreaTable(self, chloroArray):
+        """Build the summed-area tables of a chlorophyll_a array, from which the mean of any rectangular neighbourhood is obtained with four lookups.
+
+        Parameter:
+            chloroArray = Numpy array of chlorophyll_a values, with NoData cells set to NaN.
+
+        Return:
+            Returns the summed-area table of the values and the summed-area table of the count of cells with data,
+            each padded with a leading row and column of zeros."""
+        valid = ~numpy.isnan(chloroArray)
+        sumTable = numpy.zeros((chloroArray.shape[0] + 1, chloroArray.shape[1] + 1), dtype=numpy.float64)
+        countTable = numpy.zeros((chloroArray.shape[0] + 1, chloroArray.shape[1] + 1), dtype=numpy.int64)
+        sumTable[1:, 1:] = numpy.where(valid, chloroArray, 0.0).cumsum(axis=0).cumsum(axis=1)
+        countTable[1:, 1:] = valid.cumsum(axis=0).cumsum(axis=1)
+
+        return sumTable, countTable
+
+    def focalMeans(self, sumTable, countTable, rows, cols, size):
+        """Calculate the mean of the cells with data in a size x size neighbourhood around each dark target centroid cell.
+        Equivalent to Focal Statistics (rectangle neighbourhood, MEAN, ignoring NoData) sampled at the centroids.
+
+        Parameters:
+            sumTable, countTable = Summed-area tables returned by summedAreaTable.
+            rows, cols = Centroid cells returned by targetCells.
+            size = Neighbourhood cell size (pixels).
+
+        Return:
+            Returns a numpy array of mean values, set to -9999 where the neighbourhood contains no data or the centroid is outside of the raster."""
+        nRows = sumTable.shape[0] - 1
+        nCols = sumTable.shape[1] - 1
+        top = numpy.clip(rows - (size - 1) // 2, 0, nRows)
+        bottom = numpy.clip(rows + size // 2 + 1, 0, nRows)
+        left = numpy.clip(cols - (size - 1) // 2, 0, nCols)
+        right = numpy.clip(cols + size // 2 + 1, 0, nCols)
+        windowSum = sumTable[bottom, right] - sumTable[top, right] - sumTable[bottom, left] + sumTable[top, left]
+        windowCount = countTable[bottom, right] - countTable[top, right] - countTable[bottom, left] + countTable[top, left]
+
+        means = numpy.empty(len(rows))
+        means.fill(-9999.0)
+        valid = (rows >= 0) & (windowCount > 0)
+        means[valid] = windowSum[valid] / windowCount[valid]
+
+        return means
+
+    def targetEdges(self, fc, spatialRef, oidIndex):
+        """Read the polygon edges of every dark target in a feature class, projected to the coordinate system of the chlorophyll_a rasters.
+
+        Parameters:
+            fc = Dark targets feature class from which the polygons are read.
+            spatialRef = Spatial reference of the chlorophyll_a rasters (MODIS geographic coordinates).
+            oidIndex = Dictionary of the position of each dark target ObjectID (as read by targetCentroids).
+
+        Return:
+            Returns a numpy array of edges (x0, y0, x1, y1) of every ring (exterior and interior) and a numpy array of the position of
+            the dark target to which each edge belongs."""
+        edgeList = []
+        labelList = []
+        with arcpy.da.SearchCursor(fc, ["OID@", "SHAPE@"], spatial_reference=spatialRef) as cursor:
             for row in cursor:
-                j+=1
-                if j in breaks:
-                    arcpy.AddMessage(str(int(round(j*100.0/count))) + ' percent complete...')
-                row = list(row)
-                key = row[0]
-                try:
-                    while joinTuple[0] < key:
-                        if version == 2:
-                            joinTuple = joinDataGen.next()
+                if row[1] is None:
+                    continue
+                for part in row[1]:
+                    # Rings within a part are separated by None (interior rings)
+                    ring = []
+                    for point in list(part) + [None]:
+                        if point is None:
+                            if len(ring) > 2:
+                                ringArray = numpy.array(ring, dtype=numpy.float64)
+                                edgeList.append(numpy.hstack((ringArray, numpy.roll(ringArray, -1, axis=0))))
+                                labelList.append(numpy.repeat(oidIndex[row[0]], len(ring)))
+                            ring = []
                         else:
-                            joinTuple = next(joinDataGen)
-                    if key == joinTuple[0]:
-                        for i in range(len(joinTuple))[1:]:
-                            row[i] = joinTuple[i]
-                        row = tuple(row)
-                        cursor.updateRow(row)
-                except StopIteration:
-                    arcpy.AddWarning('\nEnd of join table.')
-                    break
-
-    def cleanWorkspace(self, workspace):
-        """Clears geodatabase workspace of interim feature classes used during geoprocessing executed in this script.
+                            ring.append((point.X, point.Y))
 
-        Parameter:
-            workspace = Points to the workspace in which the deletion of feature classes will occur.
+        if len(edgeList) == 0:
+            return numpy.zeros((0, 4)), numpy.zeros(0, dtype=numpy.int64)
+
+        return numpy.vstack(edgeList), numpy.concatenate(labelList).astype(numpy.int64)
+
+    def rasterizeTargets(self, edges, edgeLabels, chloroGrid, rows, cols):
+        """Rasterize every dark target polygon onto the chlorophyll_a grid in a single vectorized scanline pass, producing the label raster
+        (in sparse form) of the grid cells whose centre lies inside each polygon (even-odd rule, so interior rings are excluded).
+        Dark targets smaller than a grid cell, which contain no cell centre, are given the cell containing their centroid.
+
+        Parameters:
+            edges, edgeLabels = Polygon edges and their dark target positions returned by targetEdges.
+            chloroGrid = Regional chlorophyll_a grid loaded from the chlorophyll_a store.
+            rows, cols = Centroid cells returned by targetCells.
 
         Return:
-            No return
-        Edits:
-              Modified by Philippe Muise"""
-        arcpy.env.workspace = workspace
-        arcpy.AddMessage("\nCleaning workspace...")
-        pointList = arcpy.ListFeatureClasses("*_point")
-        arcpy.AddMessage("Deleting point feature classes...")
-        for fc in pointList:
-            arcpy.Delete_management(fc)
-            logging.info("Delete: '%s' feature class deleted", fc)
-        extractList = arcpy.ListFeatureClasses("*_extract")
-        arcpy.AddMessage("Deleting raster value extraction feature classes...")
-        for fc in extractList:
-            arcpy.Delete_management(fc)
-            logging.info("Delete: '%s' feature class deleted", fc)
+            Returns a numpy array of flat grid cell indexes and a numpy array of the position of the dark target labelling each cell."""
+        nRows = chloroGrid.nRows
+        nCols = chloroGrid.nCols
+        x0, y0, x1, y1 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+
+        # Determine rows whose cell centre is crossed by each edge (half-open on y, so shared vertices are counted once)
+        firstRow = numpy.floor((chloroGrid.yMax - numpy.maximum(y0, y1)) / chloroGrid.cellHeight - 0.5).astype(numpy.int64) + 1
+        lastRow = numpy.floor((chloroGrid.yMax - numpy.minimum(y0, y1)) / chloroGrid.cellHeight - 0.5).astype(numpy.int64)
+        firstRow = numpy.maximum(firstRow, 0)
+        lastRow = numpy.minimum(lastRow, nRows - 1)
+        rowCounts = numpy.maximum(lastRow - firstRow + 1, 0)
+
+        # Expand to one crossing per (edge, row) and compute crossing x coordinate at the row centre
+        edgeIdx = numpy.repeat(numpy.arange(len(edges)), rowCounts)
+        crossRow = firstRow[edgeIdx] + numpy.arange(rowCounts.sum()) - numpy.repeat(numpy.cumsum(rowCounts) - rowCounts, rowCounts)
+        rowY = chloroGrid.yMax - (crossRow + 0.5) * chloroGrid.cellHeight
+        crossX = x0[edgeIdx] + (rowY - y0[edgeIdx]) * (x1[edgeIdx] - x0[edgeIdx]) / (y1[edgeIdx] - y0[edgeIdx])
+        crossLabel = edgeLabels[edgeIdx]
+
+        # Sort crossings by target, row and x; consecutive pairs of crossings delimit the spans inside each polygon
+        order = numpy.lexsort((crossX, crossRow, crossLabel))
+        crossX = crossX[order]
+        spanRow = crossRow[order][0::2]
+        spanLabel = crossLabel[order][0::2]
+        firstCol = numpy.ceil((crossX[0::2] - chloroGrid.xMin) / chloroGrid.cellWidth - 0.5).astype(numpy.int64)
+        lastCol = numpy.ceil((crossX[1::2] - chloroGrid.xMin) / chloroGrid.cellWidth - 0.5).astype(numpy.int64) - 1
+        firstCol = numpy.maximum(firstCol, 0)
+        lastCol = numpy.minimum(lastCol, nCols - 1)
+        colCounts = numpy.maximum(lastCol - firstCol + 1, 0)
+
+        # Expand spans to grid cells
+        spanIdx = numpy.repeat(numpy.arange(len(spanRow)), colCounts)
+        cellCol = firstCol[spanIdx] + numpy.arange(colCounts.sum()) - numpy.repeat(numpy.cumsum(colCounts) - colCounts, colCounts)
+        cells = spanRow[spanIdx] * nCols + cellCol
+        cellLabels = spanLabel[spanIdx]
+
+        # Use centroid cell for dark targets not covering any cell centre
+        covered = numpy.bincount(cellLabels, minlength=len(rows)) > 0
+        missing = numpy.nonzero(~covered & (rows >= 0))[0]
+        cells = numpy.concatenate((cells, rows[missing] * nCols + cols[missing]))
+        cellLabels = numpy.concatenate((cellLabels, missing))
+
+        return cells, cellLabels
+
+    def zonalMeans(self, chloroArray, cells, cellLabels, targetCount):
+        """Calculate the mean of the cells with data over the footprint of each dark target.
+
+        Parameters:
+            chloroArray = Numpy array of chlorophyll_a values, with NoData cells set to NaN.
+            cells, cellLabels = Label raster cells returned by rasterizeTargets.
+            targetCount = Number of dark targets in the feature class.
+
+        Return:
+            Returns a numpy array of mean values, set to -9999 where the footprint contains no data."""
+        values = chloroArray.ravel()[cells].astype(numpy.float64)
+        valid = ~numpy.isnan(values)
+        sums = numpy.bincount(cellLabels[valid], weights=values[valid], minlength=targetCount)
+        counts = numpy.bincount(cellLabels[valid], minlength=targetCount)
+
+        means = numpy.empty(targetCount)
+        means.fill(-9999.0)
+        means[counts > 0] = sums[counts > 0] / counts[counts > 0]
+
+        return means
 
     def dayDisplay(self, number):
         """Determines the offset date used in chlorophyll analysis.
@@ -416,4 +796,21 @@ class applyChloro(object):
         if (number % 2) == 0:
            return number/2
         else:
-           return -(number+1)/2
\ No newline at end of file
+           return -(number+1)/2
+
+
+def runWorkerTask(task):
+    """Process a GDB in an applyChloro worker process (parallel mode).
+
+    Parameter:
+        task = Tuple of (gdb, chloro_folder, cellSizes, dayRange, zonalMode), as for applyChloro.processGDB.
+
+    Return:
+        Returns a tuple of the GDB, the list of feature classes processed and the error traceback (None if successful)."""
+    gdb, chloro_folder, cellSizes, dayRange, zonalMode = task
+    try:
+        fcList = applyChloro().processGDB(gdb, chloro_folder, cellSizes, dayRange, zonalMode)
+        return gdb, fcList, None
+    except Exception:
+        logging.exception("Processing of '%s' failed", gdb)
+        return gdb, None, traceback.format_exc()
\ No newline at end of file
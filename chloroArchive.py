@@ -0,0 +1,137 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 chlorophyll_a tools, 2017.                            #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "getChloro.py" script to keep the local
+chlorophyll_a archive within a size quota.
+
+SUMMARY
+Manages the size of the local "Auxiliary/Chlorophyll" archive. The last use of each
+chlorophyll_a day is tracked by its access marker in the regional store (updated
+each time the day is read, see "chloroStore.py") or by its download or ingest time.
+A day is held by its regional store entry once the NetCDF file is ingested and
+deleted, or by the NetCDF file until then. When the archive exceeds the quota, the
+least recently used days are evicted (NetCDF file if still present, .md5 file and
+regional store files), until the archive is back within the quota. The files of the days still required by unprocessed dark
+targets feature classes are pinned and never evicted.
+
+INPUT
+- Chlorophyll_a Archive (automated input): "Auxiliary/Chlorophyll/<year>" folders
+of downloaded files and their regional store.
+
+- Quota (automated input): Maximum size of the archive (bytes).
+
+- Pinned Days (automated input): Days (YYYY/DDD) of the files that cannot be
+evicted.
+
+OUTPUT
+- Chlorophyll_a Archive (automated output): Least recently used files removed from
+the archive.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- archiveSize
+- archiveFiles
+- removeFile
+- evictFiles"""
+
+# Libraries
+# =========
+import os
+import logging
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import chloroStore                          # get module reference for reload
+reload(chloroStore)                         # reload step 1
+
+import chloroDownload                       # get module reference for reload
+reload(chloroDownload)                      # reload step 1
+
+
+def archiveSize(localChloro):
+    """Determine the total size of the chlorophyll_a archive.
+
+    Parameter:
+        localChloro = The local folder directory, normally named "Chlorophyll", in which the chlorophyll_a data is downloaded.
+
+    Return:
+        Returns the size of every file of the archive (bytes)."""
+    totalBytes = 0
+    for folderPath, folderNames, fileNames in os.walk(localChloro):
+        for fileName in fileNames:
+            totalBytes += os.path.getsize(os.path.join(folderPath, fileName))
+
+    return totalBytes
+
+
+def archiveFiles(localChloro):
+    """List the chlorophyll_a NetCDF files of the archive (file still present or regional store entry) with their day and last use.
+
+    Parameter:
+        localChloro = The local folder directory, normally named "Chlorophyll", in which the chlorophyll_a data is downloaded.
+
+    Return:
+        Returns a list of (last use time, day string YYYY/DDD, .nc file path), least recently used first."""
+    ncFiles = []
+    for year in sorted(os.listdir(localChloro)):
+        chloroYear = os.path.join(localChloro, year)
+        if not os.path.isdir(chloroYear):
+            continue
+        for ncFile in chloroStore.listSources(chloroYear):
+            # File names start with "AYYYYDDD" (e.g. A2010268.L3m_DAY_CHL_chlor_a_4km.nc)
+            ncFilePath = os.path.join(chloroYear, ncFile)
+            ncFiles.append((chloroStore.lastAccess(ncFilePath), ncFile[1:5] + '/' + ncFile[5:8], ncFilePath))
+
+    return sorted(ncFiles)
+
+
+def removeFile(ncFilePath):
+    """Remove a chlorophyll_a NetCDF file from the archive, with its .md5 file and regional store files.
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder (the file may have been deleted once ingested).
+
+    Return:
+        Returns the size of the removed files (bytes)."""
+    chloroYear, ncFile = os.path.split(ncFilePath)
+    dataPath, metaPath = chloroStore.storePaths(ncFilePath)
+    removePaths = [ncFilePath, dataPath, metaPath, os.path.splitext(dataPath)[0] + ".access"]
+    md5File = chloroDownload.md5Name(ncFile, os.listdir(chloroYear))
+    if md5File is not None:
+        removePaths.append(os.path.join(chloroYear, md5File))
+
+    freedBytes = 0
+    for removePath in removePaths:
+        if os.path.exists(removePath):
+            freedBytes += os.path.getsize(removePath)
+            os.remove(removePath)
+    logging.info("Archive: '%s' evicted (%d bytes)", ncFilePath, freedBytes)
+
+    return freedBytes
+
+
+def evictFiles(localChloro, quotaBytes, pinnedDays):
+    """Evict the least recently used chlorophyll_a files until the archive is within the quota.
+
+    Parameters:
+        localChloro = The local folder directory, normally named "Chlorophyll", in which the chlorophyll_a data is downloaded.
+        quotaBytes = Maximum size of the archive (bytes).
+        pinnedDays = Days (YYYY/DDD) of the files that cannot be evicted.
+
+    Return:
+        Returns the list of evicted .nc file paths and the size of the archive after eviction (bytes)."""
+    totalBytes = archiveSize(localChloro)
+    evicted = []
+    for accessTime, day, ncFilePath in archiveFiles(localChloro):
+        if totalBytes <= quotaBytes:
+            break
+        if day in pinnedDays:
+            continue
+        totalBytes -= removeFile(ncFilePath)
+        evicted.append(ncFilePath)
+
+    return evicted, totalBytes
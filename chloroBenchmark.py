@@ -0,0 +1,427 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 chlorophyll_a tools, 2017.                            #
+#==============================================================================#
+"""USAGE
+Stand-alone script run from the command line with the ArcGIS Python interpreter,
+e.g. "python chloroBenchmark.py --days 60 --size 4 --sessions 4 --latency 0.05
+--fault-rate 0.1". Run "python chloroBenchmark.py --help" for every option. The
+script does not require arcpy.
+
+SUMMARY
+Measures the download performance and retry behaviour of the "getChloro.py" script
+tool offline. A local FTP stand-in is started on the loopback interface, serving a
+synthetic "YYYY/DDD" tree of chlorophyll_a .nc files (random content) and their .md5
+files. The download path of "getChloro.py" (planning phase, then download phase of
+the "chloroDownload" pool) is run against the stand-in and the throughput is reported.
+The synthetic tree can also be read directly as a mirror folder ("--source mirror").
+
+The stand-in can delay every reply (latency) and inject faults in the transfers of
+the .nc files:
+- abort: half of the file is sent, then the transfer is aborted (426 reply).
+- drop: half of the file is sent, then the control connection is closed.
+- corrupt: the whole file is sent with one altered byte.
+
+INPUT
+- Command line options: Number of days, file size, number of FTP sessions, reply
+latency, fault rate and kinds, number of attempts and retry delay.
+
+OUTPUT
+- Benchmark report (printed): Number of files and bytes downloaded, files/s, MB/s,
+failed attempts (retried), failed downloads, faults injected, planning time and
+total wall time, followed by the transfer summary report of the download pool. Every downloaded file is checked against the served file.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- chloroFTPServer
+    - drawFault
+- chloroFTPHandler
+    - handle
+    - reply
+    - serverPath
+    - acceptData
+    - ftp_USER, ftp_PASS, ftp_SYST, ftp_TYPE, ftp_NOOP, ftp_PWD, ftp_CWD, ftp_PASV,
+      ftp_NLST, ftp_SIZE, ftp_REST, ftp_RETR, ftp_QUIT
+- buildTree
+- runBenchmark
+- main"""
+
+# Libraries
+# =========
+import os
+import time
+import random
+import shutil
+import socket
+import hashlib
+import argparse
+import tempfile
+import threading
+import posixpath
+import SocketServer
+import chloroSource
+import chloroDownload
+
+
+class chloroFTPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    """
+    Minimal FTP server on the loopback interface serving a local folder, with
+    injected reply latency and transfer faults.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, root, latency=0.0, faultRate=0.0, faultKinds=("abort", "drop", "corrupt"), seed=None):
+        """Define the server and bind it to a free loopback port.
+
+        Parameters:
+            root = Local folder served as the root of the FTP site.
+            latency = Delay (seconds) before every reply.
+            faultRate = Probability of a fault in each transfer of a .nc file.
+            faultKinds = Kinds of faults drawn at random ("abort", "drop", "corrupt").
+            seed = Seed of the random faults, for repeatable runs."""
+        SocketServer.TCPServer.__init__(self, ("127.0.0.1", 0), chloroFTPHandler)
+        self.root = root
+        self.latency = latency
+        self.faultRate = faultRate
+        self.faultKinds = list(faultKinds)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.faultCount = dict((kind, 0) for kind in self.faultKinds)
+
+    def drawFault(self, fileName):
+        """Determine if a fault is injected in the transfer of a file.
+
+        Parameter:
+            fileName = Name of the transferred file.
+
+        Return:
+            Returns the kind of fault to inject, or None."""
+        if not fileName.endswith(".nc") or len(self.faultKinds) == 0:
+            return None
+        with self.lock:
+            if self.random.random() >= self.faultRate:
+                return None
+            fault = self.random.choice(self.faultKinds)
+            self.faultCount[fault] += 1
+
+        return fault
+
+
+class chloroFTPHandler(SocketServer.StreamRequestHandler):
+    """
+    FTP control connection of the stand-in server. Implements the commands used by
+    the download pool (anonymous login, passive mode, NLST, SIZE, REST and RETR).
+    """
+    def handle(self):
+        """Process the commands of the control connection until it is closed.
+
+        Return:
+            No return"""
+        self.cwd = "/"
+        self.rest = 0
+        self.pasv = None
+        self.reply("220 GEM2 chlorophyll_a FTP stand-in ready.")
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    break
+                command, space, argument = line.strip().partition(" ")
+                if self.server.latency > 0:
+                    time.sleep(self.server.latency)
+                method = getattr(self, "ftp_" + command.upper(), None)
+                if method is None:
+                    self.reply("502 Command not implemented.")
+                elif method(argument) is False:
+                    break
+        except socket.error:
+            pass
+        finally:
+            if self.pasv is not None:
+                self.pasv.close()
+
+    def reply(self, text):
+        """Send a reply on the control connection.
+
+        Parameter:
+            text = Reply code and text.
+
+        Return:
+            No return"""
+        self.wfile.write(text + "\r\n")
+
+    def serverPath(self, argument):
+        """Determine the local path of a path of the FTP site, relative to the working directory.
+
+        Parameter:
+            argument = Path of the FTP site (absolute or relative).
+
+        Return:
+            Returns the FTP path and the local path."""
+        ftpPath = posixpath.normpath(posixpath.join(self.cwd, argument))
+        if not ftpPath.startswith("/"):
+            ftpPath = "/" + ftpPath
+
+        return ftpPath, os.path.join(self.server.root, *[part for part in ftpPath.split("/") if part])
+
+    def acceptData(self):
+        """Accept the data connection opened by the client in passive mode.
+
+        Return:
+            Returns the data connection socket, or None if passive mode was not requested."""
+        if self.pasv is None:
+            return None
+        self.pasv.settimeout(30)
+        try:
+            conn = self.pasv.accept()[0]
+        except socket.error:
+            conn = None
+        self.pasv.close()
+        self.pasv = None
+
+        return conn
+
+    def ftp_USER(self, argument):
+        self.reply("331 Anonymous login ok, send your e-mail as password.")
+
+    def ftp_PASS(self, argument):
+        self.reply("230 Login successful.")
+
+    def ftp_SYST(self, argument):
+        self.reply("215 UNIX Type: L8")
+
+    def ftp_TYPE(self, argument):
+        self.reply("200 Type set to " + argument + ".")
+
+    def ftp_NOOP(self, argument):
+        self.reply("200 NOOP ok.")
+
+    def ftp_PWD(self, argument):
+        self.reply('257 "' + self.cwd + '" is the current directory.')
+
+    def ftp_CWD(self, argument):
+        ftpPath, localPath = self.serverPath(argument)
+        if os.path.isdir(localPath):
+            self.cwd = ftpPath
+            self.reply("250 Directory successfully changed.")
+        else:
+            self.reply("550 " + argument + ": No such directory.")
+
+    def ftp_PASV(self, argument):
+        if self.pasv is not None:
+            self.pasv.close()
+        self.pasv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.pasv.bind((self.server.server_address[0], 0))
+        self.pasv.listen(1)
+        host, port = self.pasv.getsockname()
+        self.reply("227 Entering Passive Mode (%s,%d,%d)." % (host.replace(".", ","), port >> 8, port & 255))
+
+    def ftp_NLST(self, argument):
+        ftpPath, localPath = self.serverPath(argument)
+        if not os.path.isdir(localPath):
+            self.reply("550 " + argument + ": No such directory.")
+            return
+        conn = self.acceptData()
+        if conn is None:
+            self.reply("425 Use PASV first.")
+            return
+        self.reply("150 Here comes the directory listing.")
+        conn.sendall("".join([fileName + "\r\n" for fileName in sorted(os.listdir(localPath))]))
+        conn.close()
+        self.reply("226 Directory send OK.")
+
+    def ftp_SIZE(self, argument):
+        ftpPath, localPath = self.serverPath(argument)
+        if os.path.isfile(localPath):
+            self.reply("213 " + str(os.path.getsize(localPath)))
+        else:
+            self.reply("550 " + argument + ": No such file.")
+
+    def ftp_REST(self, argument):
+        self.rest = int(argument)
+        self.reply("350 Restarting at " + argument + ".")
+
+    def ftp_RETR(self, argument):
+        ftpPath, localPath = self.serverPath(argument)
+        rest = self.rest
+        self.rest = 0
+        if not os.path.isfile(localPath):
+            self.reply("550 " + argument + ": No such file.")
+            return
+        conn = self.acceptData()
+        if conn is None:
+            self.reply("425 Use PASV first.")
+            return
+        self.reply("150 Opening BINARY mode data connection for " + argument + ".")
+        with open(localPath, 'rb') as dataFile:
+            dataFile.seek(rest)
+            data = dataFile.read()
+
+        # Inject fault in transfer
+        fault = self.server.drawFault(posixpath.basename(ftpPath))
+        if fault == "abort" or fault == "drop":
+            conn.sendall(data[:len(data) // 2])
+            conn.close()
+            if fault == "drop":
+                return False
+            self.reply("426 Connection closed; transfer aborted.")
+            return
+        if fault == "corrupt" and len(data) > 0:
+            middle = len(data) // 2
+            data = data[:middle] + chr((ord(data[middle]) + 1) % 256) + data[middle + 1:]
+
+        conn.sendall(data)
+        conn.close()
+        self.reply("226 Transfer complete.")
+
+    def ftp_QUIT(self, argument):
+        self.reply("221 Goodbye.")
+        return False
+
+
+def buildTree(root, year, days, fileSize):
+    """Create the synthetic chlorophyll_a tree served by the stand-in ("YYYY/DDD/<file>.nc" and ".md5").
+
+    Parameters:
+        root = Local folder served as the root of the FTP site.
+        year = Year of the synthetic files.
+        days = Number of days, starting from day 001.
+        fileSize = Size of each .nc file (bytes).
+
+    Return:
+        Returns the list of remote directories (/YYYY/DDD) and the dictionary of MD5 digests by file name."""
+    remoteDirs = []
+    digests = {}
+    for day in range(1, days + 1):
+        yDay = str(day).zfill(3)
+        dayFolder = os.path.join(root, str(year), yDay)
+        os.makedirs(dayFolder)
+        fileName = "A" + str(year) + yDay + ".L3m_DAY_CHL_chlor_a_4km.nc"
+        data = os.urandom(fileSize)
+        with open(os.path.join(dayFolder, fileName), 'wb') as dataFile:
+            dataFile.write(data)
+        digests[fileName] = hashlib.md5(data).hexdigest()
+        with open(os.path.join(dayFolder, fileName + ".md5"), 'w') as md5File:
+            md5File.write(digests[fileName] + "  " + fileName + "\n")
+        remoteDirs.append("/" + str(year) + "/" + yDay)
+
+    return remoteDirs, digests
+
+
+def runBenchmark(days=30, fileSize=4000000, sessions=4, latency=0.0, faultRate=0.0, faultKinds=("abort", "drop", "corrupt"),
+                 retries=5, retryDelay=0.5, seed=None, year=2010, report=None, sourceKind="ftp"):
+    """Run the download path of getChloro against the local FTP stand-in.
+
+    Parameters:
+        days = Number of days of the synthetic tree.
+        fileSize = Size of each .nc file (bytes).
+        sessions = Number of concurrent FTP sessions of the download pool.
+        latency = Delay (seconds) before every reply of the stand-in.
+        faultRate = Probability of a fault in each transfer of a .nc file.
+        faultKinds = Kinds of faults drawn at random ("abort", "drop", "corrupt").
+        retries = Number of attempts for each work item.
+        retryDelay = Delay (seconds) before attempting a failed work item again.
+        seed = Seed of the random faults, for repeatable runs.
+        year = Year of the synthetic files.
+        report = Optional function called with each progress message of the download pool.
+        sourceKind = Source read by the download pool: "ftp" (local FTP stand-in) or "mirror" (synthetic tree read as a mirror folder).
+
+    Return:
+        Returns a dictionary of the benchmark results."""
+    benchFolder = tempfile.mkdtemp(prefix="chloroBenchmark_")
+    serverRoot = os.path.join(benchFolder, "server")
+    localChloro = os.path.join(benchFolder, "Chlorophyll")
+    try:
+        remoteDirs, digests = buildTree(serverRoot, year, days, fileSize)
+
+        # Start FTP stand-in
+        server = chloroFTPServer(serverRoot, latency, faultRate, faultKinds, seed)
+        serverThread = threading.Thread(target=server.serve_forever, name="chloroFTPServer")
+        serverThread.daemon = True
+        serverThread.start()
+
+        # Planning phase, then download phase, as performed by getChloro
+        if sourceKind == "mirror":
+            source = chloroSource.mirrorSource(serverRoot)
+        else:
+            source = chloroSource.ftpSource("127.0.0.1", server.server_address[1])
+        downloadPool = chloroDownload.downloadPool(source, localChloro, sessions, retries=retries, retryDelay=retryDelay)
+        startTime = time.time()
+        plannedFiles = downloadPool.plan(remoteDirs, report)
+        planTime = time.time() - startTime
+        downloaded, failed = downloadPool.download(plannedFiles, report)
+        wallTime = time.time() - startTime
+        server.shutdown()
+        server.server_close()
+
+        # Verify downloaded files against the served files
+        totalBytes = 0
+        mismatches = []
+        for localFilePath in downloaded:
+            totalBytes += os.path.getsize(localFilePath)
+            fileName = os.path.basename(localFilePath)
+            if fileName in digests and chloroDownload.fileDigest(localFilePath) != digests[fileName]:
+                mismatches.append(fileName)
+
+        return {"files": len(downloaded),
+                "plannedFiles": len(plannedFiles),
+                "bytes": totalBytes,
+                "filesPerSecond": len(downloaded) / wallTime,
+                "mbPerSecond": totalBytes / 1000000.0 / wallTime,
+                "failedAttempts": downloadPool.retryCount,
+                "failed": failed,
+                "faults": server.faultCount,
+                "mismatches": mismatches,
+                "planTime": planTime,
+                "wallTime": wallTime,
+                "summary": downloadPool.summaryReport()}
+    finally:
+        shutil.rmtree(benchFolder, ignore_errors=True)
+
+
+def main():
+    """Parse the command line options, run the benchmark and print its report.
+
+    Return:
+        No return"""
+    parser = argparse.ArgumentParser(description="Benchmark the chlorophyll_a downloads of getChloro against a local FTP stand-in.")
+    parser.add_argument("--days", type=int, default=30, help="number of days (directories) served (default: 30)")
+    parser.add_argument("--size", type=float, default=4.0, help="size of each .nc file in MB (default: 4)")
+    parser.add_argument("--sessions", type=int, default=4, help="number of concurrent FTP sessions (default: 4)")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay in seconds before every reply (default: 0)")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="probability of a fault in each .nc transfer (default: 0)")
+    parser.add_argument("--fault-kinds", default="abort,drop,corrupt", help="kinds of faults injected (default: abort,drop,corrupt)")
+    parser.add_argument("--retries", type=int, default=5, help="number of attempts for each file (default: 5)")
+    parser.add_argument("--retry-delay", type=float, default=0.5, help="delay in seconds before a new attempt (default: 0.5)")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random faults")
+    parser.add_argument("--source", choices=["ftp", "mirror"], default="ftp", help="read the synthetic tree through the FTP stand-in or as a mirror folder (default: ftp)")
+    parser.add_argument("--verbose", action="store_true", help="print the progress messages of the download pool")
+    args = parser.parse_args()
+
+    faultKinds = [kind for kind in args.fault_kinds.split(",") if kind]
+    report = None
+    if args.verbose:
+        def report(message):
+            print message
+    results = runBenchmark(args.days, int(args.size * 1000000), args.sessions, args.latency, args.fault_rate, faultKinds,
+                           args.retries, args.retry_delay, args.seed, report=report, sourceKind=args.source)
+
+    print "\nChlorophyll_a download benchmark"
+    print "================================"
+    print "Files downloaded:     %d of %d planned (%.1f MB)" % (results["files"], results["plannedFiles"], results["bytes"] / 1000000.0)
+    print "Throughput:           %.2f files/s, %.2f MB/s" % (results["filesPerSecond"], results["mbPerSecond"])
+    print "Failed attempts:      %d (retried)" % results["failedAttempts"]
+    print "Failed downloads:     %d %s" % (len(results["failed"]), str(results["failed"]) if results["failed"] else "")
+    print "Faults injected:      %s" % ", ".join(["%s=%d" % (kind, count) for kind, count in sorted(results["faults"].items())])
+    print "Checksum mismatches:  %d" % len(results["mismatches"])
+    print "Planning time:        %.2f s" % results["planTime"]
+    print "Total wall time:      %.2f s" % results["wallTime"]
+    print "\n" + "\n".join(results["summary"])
+
+
+if __name__ == '__main__':
+    main()
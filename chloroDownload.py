@@ -0,0 +1,685 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 chlorophyll_a tools, 2017.                            #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "getChloro.py" and "streamChloro.py" scripts as
+their download engine.
+
+SUMMARY
+Downloads MODIS chlorophyll_a files with a bounded pool of sessions to a
+chlorophyll_a source (FTP site, mirror folder or web site, see "chloroSource.py"),
+each session running in its own worker thread. The workers share a single work
+queue of (remote directory, file) items. Downloads are performed in two phases:
+the planning phase lists every required remote directory once (items without a
+file) and records the size of each file not already available locally, then the
+download phase fetches each of those files exactly once (items with a file) to the
+local year folder. Each session is kept alive between commands (e.g. TCP keepalive
+on the FTP control connection and NOOP after an idle period) and is re-established
+after a failure.
+
+Files are downloaded to a ".part" file that is resumed from its current size (FTP
+REST offset, HTTP Range or file offset) after a failure. Each file is verified against the MD5 checksum of
+its companion ".md5" file before being moved into place, so a truncated or corrupt
+file is never left under its final name. Files already available locally are
+verified lazily, only when they are required, and the result is recorded in a
+"verified.json" file of the year folder (file size, modification time and digest)
+so an unchanged file is not hashed again. When a shared site cache is given, data
+files already fetched by anyone on the site are copied from the cache, and verified
+downloads are published to it.
+
+Each work item is recorded in a transfer journal (one JSON record per line): day,
+file, status, size, duration, throughput, number of attempts and class of each
+error. Failed attempts are retried after an exponential backoff delay with full
+jitter. A summary report of the run (throughput, retries, errors by class and
+slowest days) is produced from the records.
+
+INPUT
+- Chlorophyll_a source (automated input): Source hosting the MODIS data.
+
+- Site cache (automated input, optional): Shared content-addressed cache.
+
+- Work items (automated input): Remote directories (YYYY/DDD) containing the
+chlorophyll_a files to download.
+
+OUTPUT
+- Chlorophyll_a files (automated output): Verified files downloaded in the local
+"Chlorophyll/<year>" folders.
+
+- Transfer journal (automated output, optional): JSON lines file of the transfers
+(normally "logs/chloro_transfers.jsonl").
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- md5Name
+- fileDigest
+- readDigest
+- verifyLocalFile
+- recordVerified
+- downloadPool
+    - add
+    - plan
+    - download
+    - run
+    - worker
+    - backoff
+    - process
+    - recordTransfer
+    - summaryReport
+    - listDirectory
+    - downloadFile
+    - expectedDigest
+    - localPath"""
+
+# Libraries
+# =========
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+try:
+    import Queue
+except ImportError:
+    # Python 3 (tests run outside of ArcGIS)
+    import queue as Queue
+
+# Name of the file recording the verified chlorophyll_a files of each year folder
+VERIFIED_FILE = "verified.json"
+
+# Lock protecting the verified files records shared by the worker threads
+verifiedLock = threading.Lock()
+
+
+class checksumError(Exception):
+    """
+    Raised when a downloaded file does not match its MD5 checksum.
+    """
+    pass
+
+
+def md5Name(fileName, fileNames):
+    """Determine the name of the companion .md5 file of a file ("<file>.md5" or "<file base>.md5").
+
+    Parameters:
+        fileName = Name of the chlorophyll_a file.
+        fileNames = Names of the files of the directory containing the file.
+
+    Return:
+        Returns the name of the .md5 file, or None if the directory does not contain one."""
+    for candidate in (fileName + ".md5", os.path.splitext(fileName)[0] + ".md5"):
+        if candidate in fileNames:
+            return candidate
+
+    return None
+
+
+def fileDigest(filePath):
+    """Compute the MD5 digest of a file, read in blocks.
+
+    Parameter:
+        filePath = Path of the file.
+
+    Return:
+        Returns the hexadecimal MD5 digest of the file."""
+    md5 = hashlib.md5()
+    with open(filePath, 'rb') as dataFile:
+        for block in iter(lambda: dataFile.read(1048576), b''):
+            md5.update(block)
+
+    return md5.hexdigest()
+
+
+def readDigest(md5Text):
+    """Read the expected digest from the content of a .md5 file ("<digest>  <file name>").
+
+    Parameter:
+        md5Text = Content of the .md5 file.
+
+    Return:
+        Returns the hexadecimal MD5 digest, or None if the content is empty."""
+    values = md5Text.split()
+    if len(values) == 0:
+        return None
+
+    return values[0].lower()
+
+
+def verifyLocalFile(localFilePath, expected=None):
+    """Verify a local chlorophyll_a file against its MD5 checksum. A file already verified with
+    the same size, modification time and digest is not hashed again.
+
+    Parameters:
+        localFilePath = Path of the chlorophyll_a file in its local year folder.
+        expected = Expected MD5 digest. Read from the local companion .md5 file if not specified.
+
+    Return:
+        Returns True if the file is valid, False if it is not, None if no checksum is available."""
+    localFolder, fileName = os.path.split(localFilePath)
+    if expected is None:
+        md5File = md5Name(fileName, os.listdir(localFolder))
+        if md5File is None:
+            return None
+        with open(os.path.join(localFolder, md5File), 'r') as md5Text:
+            expected = readDigest(md5Text.read())
+        if expected is None:
+            return None
+
+    # Check if file was already verified in its current state
+    fileStat = os.stat(localFilePath)
+    stamp = [fileStat.st_size, int(fileStat.st_mtime), expected]
+    verifiedPath = os.path.join(localFolder, VERIFIED_FILE)
+    with verifiedLock:
+        if os.path.exists(verifiedPath):
+            with open(verifiedPath, 'r') as verifiedFile:
+                if json.load(verifiedFile).get(fileName) == stamp:
+                    return True
+
+    if fileDigest(localFilePath) != expected:
+        logging.info("Checksum of '%s' does not match '%s'", localFilePath, expected)
+        return False
+    recordVerified(localFilePath, expected)
+
+    return True
+
+
+def verifiedRecord(localFilePath):
+    """Read the verified record of a chlorophyll_a file from the verified file of its year folder. The record is kept once the
+    file is ingested into the regional store and deleted.
+
+    Parameter:
+        localFilePath = Path of the chlorophyll_a file in its local year folder.
+
+    Return:
+        Returns the [size, mtime, digest] record of the file when it was verified, None if it was never verified."""
+    localFolder, fileName = os.path.split(localFilePath)
+    verifiedPath = os.path.join(localFolder, VERIFIED_FILE)
+    with verifiedLock:
+        if not os.path.exists(verifiedPath):
+            return None
+        with open(verifiedPath, 'r') as verifiedFile:
+            return json.load(verifiedFile).get(fileName)
+
+
+def recordVerified(localFilePath, digest):
+    """Record a verified chlorophyll_a file in the verified file of its year folder.
+
+    Parameters:
+        localFilePath = Path of the verified chlorophyll_a file in its local year folder.
+        digest = MD5 digest of the file.
+
+    Return:
+        No return"""
+    localFolder, fileName = os.path.split(localFilePath)
+    fileStat = os.stat(localFilePath)
+    verifiedPath = os.path.join(localFolder, VERIFIED_FILE)
+    with verifiedLock:
+        verified = {}
+        if os.path.exists(verifiedPath):
+            with open(verifiedPath, 'r') as verifiedFile:
+                verified = json.load(verifiedFile)
+        verified[fileName] = [fileStat.st_size, int(fileStat.st_mtime), digest]
+
+        # Write records to a temporary file, then move it into place
+        tempPath = verifiedPath + ".tmp"
+        with open(tempPath, 'w') as verifiedFile:
+            json.dump(verified, verifiedFile, indent=2)
+        if os.path.exists(verifiedPath):
+            os.remove(verifiedPath)
+        os.rename(tempPath, verifiedPath)
+
+
+class downloadPool(object):
+    """
+    Pool of source sessions downloading chlorophyll_a files from a shared work queue.
+    """
+    def __init__(self, source, localChloro, sessionCount=4, keepalive=60, retries=5, retryDelay=5, cache=None, maxRetryDelay=120, journalPath=None):
+        """Define the download pool.
+
+        Parameters:
+            source = Chlorophyll_a source (see "chloroSource.py": ftpSource, mirrorSource or urlSource).
+            localChloro = The local folder directory, normally named "Chlorophyll", in which the chlorophyll_a data is downloaded.
+            sessionCount = Number of concurrent source sessions (worker threads).
+            keepalive = Idle time (seconds) after which a session is verified (NOOP) before its next command.
+            retries = Number of attempts for each work item.
+            retryDelay = Base delay (seconds) of the exponential backoff before attempting a failed work item again.
+            cache = Optional shared site cache (chloroSource.siteCache) from which files are copied when available, and to which
+            the verified downloads are published.
+            maxRetryDelay = Maximum delay (seconds) of the exponential backoff.
+            journalPath = Optional transfer journal file (JSON lines) to which a record of each work item is appended."""
+        self.source = source
+        self.localChloro = localChloro
+        self.sessionCount = max(1, sessionCount)
+        self.keepalive = keepalive
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.maxRetryDelay = maxRetryDelay
+        self.cache = cache
+        self.journalPath = journalPath
+        self.runId = time.strftime('%Y%m%d%H%M%S') + "_" + str(os.getpid())
+        self.transfers = []
+        # Wall time of the download phase
+        self.wallTime = 0.0
+        self.workQueue = Queue.Queue()
+        self.messages = Queue.Queue()
+        self.lock = threading.Lock()
+        self.queued = set()
+        self.planned = []
+        self.downloaded = []
+        self.failed = []
+        self.retryCount = 0
+        self.cacheCount = 0
+        self.completed = None
+
+    def add(self, remoteDir, fileName=None):
+        """Add a work item to the queue. Items already queued are ignored.
+
+        Parameters:
+            remoteDir = Directory of the source specific to the required year and day of MODIS acquisition.
+            fileName = File to download from the directory. The directory is listed (planning phase) if not specified.
+
+        Return:
+            No return"""
+        with self.lock:
+            if (remoteDir, fileName) in self.queued:
+                return
+            self.queued.add((remoteDir, fileName))
+        self.workQueue.put((remoteDir, fileName))
+
+    def plan(self, remoteDirs, report=None):
+        """Planning phase: list every remote directory once and determine the files not already available locally.
+
+        Parameters:
+            remoteDirs = List of directories of the source (YYYY/DDD) containing the required files.
+            report = Optional function called from the calling thread with each progress message (e.g. arcpy.AddMessage).
+
+        Return:
+            Returns the sorted list of (remote directory, file, size in bytes) of the files to download."""
+        for remoteDir in remoteDirs:
+            self.add(remoteDir)
+        self.run(report)
+
+        return sorted(self.planned)
+
+    def download(self, plannedFiles, report=None, completed=None):
+        """Download phase: fetch each planned file once, in the order of the list.
+
+        Parameters:
+            plannedFiles = List of (remote directory, file, size in bytes) returned by plan.
+            report = Optional function called from the calling thread with each progress message (e.g. arcpy.AddMessage).
+            completed = Optional function called from the worker threads with the local path of each verified file, once moved into place.
+
+        Return:
+            Returns the list of local paths of downloaded files and the list of failed (remote directory, file) items."""
+        self.completed = completed
+        started = time.time()
+        for remoteDir, fileName, size in plannedFiles:
+            self.add(remoteDir, fileName)
+        self.run(report)
+        self.wallTime += time.time() - started
+
+        return self.downloaded, self.failed
+
+    def run(self, report=None):
+        """Start the worker threads and wait until every queued work item is processed.
+
+        Parameter:
+            report = Optional function called from the calling thread with each progress message (e.g. arcpy.AddMessage).
+
+        Return:
+            No return"""
+        threads = []
+        for i in range(self.sessionCount):
+            thread = threading.Thread(target=self.worker, name="chloroSession" + str(i + 1))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        # Relay progress messages from the calling thread until every work item is done
+        while any(thread.is_alive() for thread in threads) or not self.messages.empty():
+            try:
+                message = self.messages.get(timeout=0.1)
+            except Queue.Empty:
+                continue
+            if report is not None:
+                report(message)
+
+    def worker(self):
+        """Worker thread: runs a source session processing work items until the queue is empty.
+
+        Return:
+            No return"""
+        session = None
+        lastCommand = 0
+        while True:
+            try:
+                item = self.workQueue.get(timeout=0.1)
+            except Queue.Empty:
+                if self.workQueue.unfinished_tasks == 0:
+                    break
+                continue
+            started = time.time()
+            errors = []
+            result = None
+            try:
+                for tries in range(self.retries):
+                    try:
+                        # Verify idle session before using it again
+                        if session is not None and time.time() - lastCommand > self.keepalive:
+                            self.source.noop(session)
+                        if session is None:
+                            session = self.source.connect()
+                            logging.info("Session established to %s (%s)", self.source.name, threading.current_thread().name)
+                        result = self.process(session, item)
+                        lastCommand = time.time()
+                        break
+                    except self.source.errors + (checksumError, EnvironmentError) as e:
+                        # Source errors, checksum mismatches and local file errors (e.g. rename of the .part file) are retried
+                        logging.info("Download error on '%s' (attempt %d of %d): %s", str(item), tries + 1, self.retries, str(e))
+                        errors.append((e.__class__.__name__, str(e)))
+                        with self.lock:
+                            self.retryCount += 1
+                        if session is not None:
+                            try:
+                                self.source.close(session)
+                            except self.source.errors + (EnvironmentError,):
+                                pass
+                        session = None
+                        if tries < self.retries - 1:
+                            delay = self.backoff(tries)
+                            self.messages.put('\n --------------------ERROR: FAILED ATTEMPT #{a} of {n} FOR {i}. WILL ATTEMPT AGAIN IN {x} SECONDS-----------------\n'.format(a=tries + 1, n=self.retries, i=item, x=round(delay, 1)))
+                            time.sleep(delay)
+                        else:
+                            self.messages.put('\n --------------------ERROR: FAILED ATTEMPT #{a} of {n} FOR {i}. GIVING UP-----------------\n'.format(a=tries + 1, n=self.retries, i=item))
+                    except Exception as e:
+                        # Unexpected error: the item fails without further attempts, the worker keeps processing the queue
+                        logging.exception("Unexpected error on '%s'", str(item))
+                        errors.append((e.__class__.__name__, str(e)))
+                        self.messages.put('\n --------------------ERROR: UNEXPECTED ERROR FOR {i}: {e}. GIVING UP-----------------\n'.format(i=item, e=e))
+                        session = None
+                        break
+            finally:
+                if result is None:
+                    with self.lock:
+                        self.failed.append(item)
+                self.recordTransfer(item, result, errors, time.time() - started)
+                self.workQueue.task_done()
+
+        if session is not None:
+            try:
+                self.source.close(session)
+            except self.source.errors + (EnvironmentError,):
+                pass
+
+    def backoff(self, tries):
+        """Determine the delay before a new attempt: exponential backoff with full jitter, so sessions failing together
+        (e.g. when the source drops every connection) do not retry together.
+
+        Parameter:
+            tries = Number of the failed attempt (0 for the first attempt).
+
+        Return:
+            Returns the delay (seconds), drawn between 0 and retryDelay x 2^tries (at most maxRetryDelay)."""
+        return random.uniform(0, min(self.maxRetryDelay, self.retryDelay * 2 ** tries))
+
+    def process(self, session, item):
+        """Process a work item with a source session.
+
+        Parameters:
+            session = The source session of the worker thread.
+            item = Work item (remote directory, file).
+
+        Return:
+            Returns a dictionary describing the transfer (see listDirectory and downloadFile)."""
+        remoteDir, fileName = item
+        if fileName is None:
+            return self.listDirectory(session, remoteDir)
+        else:
+            return self.downloadFile(session, remoteDir, fileName)
+
+    def recordTransfer(self, item, result, errors, duration):
+        """Record a processed work item in the transfer journal (one JSON record per line) and in the transfers of the run.
+
+        Parameters:
+            item = Work item (remote directory, file).
+            result = Dictionary returned by process, None if every attempt failed.
+            errors = List of (error class, error message) of the failed attempts.
+            duration = Time (seconds) spent on the work item, including every attempt and backoff delay.
+
+        Return:
+            No return"""
+        remoteDir, fileName = item
+        transfer = {"run": self.runId,
+                    "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    "kind": "list" if fileName is None else "download",
+                    "day": '/'.join(remoteDir.rstrip('/').split('/')[-2:]),
+                    "file": fileName,
+                    "status": "failed" if result is None else "ok",
+                    "attempts": len(errors) + (0 if result is None else 1),
+                    "errorClasses": [error[0] for error in errors],
+                    "errors": [error[1] for error in errors],
+                    "duration": round(duration, 3),
+                    "bytes": 0,
+                    "throughput": 0.0,
+                    "session": threading.current_thread().name}
+        if result is not None:
+            transfer.update(result)
+            if duration > 0:
+                transfer["throughput"] = round(transfer["bytes"] / duration, 1)
+        with self.lock:
+            self.transfers.append(transfer)
+            if self.journalPath is not None:
+                with open(self.journalPath, 'a') as journal:
+                    journal.write(json.dumps(transfer, sort_keys=True) + "\n")
+
+    def summaryReport(self, slowest=5):
+        """Summarize the transfers of the run: volume, aggregate and per-file throughput, retries, errors and slowest days.
+
+        Parameter:
+            slowest = Number of slowest days reported.
+
+        Return:
+            Returns the list of lines of the report."""
+        downloads = [transfer for transfer in self.transfers if transfer["kind"] == "download"]
+        done = [transfer for transfer in downloads if transfer["status"] == "ok"]
+        totalBytes = sum([transfer["bytes"] for transfer in done])
+        busyTime = sum([transfer["duration"] for transfer in downloads])
+        wallTime = self.wallTime
+        lines = ["Transfer summary (" + self.source.name + ", " + str(self.sessionCount) + " sessions):"]
+        lines.append("  " + str(len(done)) + " of " + str(len(downloads)) + " files transferred, " + str(round(totalBytes / 1000000.0, 1)) + " MB in " + str(round(wallTime, 1)) + " s")
+        if wallTime > 0 and busyTime > 0:
+            lines.append("  Aggregate throughput: " + str(round(totalBytes / 1000000.0 / wallTime, 2)) + " MB/s, per session: " + str(round(totalBytes / 1000000.0 / busyTime, 2)) + " MB/s, session utilization: " + str(round(busyTime / (wallTime * self.sessionCount) * 100, 0)) + " %")
+        lines.append("  Copied from site cache: " + str(len([transfer for transfer in done if transfer.get("source") == "cache"])) + ", resumed: " + str(len([transfer for transfer in done if transfer.get("offset", 0) > 0])))
+        lines.append("  Attempts: " + str(sum([transfer["attempts"] for transfer in self.transfers])) + " for " + str(len(self.transfers)) + " items, failed attempts: " + str(self.retryCount))
+        errorClasses = {}
+        for transfer in self.transfers:
+            for errorClass in transfer["errorClasses"]:
+                errorClasses[errorClass] = errorClasses.get(errorClass, 0) + 1
+        if len(errorClasses) > 0:
+            lines.append("  Errors by class: " + ", ".join([errorClass + " = " + str(count) for errorClass, count in sorted(errorClasses.items())]))
+
+        # Slowest days, by throughput of their data files
+        days = {}
+        for transfer in downloads:
+            if transfer["file"].endswith(".md5"):
+                continue
+            day = days.setdefault(transfer["day"], [0, 0.0, 0])
+            day[0] += transfer["bytes"]
+            day[1] += transfer["duration"]
+            day[2] += transfer["attempts"]
+        ranked = sorted([(day[0] / day[1] if day[1] > 0 else 0.0, name, day) for name, day in days.items()])[:slowest]
+        if len(ranked) > 0:
+            lines.append("  Slowest days:")
+            for throughput, name, day in ranked:
+                lines.append("    " + name + ": " + str(round(throughput / 1000000.0, 2)) + " MB/s, " + str(round(day[1], 1)) + " s, " + str(day[2]) + " attempts")
+
+        return lines
+
+    def listDirectory(self, session, remoteDir):
+        """List the files of a remote directory and plan the download of those not already available locally.
+
+        Parameters:
+            session = The source session of the worker thread.
+            remoteDir = Directory of the source specific to the required year and day of MODIS acquisition.
+
+        Return:
+            No return"""
+        # List all files in current source directory (should be 1x .nc file and 1x .md5 file)
+        files = self.source.listDirectory(session, remoteDir)
+        logging.info("Directory '%s' contains following files to download: '%s'", remoteDir, str(files))
+        for fileName in files:
+            localFilePath = self.localPath(remoteDir, fileName)
+            if os.path.exists(localFilePath):
+
+                # Verify existing data file, and download it again if it does not match its checksum
+                valid = True
+                if not fileName.endswith(".md5"):
+                    expected = self.expectedDigest(session, remoteDir, localFilePath, files)
+                    if expected is not None:
+                        valid = verifyLocalFile(localFilePath, expected)
+                if valid:
+                    self.messages.put(fileName + " already downloaded.")
+                    logging.info("'%s' already downloaded", fileName)
+                    continue
+                self.messages.put(fileName + " does not match its checksum and will be downloaded again.")
+                os.remove(localFilePath)
+            size = self.source.size(session, remoteDir, fileName)
+            with self.lock:
+                self.planned.append((remoteDir, fileName, size))
+
+        return {"files": len(files)}
+
+    def downloadFile(self, session, remoteDir, fileName):
+        """Download a file from a remote directory to a .part file of the local year folder, resuming a previous partial
+        download, then verify it and move it into place. Data files available in the site cache are copied from the cache.
+
+        Parameters:
+            session = The source session of the worker thread.
+            remoteDir = Directory of the source specific to the required year and day of MODIS acquisition.
+            fileName = File to download.
+
+        Return:
+            Returns a dictionary of the bytes transferred, the origin of the file ("source" or "cache") and the resume offset."""
+        localFilePath = self.localPath(remoteDir, fileName)
+        localFolderPath = os.path.dirname(localFilePath)
+        partPath = localFilePath + ".part"
+        offset = 0
+
+        # Check if year folder already exists or needs to be created on local directory
+        with self.lock:
+            if not os.path.exists(localFolderPath):
+                os.makedirs(localFolderPath)
+                logging.info("'%s' created for file download", localFolderPath)
+
+        # Determine checksum of data file (not available for .md5 files)
+        expected = None
+        if not fileName.endswith(".md5"):
+            expected = self.expectedDigest(session, remoteDir, localFilePath)
+            if expected is None:
+                logging.info("No checksum available for '%s', file not verified", fileName)
+
+        # Copy file from site cache, if fetched before by anyone on the site
+        fromCache = False
+        if self.cache is not None and expected is not None and self.cache.fetch(expected, partPath):
+            if fileDigest(partPath) == expected:
+                fromCache = True
+                self.messages.put(fileName + " copied from site cache.")
+                logging.info("'%s' copied from site cache", fileName)
+                with self.lock:
+                    self.cacheCount += 1
+            else:
+                os.remove(partPath)
+                logging.info("Site cache copy of '%s' does not match its checksum", fileName)
+
+        if not fromCache:
+            # Determine offset of partial download to resume
+            size = self.source.size(session, remoteDir, fileName)
+            if os.path.exists(partPath):
+                offset = os.path.getsize(partPath)
+                if offset > size:
+                    os.remove(partPath)
+                    offset = 0
+
+            if offset < size:
+                if offset > 0:
+                    self.messages.put("Resuming download of " + fileName + " at " + str(offset) + " of " + str(size) + " bytes...")
+                    logging.info("Resuming download of '%s' at %d bytes (%s)", fileName, offset, threading.current_thread().name)
+                else:
+                    self.messages.put("Downloading " + fileName + "...")
+                    logging.info("Starting download of '%s' (%s)", fileName, threading.current_thread().name)
+                with open(partPath, 'ab') as localFile:
+                    self.source.retrieve(session, remoteDir, fileName, localFile.write, offset)
+
+            # Verify data file against its checksum, the partial download is restarted if it does not match
+            if expected is not None:
+                digest = fileDigest(partPath)
+                if digest != expected:
+                    os.remove(partPath)
+                    raise checksumError(fileName + " does not match its checksum (" + digest + " instead of " + expected + ")")
+
+        # Move verified file into place, and publish it to the site cache
+        if os.path.exists(localFilePath):
+            os.remove(localFilePath)
+        os.rename(partPath, localFilePath)
+        if expected is not None:
+            recordVerified(localFilePath, expected)
+            if self.cache is not None and not fromCache:
+                self.cache.publish(localFilePath, expected, fileName)
+        with self.lock:
+            self.downloaded.append(localFilePath)
+        logging.info("Download of '%s' complete", fileName)
+        if self.completed is not None:
+            self.completed(localFilePath)
+
+        return {"bytes": os.path.getsize(localFilePath) - offset, "source": "cache" if fromCache else "source", "offset": offset}
+
+    def expectedDigest(self, session, remoteDir, localFilePath, remoteFiles=None):
+        """Determine the expected MD5 digest of a data file from its companion .md5 file, read from the local year folder
+        if already downloaded, otherwise from the site cache index or the remote directory.
+
+        Parameters:
+            session = The source session of the worker thread.
+            remoteDir = Directory of the source containing the file.
+            localFilePath = Local path of the data file.
+            remoteFiles = Names of the files of the remote directory, if already listed.
+
+        Return:
+            Returns the hexadecimal MD5 digest, or None if no .md5 file is available."""
+        localFolder, fileName = os.path.split(localFilePath)
+        md5File = md5Name(fileName, os.listdir(localFolder))
+        if md5File is not None:
+            with open(os.path.join(localFolder, md5File), 'r') as md5Text:
+                return readDigest(md5Text.read())
+        if self.cache is not None:
+            digest = self.cache.lookup(fileName)
+            if digest is not None:
+                return digest
+
+        # Read .md5 file from remote directory
+        if remoteFiles is None:
+            remoteFiles = self.source.listDirectory(session, remoteDir)
+        md5File = md5Name(fileName, remoteFiles)
+        if md5File is None:
+            return None
+        md5Text = []
+        self.source.retrieve(session, remoteDir, md5File, md5Text.append)
+
+        return readDigest(b''.join(md5Text).decode('ascii', 'ignore'))
+
+    def localPath(self, remoteDir, fileName):
+        """Determine the local path of a file, within the year folder of its remote directory (.../YYYY/DDD).
+
+        Parameters:
+            remoteDir = Directory of the source specific to the required year and day of MODIS acquisition.
+            fileName = File name.
+
+        Return:
+            Returns the local file path."""
+        year = remoteDir.rstrip('/').split('/')[-2]
+
+        return os.path.join(self.localChloro, year, fileName)
@@ -0,0 +1,358 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 chlorophyll_a tools, 2017.                            #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "chloroDownload.py" download pool, and by the
+"getChloro.py" and "streamChloro.py" script tools to open the chlorophyll_a source
+given by the user.
+
+SUMMARY
+Provides the sources from which the MODIS chlorophyll_a files are obtained, all
+organised in "YYYY/DDD" directories as on the MODIS FTP site:
+- ftpSource: FTP site (e.g. "podaac-ftp.jpl.nasa.gov/allData/.../daily/" or
+"ftp://host/path/").
+- mirrorSource: Local or network (NFS/SMB) mirror folder (e.g. "\\\\server\\modis\\daily"
+or "file:///mnt/modis/daily"). Also used as an offline test fixture.
+- urlSource: Plain file URLs over HTTP(S) (e.g. "https://host/path/daily/"), the
+directories being listed from their index pages.
+
+Every source provides the same session operations (connect, noop, close,
+listDirectory, size, retrieve) used by the download pool, and the tuple of errors
+after which the pool retries.
+
+The site cache (siteCache) is a content-addressed folder shared by every analyst of
+the site (e.g. on a network drive). Each verified file is published under its MD5
+digest ("objects/<dd>/<digest>") with an index of the digest of each file name
+("names/<file>.md5"). A file already fetched by anyone on the site is copied from
+the cache instead of being transferred from the source.
+
+INPUT
+- Chlorophyll_a Source (automated input): FTP directory, URL or mirror folder.
+
+- Site Cache Folder (automated input): Shared folder of the site cache.
+
+OUTPUT
+- Site Cache (automated output): Files published in the site cache.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- openSource
+- ftpSource
+- mirrorSource
+- urlSource
+- siteCache"""
+
+# Libraries
+# =========
+import os
+import re
+import shutil
+import socket
+import ftplib
+import httplib
+import urllib
+import urllib2
+import urlparse
+import threading
+from ftplib import FTP
+
+
+def openSource(location):
+    """Open the chlorophyll_a source given by a location string.
+
+    Parameter:
+        location = FTP directory ("host/path/" or "ftp://host/path/"), URL ("http(s)://host/path/", "file:///path/") or
+        existing local or network mirror folder.
+
+    Return:
+        Returns the source object and the source directory (string) to which the "YYYY/DDD" sub-directories are appended."""
+    scheme = urlparse.urlparse(location).scheme.lower()
+    if scheme == "file":
+        return mirrorSource(urllib.url2pathname(urlparse.urlparse(location).path)), '/'
+    if scheme in ("http", "https"):
+        parts = urlparse.urlparse(location)
+        return urlSource(parts.scheme + "://" + parts.netloc), parts.path.rstrip('/') + '/'
+    if scheme not in ("ftp", "http", "https") and os.path.isdir(location):
+        # Windows drive letters are parsed as a scheme
+        return mirrorSource(location), '/'
+
+    # FTP address of host site, then FTP file directory pointing to daily chlorophyll_a data
+    if scheme == "ftp":
+        location = location[len("ftp://"):]
+    host = location.split('/')[0]
+    port = 21
+    if ':' in host:
+        host, port = host.split(':')[0], int(host.split(':')[1])
+
+    return ftpSource(host, port), '/' + '/'.join(location.split('/')[1:])
+
+
+class ftpSource(object):
+    """
+    FTP site, with one authenticated session per worker thread.
+    """
+    errors = ftplib.all_errors
+
+    def __init__(self, host, port=21):
+        self.host = host
+        self.port = port
+        self.name = "ftp site " + host
+
+    def connect(self):
+        """Open and authenticate a new FTP session.
+
+        Return:
+            Returns the ftp connection object."""
+        ftp = FTP()
+        ftp.connect(self.host, self.port)
+        ftp.login()
+        ftp.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ftp.chloroDir = None
+
+        return ftp
+
+    def noop(self, ftp):
+        """Verify an idle session."""
+        ftp.voidcmd("NOOP")
+
+    def close(self, ftp):
+        """Close a session."""
+        try:
+            ftp.quit()
+        except ftplib.all_errors:
+            ftp.close()
+
+    def changeDirectory(self, ftp, remoteDir):
+        """Change the working directory of a session, if not already in the directory."""
+        if ftp.chloroDir != remoteDir:
+            ftp.cwd(remoteDir)
+            ftp.chloroDir = remoteDir
+
+    def listDirectory(self, ftp, remoteDir):
+        """List the file names of a remote directory."""
+        self.changeDirectory(ftp, remoteDir)
+
+        return ftp.nlst()
+
+    def size(self, ftp, remoteDir, fileName):
+        """Determine the size (bytes) of a remote file."""
+        self.changeDirectory(ftp, remoteDir)
+
+        return ftp.size(fileName)
+
+    def retrieve(self, ftp, remoteDir, fileName, callback, offset=0):
+        """Retrieve a remote file from an offset (REST), passing each block of data to the callback."""
+        self.changeDirectory(ftp, remoteDir)
+        ftp.retrbinary('RETR ' + fileName, callback, rest=offset if offset > 0 else None)
+
+
+class mirrorSource(object):
+    """
+    Local or network mirror folder, organised in "YYYY/DDD" directories.
+    """
+    errors = (IOError, OSError)
+
+    def __init__(self, root):
+        self.root = root
+        self.name = "mirror folder " + root
+
+    def connect(self):
+        """No session required: returns the mirror folder."""
+        if not os.path.isdir(self.root):
+            raise IOError("Mirror folder not available: " + self.root)
+
+        return self.root
+
+    def noop(self, root):
+        return
+
+    def close(self, root):
+        return
+
+    def directoryPath(self, remoteDir):
+        """Determine the folder of a "YYYY/DDD" directory of the mirror."""
+        return os.path.join(self.root, *[part for part in remoteDir.split('/') if part])
+
+    def listDirectory(self, root, remoteDir):
+        """List the file names of a directory of the mirror (no file if the directory does not exist)."""
+        directoryPath = self.directoryPath(remoteDir)
+        if not os.path.isdir(directoryPath):
+            return []
+
+        return sorted(os.listdir(directoryPath))
+
+    def size(self, root, remoteDir, fileName):
+        """Determine the size (bytes) of a file of the mirror."""
+        return os.path.getsize(os.path.join(self.directoryPath(remoteDir), fileName))
+
+    def retrieve(self, root, remoteDir, fileName, callback, offset=0):
+        """Read a file of the mirror from an offset, passing each block of data to the callback."""
+        with open(os.path.join(self.directoryPath(remoteDir), fileName), 'rb') as sourceFile:
+            sourceFile.seek(offset)
+            for block in iter(lambda: sourceFile.read(1048576), b''):
+                callback(block)
+
+
+class urlSource(object):
+    """
+    Plain file URLs over HTTP(S), with directories listed from their index pages.
+    """
+    errors = (urllib2.URLError, httplib.HTTPException, socket.error, IOError)
+
+    def __init__(self, baseUrl, timeout=60):
+        self.baseUrl = baseUrl.rstrip('/')
+        self.timeout = timeout
+        self.name = "web site " + baseUrl
+
+    def connect(self):
+        """Returns a URL opener (kept by the worker thread)."""
+        return urllib2.build_opener()
+
+    def noop(self, opener):
+        return
+
+    def close(self, opener):
+        return
+
+    def fileUrl(self, remoteDir, fileName=""):
+        """Determine the URL of a directory or file."""
+        return self.baseUrl + '/' + remoteDir.strip('/') + '/' + urllib.quote(fileName)
+
+    def listDirectory(self, opener, remoteDir):
+        """List the file names of a directory from the links of its index page (no file if the directory does not exist)."""
+        try:
+            response = opener.open(self.fileUrl(remoteDir), timeout=self.timeout)
+        except urllib2.HTTPError as e:
+            if e.code == 404:
+                return []
+            raise
+        page = response.read()
+        response.close()
+        fileNames = set()
+        for link in re.findall(r'href="([^"]+)"', page):
+            fileName = urllib.unquote(link.split('?')[0].rstrip('/').split('/')[-1])
+            if fileName.endswith(".nc") or fileName.endswith(".md5"):
+                fileNames.add(fileName)
+
+        return sorted(fileNames)
+
+    def size(self, opener, remoteDir, fileName):
+        """Determine the size (bytes) of a file from the headers of a HEAD request."""
+        request = urllib2.Request(self.fileUrl(remoteDir, fileName))
+        request.get_method = lambda: "HEAD"
+        response = opener.open(request, timeout=self.timeout)
+        size = int(response.info().getheader("Content-Length"))
+        response.close()
+
+        return size
+
+    def retrieve(self, opener, remoteDir, fileName, callback, offset=0):
+        """Retrieve a file from an offset (Range request), passing each block of data to the callback."""
+        request = urllib2.Request(self.fileUrl(remoteDir, fileName))
+        if offset > 0:
+            request.add_header("Range", "bytes=" + str(offset) + "-")
+        response = opener.open(request, timeout=self.timeout)
+        try:
+            # Skip the beginning of the file if the server does not support Range requests
+            skip = offset if offset > 0 and response.getcode() != 206 else 0
+            for block in iter(lambda: response.read(1048576), b''):
+                if skip > 0:
+                    block, skip = block[skip:], max(0, skip - len(block))
+                if len(block) > 0:
+                    callback(block)
+        finally:
+            response.close()
+
+
+class siteCache(object):
+    """
+    Content-addressed cache of verified chlorophyll_a files, shared by every analyst of the site.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+
+    def objectPath(self, digest):
+        """Determine the path of the cached file of an MD5 digest."""
+        return os.path.join(self.folder, "objects", digest[:2], digest)
+
+    def namePath(self, fileName):
+        """Determine the path of the digest index of a file name."""
+        return os.path.join(self.folder, "names", fileName + ".md5")
+
+    def lookup(self, fileName):
+        """Determine the digest of a file name from the index.
+
+        Parameter:
+            fileName = Name of the chlorophyll_a file.
+
+        Return:
+            Returns the hexadecimal MD5 digest if the file is in the cache, None otherwise."""
+        namePath = self.namePath(fileName)
+        if not os.path.exists(namePath):
+            return None
+        with open(namePath, 'r') as nameFile:
+            values = nameFile.read().split()
+        if len(values) == 0 or not os.path.exists(self.objectPath(values[0])):
+            return None
+
+        return values[0]
+
+    def fetch(self, digest, targetPath):
+        """Copy the cached file of a digest.
+
+        Parameters:
+            digest = Hexadecimal MD5 digest of the file.
+            targetPath = Path to which the file is copied.
+
+        Return:
+            Returns True if the file was copied, False if it is not in the cache."""
+        objectPath = self.objectPath(digest)
+        if not os.path.exists(objectPath):
+            return False
+        shutil.copyfile(objectPath, targetPath)
+
+        return True
+
+    def publish(self, filePath, digest, fileName):
+        """Publish a verified file in the cache, under its digest, and index its name. Files are written to a temporary
+        name and then moved into place, so other analysts never read a partial file.
+
+        Parameters:
+            filePath = Path of the verified file.
+            digest = Hexadecimal MD5 digest of the file.
+            fileName = Name of the chlorophyll_a file.
+
+        Return:
+            No return"""
+        tempSuffix = ".tmp" + str(os.getpid()) + "_" + str(threading.current_thread().ident)
+        objectPath = self.objectPath(digest)
+        if not os.path.exists(objectPath):
+            if not os.path.exists(os.path.dirname(objectPath)):
+                try:
+                    os.makedirs(os.path.dirname(objectPath))
+                except OSError:
+                    pass
+            shutil.copyfile(filePath, objectPath + tempSuffix)
+            self.moveIntoPlace(objectPath + tempSuffix, objectPath)
+
+        namePath = self.namePath(fileName)
+        if not os.path.exists(namePath):
+            if not os.path.exists(os.path.dirname(namePath)):
+                try:
+                    os.makedirs(os.path.dirname(namePath))
+                except OSError:
+                    pass
+            with open(namePath + tempSuffix, 'w') as nameFile:
+                nameFile.write(digest + "  " + fileName + "\n")
+            self.moveIntoPlace(namePath + tempSuffix, namePath)
+
+    def moveIntoPlace(self, tempPath, targetPath):
+        """Move a temporary file to its final path, unless another analyst published it first."""
+        try:
+            os.rename(tempPath, targetPath)
+        except OSError:
+            os.remove(tempPath)
@@ -0,0 +1,371 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 chlorophyll_a tools, 2017.                            #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "getChloro.py" script, to ingest the MODIS
+chlorophyll_a files once they are downloaded, and by the "applyChloro.py"
+script, to read the ingested chlorophyll_a values.
+
+SUMMARY
+Converts each global MODIS L3 chlorophyll_a NetCDF file into a compact regional
+store limited to the pertinent region (-160 (W), 40 (S), -40 (E), 89.989002 (N)).
+The regional values are saved once as a float32 numpy array that is memory-mapped
+when read, so each use of a chlorophyll_a day only reads the regional cells
+instead of extracting the region from the global file again. The store of a day is
+a single array rather than a set of chunks: the summed-area table of the focal
+statistics reads every regional cell of the day anyway.
+
+The MD5 digest of a verified NetCDF file (see "chloroDownload.py") is recorded in
+the store metadata. The global files are kept by default, so that the store can be
+created again for another region. When requested ("Delete Global Files Once
+Ingested" option of the "1a_Download Chlorophyll_a NetCDF Files" script tool), the
+verified global files are deleted once ingested, and an up to date store entry
+(whose digest matches the "verified.json" record of the file) makes the day
+available to every tool.
+
+The memory-mapped grids loaded in the current process are closed before their
+store array is replaced, so that the array can be replaced on Windows.
+
+INPUT
+- Chlorophyll_a NetCDF Files (automated input): Global MODIS chlorophyll_a files
+downloaded by the "1a_Download Chlorophyll_a NetCDF Files" script tool in the
+"Auxiliary/Chlorophyll/<year>" folders.
+
+OUTPUT
+- Regional Chlorophyll_a Store (automated output): For each NetCDF file, a
+"<file>.npy" array and a "<file>.json" metadata file placed in a "store" folder
+inside the year folder. The array is stored row by row from the north-west corner,
+with NoData cells set to NaN (the NoData mask of the original file). The metadata
+file records the grid origin (lon/lat), cell size, dimensions, source file and the
+verified digest of the source file. The source file is only deleted once ingested
+when requested.
+
+- Access Markers (automated output): An empty "<file>.access" file in the "store"
+folder, whose modification time records the last use of the chlorophyll_a file
+(see "chloroArchive.py").
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- storePaths
+- readMetadata
+- storeCurrent
+- ingestFile
+- releaseSource
+- ingestFolder
+- listSources
+- closeGrids
+- loadGrid
+- recordAccess
+- lastAccess"""
+
+# Libraries
+# =========
+import arcpy
+import os
+import json
+import math
+import logging
+import weakref
+import numpy
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import chloroDownload                       # get module reference for reload
+reload(chloroDownload)                      # reload step 1
+
+# Extent of the pertinent region (xMin, yMin, xMax, yMax) in geographic coordinates
+REGION = (-160.0, 40.0, -40.0, 89.989002)
+
+# Name of the store folder created inside each chlorophyll_a year folder
+STORE_FOLDER = "store"
+
+# Grids loaded in the current process, by store array path (closed before the array is replaced)
+openGrids = {}
+
+
+class chloroGrid(object):
+    """
+    Regional chlorophyll_a grid read from the store. The values are memory-mapped
+    from the store array, with the grid origin and cell size taken from the metadata.
+    """
+    def __init__(self, dataPath, metadata):
+        self.array = numpy.load(dataPath, mmap_mode='r')
+        self.xMin = metadata["xMin"]
+        self.yMax = metadata["yMax"]
+        self.cellWidth = metadata["cellWidth"]
+        self.cellHeight = metadata["cellHeight"]
+        self.nRows = metadata["nRows"]
+        self.nCols = metadata["nCols"]
+
+    def close(self):
+        """Release the memory-mapped values (the file mapping is closed once no array refers to it)."""
+        self.array = None
+
+
+def storePaths(ncFilePath):
+    """Determine the location of the regional store files of a chlorophyll_a NetCDF file.
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder.
+
+    Return:
+        Returns the paths of the store array (.npy) and metadata (.json) files."""
+    storeFolder = os.path.join(os.path.dirname(ncFilePath), STORE_FOLDER)
+    baseName = os.path.splitext(os.path.basename(ncFilePath))[0]
+
+    return os.path.join(storeFolder, baseName + ".npy"), os.path.join(storeFolder, baseName + ".json")
+
+
+def readMetadata(ncFilePath):
+    """Read the store metadata of a chlorophyll_a NetCDF file.
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder.
+
+    Return:
+        Returns the metadata dictionary, None if the file has no regional store."""
+    dataPath, metaPath = storePaths(ncFilePath)
+    if not os.path.exists(dataPath) or not os.path.exists(metaPath):
+        return None
+    with open(metaPath, 'r') as metaFile:
+        return json.load(metaFile)
+
+
+def storeCurrent(ncFilePath):
+    """Check if the regional store of a chlorophyll_a NetCDF file is up to date. While the NetCDF file exists, the store must
+    have been created from its current version; once the NetCDF file is deleted, the store must record the digest verified
+    for the file ("verified.json" record).
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder (the file may have been deleted).
+
+    Return:
+        Returns True if the store is up to date."""
+    metadata = readMetadata(ncFilePath)
+    if metadata is None:
+        return False
+    if os.path.exists(ncFilePath):
+        ncStat = os.stat(ncFilePath)
+        return metadata["sourceSize"] == ncStat.st_size and metadata["sourceMTime"] == int(ncStat.st_mtime)
+    record = chloroDownload.verifiedRecord(ncFilePath)
+
+    return record is not None and metadata.get("sourceDigest") is not None and record[2] == metadata["sourceDigest"]
+
+
+def ingestFile(ncFilePath):
+    """Convert a global chlorophyll_a NetCDF file to its regional store, if not already done.
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder.
+
+    Return:
+        Returns True if the file was ingested, False if the store was already up to date."""
+    # Check if store already exists for the current version of the NetCDF file
+    if storeCurrent(ncFilePath):
+        return False
+    dataPath, metaPath = storePaths(ncFilePath)
+    ncStat = os.stat(ncFilePath)
+
+    storeFolder = os.path.dirname(dataPath)
+    if not os.path.exists(storeFolder):
+        os.makedirs(storeFolder)
+        logging.info("'%s' created for regional chlorophyll_a store", storeFolder)
+
+    # Make NetCDF raster layer from .nc file
+    layerName = "chloroIngest"
+    arcpy.MakeNetCDFRasterLayer_md(ncFilePath, 'chlor_a', "lon", "lat", layerName)
+    logging.info("Make NetCDF Raster Layer: '%s' raster layer created from '%s'", layerName, ncFilePath)
+    raster = arcpy.Raster(layerName)
+    extent = raster.extent
+    cellWidth = raster.meanCellWidth
+    cellHeight = raster.meanCellHeight
+
+    # Determine the cells of the global grid lying inside the pertinent region
+    firstCol = max(0, int(math.floor((REGION[0] - extent.XMin) / cellWidth)))
+    lastCol = min(raster.width, int(math.ceil((REGION[2] - extent.XMin) / cellWidth)))
+    firstRow = max(0, int(math.floor((extent.YMax - REGION[3]) / cellHeight)))
+    lastRow = min(raster.height, int(math.ceil((extent.YMax - REGION[1]) / cellHeight)))
+    nCols = lastCol - firstCol
+    nRows = lastRow - firstRow
+    xMin = extent.XMin + firstCol * cellWidth
+    yMax = extent.YMax - firstRow * cellHeight
+    lowerLeft = arcpy.Point(xMin, yMax - nRows * cellHeight)
+
+    # Read regional values only and write them to the store (temporary name, then moved into place)
+    chloroArray = arcpy.RasterToNumPyArray(raster, lowerLeft, nCols, nRows, numpy.nan).astype(numpy.float32)
+    tempPath = dataPath + ".tmp"
+    with open(tempPath, 'wb') as dataFile:
+        numpy.save(dataFile, chloroArray)
+    if os.path.exists(dataPath):
+        # A mapped file cannot be replaced on Windows
+        closeGrids(dataPath)
+        os.remove(dataPath)
+    os.rename(tempPath, dataPath)
+
+    # Digest of the source file, if it was verified in its current version
+    record = chloroDownload.verifiedRecord(ncFilePath)
+    sourceDigest = None
+    if record is not None and record[:2] == [ncStat.st_size, int(ncStat.st_mtime)]:
+        sourceDigest = record[2]
+
+    metadata = {"source": os.path.basename(ncFilePath),
+                "sourceSize": ncStat.st_size,
+                "sourceMTime": int(ncStat.st_mtime),
+                "sourceDigest": sourceDigest,
+                "wkid": 4326,
+                "xMin": xMin,
+                "yMax": yMax,
+                "cellWidth": cellWidth,
+                "cellHeight": cellHeight,
+                "nRows": nRows,
+                "nCols": nCols,
+                "dtype": "float32",
+                "noData": "NaN"}
+    with open(metaPath, 'w') as metaFile:
+        json.dump(metadata, metaFile, indent=2)
+    arcpy.Delete_management(layerName)
+    logging.info("Ingest: '%s' regional store (%d x %d cells) created from '%s'", dataPath, nRows, nCols, ncFilePath)
+
+    return True
+
+
+def releaseSource(ncFilePath):
+    """Delete a global chlorophyll_a NetCDF file once it is verified and ingested, the regional store holding its values.
+    Files without a verified digest are kept.
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder.
+
+    Return:
+        Returns True if the NetCDF file was deleted."""
+    if not os.path.exists(ncFilePath) or not storeCurrent(ncFilePath):
+        return False
+    ncStat = os.stat(ncFilePath)
+    record = chloroDownload.verifiedRecord(ncFilePath)
+    if record is None or record[:2] != [ncStat.st_size, int(ncStat.st_mtime)]:
+        return False
+
+    # Record the verified digest in the metadata of stores created before the digest was recorded
+    metadata = readMetadata(ncFilePath)
+    if metadata.get("sourceDigest") != record[2]:
+        metadata["sourceDigest"] = record[2]
+        with open(storePaths(ncFilePath)[1], 'w') as metaFile:
+            json.dump(metadata, metaFile, indent=2)
+    os.remove(ncFilePath)
+    logging.info("Ingest: '%s' deleted, values kept in regional store (digest %s)", ncFilePath, record[2])
+
+    return True
+
+
+def ingestFolder(chloroYearFolder, releaseSources=False):
+    """Ingest every chlorophyll_a NetCDF file of a year folder that does not yet have an up to date regional store.
+
+    Parameters:
+        chloroYearFolder = Chlorophyll_a year folder ("Auxiliary/Chlorophyll/<year>").
+        releaseSources = Boolean indicating whether the verified NetCDF files are deleted once ingested (kept by default).
+
+    Return:
+        Returns the number of files ingested."""
+    ingestCount = 0
+    for ncFile in sorted(os.listdir(chloroYearFolder)):
+        if ncFile.endswith(".nc"):
+            ncFilePath = os.path.join(chloroYearFolder, ncFile)
+            if ingestFile(ncFilePath):
+                ingestCount += 1
+            if releaseSources:
+                releaseSource(ncFilePath)
+
+    return ingestCount
+
+
+def listSources(chloroYearFolder):
+    """List the chlorophyll_a NetCDF files of a year folder, whether the file itself or only its regional store remains.
+
+    Parameter:
+        chloroYearFolder = Chlorophyll_a year folder ("Auxiliary/Chlorophyll/<year>").
+
+    Return:
+        Returns the sorted list of NetCDF file names."""
+    if not os.path.isdir(chloroYearFolder):
+        return []
+    ncFiles = set([fileName for fileName in os.listdir(chloroYearFolder) if fileName.endswith(".nc")])
+    storeFolder = os.path.join(chloroYearFolder, STORE_FOLDER)
+    if os.path.isdir(storeFolder):
+        for fileName in os.listdir(storeFolder):
+            baseName, extension = os.path.splitext(fileName)
+            if extension == ".json" and os.path.exists(os.path.join(storeFolder, baseName + ".npy")):
+                ncFiles.add(baseName + ".nc")
+
+    return sorted(ncFiles)
+
+
+def closeGrids(dataPath):
+    """Close the grids loaded in the current process from a store array.
+
+    Parameter:
+        dataPath = Path of the store array (.npy).
+
+    Return:
+        No return"""
+    for grid in list(openGrids.pop(dataPath, [])):
+        grid.close()
+
+
+def loadGrid(ncFilePath):
+    """Load the regional store of a chlorophyll_a NetCDF file, ingesting the file first if required.
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder (the file may have been deleted once ingested).
+
+    Return:
+        Returns a chloroGrid object of the regional chlorophyll_a values."""
+    ingestFile(ncFilePath)
+    recordAccess(ncFilePath)
+    dataPath, metaPath = storePaths(ncFilePath)
+    with open(metaPath, 'r') as metaFile:
+        metadata = json.load(metaFile)
+
+    grid = chloroGrid(dataPath, metadata)
+    openGrids.setdefault(dataPath, weakref.WeakSet()).add(grid)
+
+    return grid
+
+
+def recordAccess(ncFilePath):
+    """Record the use of a chlorophyll_a NetCDF file by updating the modification time of its access marker.
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder.
+
+    Return:
+        No return"""
+    accessPath = os.path.splitext(storePaths(ncFilePath)[0])[0] + ".access"
+    storeFolder = os.path.dirname(accessPath)
+    if not os.path.exists(storeFolder):
+        os.makedirs(storeFolder)
+    open(accessPath, 'a').close()
+    os.utime(accessPath, None)
+
+
+def lastAccess(ncFilePath):
+    """Determine the last use of a chlorophyll_a NetCDF file (download or ingest, or access marker, whichever is more recent).
+
+    Parameter:
+        ncFilePath = Path of the chlorophyll_a NetCDF file in its year folder (the file may have been deleted once ingested).
+
+    Return:
+        Returns the time of last use (seconds since epoch)."""
+    dataPath, metaPath = storePaths(ncFilePath)
+    accessTime = 0
+    if os.path.exists(ncFilePath):
+        accessTime = os.path.getmtime(ncFilePath)
+    elif os.path.exists(metaPath):
+        accessTime = os.path.getmtime(metaPath)
+    accessPath = os.path.splitext(dataPath)[0] + ".access"
+    if os.path.exists(accessPath):
+        accessTime = max(accessTime, os.path.getmtime(accessPath))
+
+    return accessTime
\ No newline at end of file
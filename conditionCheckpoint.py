@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "condition_darkTargets.py" script to resume an
+interrupted conditioning of a year folder.
+
+SUMMARY
+Maintains the checkpoints of a yearly data file geodatabase, stored beside it as
+"<year>_checkpoints.json". A checkpoint is recorded each time a conditioning stage
+(loading of the dark targets, parsing of overlapping targets and of regions that
+do not overlap, evaluation of attributes and merge of areas) completes for the
+acquisition dates it was executed for, with the fingerprint of the inputs of each
+date: the signatures of the image folders of the date and, for the stages after
+the loading, the conditioning settings.
+
+When the tool is executed again after an interruption, the (stage, date) units
+whose checkpoint matches the fingerprint of their inputs are skipped; each stage
+is executed once for its incomplete acquisition dates, whose partial outputs are
+discarded first. A unit executed again invalidates the checkpoints of the
+following stages of its acquisition date.
+
+INPUT
+- Image Signatures (automated input): Shapefile signature of every image folder,
+from the ingest manifest module.
+
+- Conditioning Settings (automated input): Tool parameters affecting the outputs
+of the conditioning stages.
+
+OUTPUT
+- Checkpoints (automated output): Completed (stage, date) units and the
+fingerprint of their inputs.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- checkpointPath
+- loadCheckpoints
+- saveCheckpoints
+- dateFingerprint
+- isComplete
+- markComplete
+- invalidate
+- clearDates"""
+
+# Libraries
+# =========
+import os
+import json
+import hashlib
+
+# Conditioning stages, in order of execution
+STAGES = ["loadDarkTargets", "parseOverlap", "parseNoOverlap", "evalAttributes", "mergeAreas"]
+
+
+def checkpointPath(gdbWorkspace):
+    """Determine the path of the checkpoints of a yearly GDB.
+
+    Parameter:
+        gdbWorkspace = Path of the yearly data file geodatabase (e.g. "...\\2010.gdb").
+
+    Return:
+        Returns the path of the checkpoints, beside the GDB (e.g. "...\\2010_checkpoints.json")."""
+    return os.path.splitext(gdbWorkspace)[0] + "_checkpoints.json"
+
+
+def loadCheckpoints(gdbWorkspace):
+    """Read the checkpoints of a yearly GDB.
+
+    Parameter:
+        gdbWorkspace = Path of the yearly data file geodatabase.
+
+    Return:
+        Returns the checkpoints dictionary (fingerprint by stage, by acquisition date), empty if the GDB has no checkpoints."""
+    path = checkpointPath(gdbWorkspace)
+    checkpoints = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as checkpointFile:
+                checkpoints = json.load(checkpointFile)
+        except ValueError:
+            # Unreadable checkpoints: every unit is executed again
+            pass
+
+    return checkpoints
+
+
+def saveCheckpoints(gdbWorkspace, checkpoints):
+    """Write the checkpoints of a yearly GDB (to a temporary file first, so an interrupted write keeps the previous checkpoints).
+
+    Parameters:
+        gdbWorkspace = Path of the yearly data file geodatabase.
+        checkpoints = Checkpoints dictionary.
+
+    Return:
+        No return"""
+    path = checkpointPath(gdbWorkspace)
+    if len(checkpoints) == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path + ".tmp", 'w') as checkpointFile:
+        json.dump(checkpoints, checkpointFile, indent=1, sort_keys=True)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + ".tmp", path)
+
+
+def dateFingerprint(date, signatures, settings=None):
+    """Determine the fingerprint of the inputs of an acquisition date.
+
+    Parameters:
+        date = Acquisition date (YYYYMMDD).
+        signatures = Shapefile signature of every image folder (by image name), from the ingest manifest module.
+        settings = List of the conditioning settings affecting the stage (None for the loading of the dark targets).
+
+    Return:
+        Returns the MD5 digest of the image folders of the date, their shapefile hash and the settings."""
+    images = sorted([[imageName, signatures[imageName].get("hash")] for imageName in signatures
+                     if imageName.split("_")[5] == date])
+    content = json.dumps([date, images, settings], sort_keys=True)
+
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+def isComplete(checkpoints, stage, date, fingerprint):
+    """Check whether a (stage, date) unit is complete, with the same inputs.
+
+    Parameters:
+        checkpoints = Checkpoints dictionary.
+        stage = Conditioning stage (one of STAGES).
+        date = Acquisition date (YYYYMMDD).
+        fingerprint = Fingerprint of the inputs of the unit.
+
+    Return:
+        Returns True if the checkpoint of the unit is recorded with the same fingerprint."""
+    return checkpoints.get(date, {}).get(stage) == fingerprint
+
+
+def markComplete(gdbWorkspace, checkpoints, stage, dates, fingerprints):
+    """Record the checkpoints of a stage completed for acquisition dates and write the checkpoints once.
+
+    Parameters:
+        gdbWorkspace = Path of the yearly data file geodatabase.
+        checkpoints = Checkpoints dictionary.
+        stage = Conditioning stage (one of STAGES).
+        dates = List of acquisition dates (YYYYMMDD) for which the stage is complete.
+        fingerprints = Fingerprint of the inputs of the units (by acquisition date).
+
+    Return:
+        No return"""
+    for date in dates:
+        checkpoints.setdefault(date, {})[stage] = fingerprints[date]
+    saveCheckpoints(gdbWorkspace, checkpoints)
+
+
+def invalidate(checkpoints, stage, date):
+    """Remove the checkpoints of a (stage, date) unit about to be executed again and of the following stages of its date,
+    which depend on its outputs.
+
+    Parameters:
+        checkpoints = Checkpoints dictionary.
+        stage = Conditioning stage (one of STAGES).
+        date = Acquisition date (YYYYMMDD).
+
+    Return:
+        No return"""
+    if date not in checkpoints:
+        return
+    for laterStage in STAGES[STAGES.index(stage):]:
+        checkpoints[date].pop(laterStage, None)
+    if len(checkpoints[date]) == 0:
+        del checkpoints[date]
+
+
+def clearDates(gdbWorkspace, checkpoints, dates):
+    """Remove the checkpoints of fully conditioned acquisition dates (recorded in the ingest manifest) and write the checkpoints.
+
+    Parameters:
+        gdbWorkspace = Path of the yearly data file geodatabase.
+        checkpoints = Checkpoints dictionary.
+        dates = Set of conditioned acquisition dates.
+
+    Return:
+        No return"""
+    for date in dates:
+        checkpoints.pop(date, None)
+    saveCheckpoints(gdbWorkspace, checkpoints)
\ No newline at end of file
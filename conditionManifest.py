@@ -0,0 +1,180 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "condition_darkTargets.py" script to condition
+only the new or changed images of a year folder.
+
+SUMMARY
+Maintains the ingest manifest of a yearly data file geodatabase, stored beside it
+as "<year>_manifest.json". The manifest records, for each RADARSAT-2 image folder
+that was conditioned, its shapefile name, size, modification time and MD5 digest,
+and the dark targets feature class produced from it. The feature classes produced
+for each acquisition date are also recorded.
+
+When the tool is executed again on the year folder, images whose shapefile is
+unchanged are skipped: only new or changed images are ingested, and only the
+acquisition dates of new, changed or removed images are conditioned again.
+
+INPUT
+- Year Folder (automated input): Folder of the RADARSAT-2 image folders.
+
+- Ingest Manifest (automated input): Manifest of the previous execution, if any.
+
+OUTPUT
+- Ingest Manifest (automated output): Manifest updated with the images and
+acquisition dates conditioned.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- manifestPath
+- loadManifest
+- saveManifest
+- imageDate
+- imageFeatureClass
+- shapefileSignature
+- changedImages"""
+
+# Libraries
+# =========
+import os
+import json
+import hashlib
+
+# Files of a shapefile included in its signature
+SHAPEFILE_EXTENSIONS = (".shp", ".shx", ".dbf", ".prj")
+
+
+def manifestPath(gdbWorkspace):
+    """Determine the path of the ingest manifest of a yearly GDB.
+
+    Parameter:
+        gdbWorkspace = Path of the yearly data file geodatabase (e.g. "...\\2010.gdb").
+
+    Return:
+        Returns the path of the manifest, beside the GDB (e.g. "...\\2010_manifest.json")."""
+    return os.path.splitext(gdbWorkspace)[0] + "_manifest.json"
+
+
+def loadManifest(gdbWorkspace):
+    """Read the ingest manifest of a yearly GDB.
+
+    Parameter:
+        gdbWorkspace = Path of the yearly data file geodatabase.
+
+    Return:
+        Returns the manifest dictionary ("images" and "dates" entries), empty if the GDB has no manifest."""
+    path = manifestPath(gdbWorkspace)
+    manifest = {"images": {}, "dates": {}}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as manifestFile:
+                manifest.update(json.load(manifestFile))
+        except ValueError:
+            # Unreadable manifest: every image is conditioned again
+            pass
+
+    return manifest
+
+
+def saveManifest(gdbWorkspace, manifest):
+    """Write the ingest manifest of a yearly GDB (to a temporary file first, so an interrupted write keeps the previous manifest).
+
+    Parameters:
+        gdbWorkspace = Path of the yearly data file geodatabase.
+        manifest = Manifest dictionary.
+
+    Return:
+        No return"""
+    path = manifestPath(gdbWorkspace)
+    with open(path + ".tmp", 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent=1, sort_keys=True)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + ".tmp", path)
+
+
+def imageDate(imageName):
+    """Determine the acquisition date of an image folder (e.g. "RS2_..._20100812_083000_..." gives "20100812")."""
+    return imageName.split("_")[5]
+
+
+def imageFeatureClass(imageName):
+    """Determine the name of the dark targets feature class of an image folder, as created by loadDarkTargets."""
+    folder_split = imageName.split("_")
+
+    return folder_split[0] + "_" + folder_split[5] + "_" + folder_split[6]
+
+
+def shapefileSignature(image, previous=None):
+    """Determine the signature of the dark targets shapefile of an image folder. The MD5 digest is only computed again if the
+    size or modification time differ from the previous signature.
+
+    Parameters:
+        image = RADARSAT-2 image folder, containing the shapefile in its "Features" folder.
+        previous = Signature recorded in the manifest for the image folder (None if not recorded).
+
+    Return:
+        Returns the signature dictionary (shapefile name, size, mtime and hash), None if the folder has no shapefile."""
+    featureFolder = os.path.join(image, "Features")
+    if not os.path.isdir(featureFolder):
+        return None
+    shpFiles = sorted([fileName for fileName in os.listdir(featureFolder) if fileName.lower().endswith(".shp")])
+    if len(shpFiles) == 0:
+        return None
+    baseName = os.path.splitext(shpFiles[0])[0]
+    filePaths = [os.path.join(featureFolder, baseName + extension) for extension in SHAPEFILE_EXTENSIONS]
+    filePaths = [filePath for filePath in filePaths if os.path.exists(filePath)]
+
+    signature = {"shapefile": shpFiles[0],
+                 "size": sum([os.path.getsize(filePath) for filePath in filePaths]),
+                 "mtime": max([int(os.path.getmtime(filePath)) for filePath in filePaths])}
+    if previous is not None and previous.get("shapefile") == signature["shapefile"] and \
+            previous.get("size") == signature["size"] and previous.get("mtime") == signature["mtime"]:
+        signature["hash"] = previous.get("hash")
+        return signature
+
+    md5 = hashlib.md5()
+    for filePath in filePaths:
+        with open(filePath, 'rb') as shapeFile:
+            for block in iter(lambda: shapeFile.read(1048576), b''):
+                md5.update(block)
+    signature["hash"] = md5.hexdigest()
+
+    return signature
+
+
+def changedImages(manifest, imageList):
+    """Compare the image folders of the year folder with the manifest.
+
+    Parameters:
+        manifest = Manifest dictionary.
+        imageList = List of RADARSAT-2 image folders of the year folder.
+
+    Return:
+        Returns the list of new or changed image folders, the list of image names removed since the manifest was written,
+        the signature of every image folder (by image name) and the set of acquisition dates to condition again."""
+    recorded = manifest["images"]
+    changed = []
+    signatures = {}
+    dates = set()
+    for image in imageList:
+        imageName = os.path.basename(os.path.normpath(image))
+        previous = recorded.get(imageName)
+        signature = shapefileSignature(image, previous)
+        if signature is None:
+            continue
+        signatures[imageName] = signature
+        if previous is None or previous.get("hash") != signature["hash"] or previous.get("shapefile") != signature["shapefile"]:
+            changed.append(image)
+            dates.add(imageDate(imageName))
+
+    removed = [imageName for imageName in recorded if imageName not in signatures]
+    for imageName in removed:
+        dates.add(imageDate(imageName))
+
+    return changed, removed, signatures, dates
\ No newline at end of file
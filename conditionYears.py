@@ -0,0 +1,394 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used as the "1_Condition Multiple Years of Dark Targets Data"
+script tool in the "GEM2_Oil_Seep_Detection_Analysis" Python Toolbox. It can also
+be run from the command line with the ArcGIS Python interpreter, e.g.
+"python conditionYears.py D:\\GEM2\\products --years 2010 2011 --concurrency 4".
+Run "python conditionYears.py --help" for every option.
+
+SUMMARY
+Conditions several year folders of a products folder at once. Each year folder is
+conditioned by the "condition_darkTargets.py" script in its own worker process,
+into its own yearly data file geodatabase, so the years are independent. At most
+the concurrency limit of years are conditioned at the same time; each worker
+process conditions a single year folder. Once every year is conditioned, the
+timing and feature counts of the years are combined into a summary.
+
+The image folders of each year are imported one after another (worker processes
+cannot start worker processes of their own).
+
+INPUT
+- Products Folder (user input): Folder containing the year folders (folders named
+after the year, e.g. "2010").
+
+- Year Folders (user input): Years to condition (every year folder of the products
+folder if not defined).
+
+- Concurrent Years (user input): Maximum number of year folders conditioned at the
+same time.
+
+- Attribute Evaluation Criteria, Overlap Frame Pairing, Overlap Overlay and
+In-Memory Pipeline (user input): As for "condition_darkTargets.py", applied to
+every year.
+
+OUTPUT
+- Yearly Data File Geodatabases (automated output): As for
+"condition_darkTargets.py", one per year folder.
+
+- Yearly Logs (automated output): Log of each year, "conditionData_<year>.log" in
+the "logs" folder of the products folder.
+
+- Summary (automated output): Elapsed time, number of acquisition day feature
+classes and number of dark targets of each year and in total, reported in the tool
+messages and written to "conditionYears_summary.csv" in the "logs" folder, with the
+overall elapsed time of the concurrent conditioning.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- conditionYears
+    - yearFolders
+    - executeYears
+    - writeSummary
+- runYearTask
+- countFeatures
+- main"""
+
+# Libraries
+# =========
+import arcpy
+import os
+import sys
+import csv
+import time
+import logging
+import argparse
+import traceback
+import multiprocessing
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import condition_darkTargets                            # get module reference for reload
+reload(condition_darkTargets)                           # reload step 1
+from condition_darkTargets import condition_darkTargets # reload step 2
+
+
+class conditionYears(object):
+    """
+    Conditions the year folders of a products folder concurrently, each in
+    its own worker process, with the condition_darkTargets tool.
+    """
+    def __init__(self):
+        """Define the tool (tool name is the name of the class)."""
+        self.label = "1_Condition Multiple Years of Dark Targets Data"
+        self.description = "Conditions the dark targets of several year folders \
+        at the same time, each year in its own worker process, and summarizes \
+        the timing and feature counts of every year."
+        self.canRunInBackground = False
+
+    def getParameterInfo(self):
+        """Define parameter definitions"""
+        params0 = arcpy.Parameter(
+            displayName="Input: Products Folder",
+            name="products_folder",
+            datatype="DEFolder",
+            parameterType="Required",
+            direction="Input")
+
+        params1 = arcpy.Parameter(
+            displayName="Input: Year Folders",
+            name="years",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
+        params2 = arcpy.Parameter(
+            displayName="Input: Concurrent Years",
+            name="concurrency",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params2.value = 2
+
+        params3 = arcpy.Parameter(
+            displayName="Input: Attribute Evaluation Criteria",
+            name="attrEvalSQL",
+            datatype="GPSQLExpression",
+            parameterType="Required",
+            direction="Input")
+
+        params3.value = "PcontrDb < PcontrDb_1"
+
+        params4 = arcpy.Parameter(
+            displayName="Input: Overlap Frame Pairing",
+            name="frame_pairing",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        params4.filter.type = "ValueList"
+        params4.filter.list = ["ALL_PAIRS", "ADJACENT_FRAMES"]
+        params4.value = "ALL_PAIRS"
+
+        params5 = arcpy.Parameter(
+            displayName="Input: Overlap Overlay",
+            name="overlay_mode",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        params5.filter.type = "ValueList"
+        params5.filter.list = ["PAIRWISE_UNION", "N_WAY"]
+        params5.value = "PAIRWISE_UNION"
+
+        params6 = arcpy.Parameter(
+            displayName="Input: In-Memory Pipeline (final feature classes only)",
+            name="pipeline_mode",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        params6.value = False
+
+        params = [params0, params1, params2, params3, params4, params5, params6]
+
+        return params
+
+    def isLicensed(self):
+        """Set whether tool is licensed to execute."""
+        return True
+
+    def updateParameters(self, parameters):
+        """Modify the values and properties of parameters before internal
+        validation is performed.  This method is called whenever a parameter
+        has been changed."""
+        if parameters[0].altered and parameters[0].value is not None:
+            parameters[1].filter.type = "ValueList"
+            parameters[1].filter.list = self.yearFolders(parameters[0].valueAsText)
+        return
+
+    def updateMessages(self, parameters):
+        """Modify the messages created by internal validation for each tool
+        parameter.  This method is called after internal validation."""
+        if parameters[2].value is not None and parameters[2].value < 1:
+            parameters[2].setErrorMessage("The number of concurrent years must be at least 1.")
+        return
+
+    def execute(self, parameters, messages):
+        """The source code of the tool."""
+        productsFolder = parameters[0].valueAsText
+        years = parameters[1].values
+        if years is None or len(years) == 0:
+            years = self.yearFolders(productsFolder)
+        concurrency = parameters[2].value if parameters[2].value is not None else 1
+        settings = {"criteria": parameters[3].valueAsText,
+                    "frame_pairing": parameters[4].valueAsText,
+                    "overlay_mode": parameters[5].valueAsText,
+                    "pipeline_mode": parameters[6].value == True}
+
+        # Set log configuration
+        logPath = os.path.join(productsFolder, "logs")
+        if not os.path.exists(logPath):
+            os.makedirs(logPath)
+        logFile = os.path.join(logPath, "conditionData.log")
+        logging.basicConfig(filename=logFile, format='%(asctime)s -- %(message)s', datefmt='%d/%m/%Y %H:%M:%S', level=logging.INFO)
+        logging.info("Starting conditionYears.py script...\n")
+
+        startTime = time.time()
+        results = self.executeYears(productsFolder, sorted(years), concurrency, settings)
+        self.writeSummary(results, logPath, time.time() - startTime)
+
+        logging.info("conditionYears.py script finished\n\n")
+
+        return
+
+    def yearFolders(self, productsFolder):
+        """List the year folders of a products folder.
+
+        Parameter:
+            productsFolder = Folder containing the year folders.
+
+        Return:
+            Returns the sorted list of the year folder names (four digit folder names, e.g. "2010")."""
+        return sorted([name for name in os.listdir(productsFolder)
+                       if len(name) == 4 and name.isdigit() and os.path.isdir(os.path.join(productsFolder, name))])
+
+    def executeYears(self, productsFolder, years, concurrency, settings):
+        """Condition year folders with a pool of worker processes, one year folder per worker process.
+
+        Parameters:
+            productsFolder = Folder containing the year folders.
+            years = List of year folder names to condition.
+            concurrency = Maximum number of year folders conditioned at the same time.
+            settings = Dictionary of the conditioning settings ("criteria", "frame_pairing", "overlay_mode" and "pipeline_mode").
+
+        Return:
+            Returns the list of year results (dictionaries of runYearTask), in the order of the years."""
+        if len(years) == 0:
+            arcpy.AddWarning("No year folders found in " + productsFolder)
+            logging.info("No year folders found in '%s'", productsFolder)
+            return []
+        poolSize = max(1, min(concurrency, len(years)))
+        arcpy.AddMessage("\nConditioning " + str(len(years)) + " year folders with " + str(poolSize) + " worker processes: " + ", ".join(years))
+        logging.info("Conditioning %d year folders with %d worker processes: %s\n", len(years), poolSize, str(years))
+
+        # Worker processes must be started with python rather than the ArcGIS application running the tool
+        if not os.path.basename(sys.executable).lower().startswith("python"):
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+        # Each worker process conditions a single year (fresh log configuration and workspace environment for every year)
+        pool = multiprocessing.Pool(poolSize, maxtasksperchild=1)
+        results = []
+        try:
+            pending = [pool.apply_async(runYearTask, (os.path.join(productsFolder, year), settings)) for year in years]
+            for year, result in zip(years, pending):
+                results.append(result.get())
+                if results[-1]["error"] is not None:
+                    arcpy.AddError("Conditioning of " + year + " failed:\n" + results[-1]["error"])
+                    logging.info("Conditioning of year '%s' failed", year)
+                else:
+                    arcpy.AddMessage("Year " + year + " conditioned in " + "%.1f" % results[-1]["seconds"] + " s")
+                    logging.info("Year '%s' conditioned in %.1f s", year, results[-1]["seconds"])
+        finally:
+            pool.close()
+            pool.join()
+
+        return results
+
+    def writeSummary(self, results, logPath, elapsedSeconds):
+        """Report the combined summary of the conditioned years and write it to "conditionYears_summary.csv".
+
+        Parameters:
+            results = List of year results (dictionaries of runYearTask).
+            logPath = Folder in which the summary is written.
+            elapsedSeconds = Elapsed (wall clock) time of the conditioning of every year.
+
+        Return:
+            No return"""
+        header = ["year", "status", "seconds", "dates", "features", "log"]
+        rows = []
+        for result in results:
+            rows.append([result["year"], "failed" if result["error"] is not None else "conditioned", "%.1f" % result["seconds"],
+                         result["dates"], result["features"], os.path.basename(result["log"])])
+        rows.append(["total", str(len([result for result in results if result["error"] is None])) + "/" + str(len(results)),
+                     "%.1f" % sum([result["seconds"] for result in results]), sum([result["dates"] for result in results]),
+                     sum([result["features"] for result in results]), ""])
+
+        arcpy.AddMessage("\nSummary:")
+        arcpy.AddMessage("{0:<8}{1:<14}{2:>10}{3:>8}{4:>12}  {5}".format(*header))
+        for row in rows:
+            arcpy.AddMessage("{0:<8}{1:<14}{2:>10}{3:>8}{4:>12}  {5}".format(*row))
+            logging.info("Summary: year '%s' %s, %s s, %s acquisition days, %s dark targets", row[0], row[1], row[2], row[3], row[4])
+
+        summaryFile = os.path.join(logPath, "conditionYears_summary.csv")
+        with open(summaryFile, 'wb' if sys.version_info[0] < 3 else 'w') as csvFile:
+            writer = csv.writer(csvFile)
+            writer.writerow(header)
+            writer.writerows(rows)
+        arcpy.AddMessage("Elapsed time: " + "%.1f" % elapsedSeconds + " s (" + rows[-1][2] + " s for the years one after another)")
+        arcpy.AddMessage("Summary written to " + summaryFile)
+        logging.info("Summary: elapsed time %.1f s, written to '%s'", elapsedSeconds, summaryFile)
+
+
+def runYearTask(yearFolder, settings):
+    """Condition a year folder with the condition_darkTargets tool, in a worker process of conditionYears.
+
+    Parameters:
+        yearFolder = Year folder to condition.
+        settings = Dictionary of the conditioning settings ("criteria", "frame_pairing", "overlay_mode" and "pipeline_mode").
+
+    Return:
+        Returns the year result dictionary: year, elapsed seconds, number of acquisition day feature classes, number of dark
+        targets, log file and error traceback (None if successful)."""
+    year = os.path.basename(os.path.normpath(yearFolder))
+    productsFolder = os.path.dirname(os.path.normpath(yearFolder))
+    gdbWorkspace = os.path.join(productsFolder, year + ".gdb")
+
+    # Log of the year, the basicConfig of condition_darkTargets has no effect once a handler is set
+    logPath = os.path.join(productsFolder, "logs")
+    yearLog = os.path.join(logPath, "conditionData_" + year + ".log")
+    rootLogger = logging.getLogger()
+    for handler in list(rootLogger.handlers):
+        rootLogger.removeHandler(handler)
+    logging.basicConfig(filename=yearLog, format='%(asctime)s -- %(message)s', datefmt='%d/%m/%Y %H:%M:%S', level=logging.INFO)
+
+    result = {"year": year, "seconds": 0.0, "dates": 0, "features": 0, "log": yearLog, "error": None}
+    startTime = time.time()
+    try:
+        conditionTool = condition_darkTargets()
+        conditionParams = conditionTool.getParameterInfo()
+        # Define year folder value
+        conditionParams[0].value = yearFolder
+        # Define dataset values (outputs of the tool, used as inputs by its sub-tools)
+        conditionParams[1].value = os.path.join(gdbWorkspace, "dark_features")
+        conditionParams[2].value = os.path.join(gdbWorkspace, "feature_union")
+        conditionParams[3].value = os.path.join(gdbWorkspace, "feature_overlap")
+        conditionParams[4].value = gdbWorkspace
+        # Define conditioning settings values (image folders imported one after another within the worker process)
+        conditionParams[5].value = settings["criteria"]
+        conditionParams[6].value = 1
+        conditionParams[7].value = settings["frame_pairing"]
+        conditionParams[8].value = settings["overlay_mode"]
+        conditionParams[9].value = settings["pipeline_mode"]
+        # Execute Condition Dark Targets script
+        conditionTool.execute(conditionParams, None)
+    except Exception:
+        logging.exception("Conditioning of year '%s' failed", year)
+        result["error"] = traceback.format_exc()
+    result["seconds"] = time.time() - startTime
+
+    if arcpy.Exists(gdbWorkspace):
+        result["dates"], result["features"] = countFeatures(gdbWorkspace)
+    logging.info("conditionYears: year '%s' finished in %.1f s, %d acquisition days, %d dark targets\n", year, result["seconds"], result["dates"], result["features"])
+
+    return result
+
+
+def countFeatures(gdbWorkspace):
+    """Count the acquisition day feature classes of a yearly data file geodatabase and their features.
+
+    Parameter:
+        gdbWorkspace = Yearly data file geodatabase.
+
+    Return:
+        Returns the number of acquisition day feature classes and the total number of features."""
+    arcpy.env.workspace = gdbWorkspace
+    fcList = arcpy.ListFeatureClasses("RS2_*")
+    featureCount = 0
+    for fc in fcList:
+        featureCount += int(arcpy.GetCount_management(os.path.join(gdbWorkspace, fc)).getOutput(0))
+
+    return len(fcList), featureCount
+
+
+def main():
+    """Condition year folders from the command line."""
+    parser = argparse.ArgumentParser(description="Condition the dark targets of several year folders concurrently.")
+    parser.add_argument("products", help="products folder containing the year folders")
+    parser.add_argument("--years", nargs="*", help="year folders to condition (default: every year folder)")
+    parser.add_argument("--concurrency", type=int, default=2, help="maximum number of years conditioned at the same time")
+    parser.add_argument("--criteria", default="PcontrDb < PcontrDb_1", help="attribute evaluation criteria")
+    parser.add_argument("--frame-pairing", default="ALL_PAIRS", choices=["ALL_PAIRS", "ADJACENT_FRAMES"])
+    parser.add_argument("--overlay", default="PAIRWISE_UNION", choices=["PAIRWISE_UNION", "N_WAY"])
+    parser.add_argument("--pipeline", action="store_true", help="keep the intermediate outputs in memory")
+    args = parser.parse_args()
+
+    tool = conditionYears()
+    params = tool.getParameterInfo()
+    params[0].value = args.products
+    params[1].values = args.years
+    params[2].value = args.concurrency
+    params[3].value = args.criteria
+    params[4].value = args.frame_pairing
+    params[5].value = args.overlay
+    params[6].value = args.pipeline
+    tool.execute(params, None)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -28,13 +28,47 @@ which set of attributes is selected and applied in those regions of overlapping
 dark targets which contains two sets of attributes. A default value is entered,
 however the parameter can be customized.
 
+- Number of Worker Processes (user input): Number of image folders imported at the
+same time by worker processes, each into its own scratch GDB, before being loaded
+into the yearly data file geodatabase. Images are imported one after another if 1.
+
+- Overlap Frame Pairing (user input): Pairs of feature classes of an acquisition
+date checked for overlap: every pair ("ALL_PAIRS"), or the adjacent frames of the
+acquisition pass only ("ADJACENT_FRAMES"), a warning being given for any skipped
+pair with intersecting extents.
+
+- Overlap Overlay (user input): Union of each pair of overlapping feature classes
+("PAIRWISE_UNION"), or single N-way overlay of every feature class of an acquisition
+date ("N_WAY"), which produces each overlap region once with all its contributing
+dark targets, including regions where three or more frames overlap.
+
+- In-Memory Pipeline (user input): Condition the acquisition dates one after
+another with the intermediate outputs of each date kept in memory ("in_memory"
+workspace) instead of the "feature_union" and "feature_overlap" datasets; only the
+final acquisition day feature classes are written to the geodatabase.
+
 OUTPUT
 - Yearly Data File Geodatabase (automated output): A file geodatabase is
 produced in the same folder of the input year folder and is also named the same
 as the input year folder. (e.g. 2010.gdb) The FGDB contains the feature classes
 of all the dark targets per acquisition day, as well as the working files used
 in the conditioning, which are placed in the "dark_features", "feature_overlap"
-and "feature_union" feature datasets."""
+and "feature_union" feature datasets.
+
+- Ingest Manifest (automated output): Manifest of the conditioned image folders and
+of the outputs of each acquisition date, written beside the yearly data file
+geodatabase (e.g. 2010_manifest.json). When the tool is executed again on the year
+folder, the existing geodatabase is kept: only the new or changed images are
+imported, and only the acquisition dates they touch are conditioned again.
+
+- Checkpoints (automated output): Checkpoint of each conditioning stage completed
+for each acquisition date, with the fingerprint of its inputs, written beside the
+yearly data file geodatabase (e.g. 2010_checkpoints.json). If the execution is
+interrupted, executing the tool again skips the completed (stage, date) units and
+executes each stage once for its incomplete acquisition dates, after discarding
+their partial outputs. The
+checkpoints of the acquisition dates are removed once the ingest manifest is
+updated."""
 
 # Libraries
 # =========
@@ -67,6 +101,17 @@ import mergeAreas                           # get module reference for reload
 reload(mergeAreas)                          # reload step 1
 from mergeAreas import mergeAreas           # reload step 2
 
+import conditionManifest                    # get module reference for reload
+reload(conditionManifest)                   # reload step 1
+import conditionCheckpoint                  # get module reference for reload
+reload(conditionCheckpoint)                 # reload step 1
+
+# Name suffixes of the outputs of the conditioning stages in the union and overlap datasets
+STAGE_OUTPUTS = {"parseOverlap": ["_Union", "_Select", "_Overlap", "_TotalOverlap"],
+                 "parseNoOverlap": ["_noOverlap"],
+                 "evalAttributes": ["_toMerge"],
+                 "mergeAreas": ["_toDissolve"]}
+
 
 class condition_darkTargets(object):
     """
@@ -130,7 +175,47 @@ class condition_darkTargets(object):
 
         params5.value = "PcontrDb < PcontrDb_1"
 
-        params = [params0, params1, params2, params3, params4, params5]
+        params6 = arcpy.Parameter(
+            displayName="Input: Number of Worker Processes (parallel ingest)",
+            name="worker_count",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params6.value = 1
+
+        params7 = arcpy.Parameter(
+            displayName="Input: Overlap Frame Pairing",
+            name="frame_pairing",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        params7.filter.type = "ValueList"
+        params7.filter.list = ["ALL_PAIRS", "ADJACENT_FRAMES"]
+        params7.value = "ALL_PAIRS"
+
+        params8 = arcpy.Parameter(
+            displayName="Input: Overlap Overlay",
+            name="overlay_mode",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        params8.filter.type = "ValueList"
+        params8.filter.list = ["PAIRWISE_UNION", "N_WAY"]
+        params8.value = "PAIRWISE_UNION"
+
+        params9 = arcpy.Parameter(
+            displayName="Input: In-Memory Pipeline (final feature classes only)",
+            name="pipeline_mode",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        params9.value = False
+
+        params = [params0, params1, params2, params3, params4, params5, params6, params7, params8, params9]
 
         return params
 
@@ -163,6 +248,11 @@ class condition_darkTargets(object):
         # Create File GDB Structure #
         # ========================= #
 
+        gdbPath = os.path.join(os.path.dirname(parameters[0].valueAsText), os.path.basename(parameters[0].valueAsText) + ".gdb")
+        if arcpy.Exists(gdbPath):
+            # Incremental conditioning (or resumed execution): the existing yearly GDB and its datasets are kept
+            arcpy.AddMessage("\nYearly GDB already exists, conditioning new or changed images only...")
+            logging.info("Yearly GDB '%s' already exists, conditioning new or changed images only\n", gdbPath)
         createGDB = createGDBStruct()
         createGDBparams = createGDB.getParameterInfo()
         # Define products folder value (parent directory to year folder)
@@ -177,75 +267,299 @@ class condition_darkTargets(object):
         arcpy.SetParameterAsText(3, overlap_DS)
         arcpy.SetParameterAsText(4, gdbWorkspace)
 
+        # ===================================== #
+        # Determine new or changed image folders #
+        # ===================================== #
+
+        manifest = conditionManifest.loadManifest(gdbWorkspace)
+        arcpy.env.workspace = parameters[0].valueAsText
+        imageList = arcpy.ListWorkspaces()
+        changed, removed, signatures, dates = conditionManifest.changedImages(manifest, imageList)
+        arcpy.AddMessage("\n" + str(len(changed)) + " new or changed image folders and " + str(len(removed)) + " removed image folders, "
+                         + str(len(dates)) + " acquisition dates to condition.")
+        logging.info("Manifest: %d new or changed images, %d removed images, acquisition dates to condition: %s\n", len(changed), len(removed), str(sorted(dates)))
+        if len(dates) == 0:
+            arcpy.AddMessage("No new or changed images, conditioning not required!")
+            logging.info("condition_darkTargets.py script finished.\n\n")
+            return
+
+        # Fingerprints of the inputs of the (stage, date) units, checkpoints of an interrupted execution being kept if they match
+        checkpoints = conditionCheckpoint.loadCheckpoints(gdbWorkspace)
+        settings = [parameters[5].valueAsText, parameters[7].valueAsText, parameters[8].valueAsText, parameters[9].value == True]
+        loadFingerprints = dict([(date, conditionCheckpoint.dateFingerprint(date, signatures)) for date in dates])
+        conditionFingerprints = dict([(date, conditionCheckpoint.dateFingerprint(date, signatures, settings)) for date in dates])
+        if len(checkpoints) > 0:
+            arcpy.AddMessage("Checkpoints of a previous execution found, completed stages are skipped.")
+            logging.info("Checkpoints: '%s' read\n", conditionCheckpoint.checkpointPath(gdbWorkspace))
+
         # ============================ #
         # Load Dark Targets shapefiles #
         # ============================ #
 
-        loadSHP = loadDarkTargets()
-        loadSHPparams = loadSHP.getParameterInfo()
-        # Define year workspace folder value
-        loadSHPparams[0] = parameters[0]
-        # Define dark features dataset value
-        loadSHPparams[1] = parameters[1]
-        # Execute Load Dark Targets script
-        loadSHP.execute(loadSHPparams, None)
+        loadDates = set([date for date in dates if not conditionCheckpoint.isComplete(checkpoints, "loadDarkTargets", date, loadFingerprints[date])])
+        for date in loadDates:
+            conditionCheckpoint.invalidate(checkpoints, "loadDarkTargets", date)
+
+        # Remove dark targets feature classes of the images to load again (including partial outputs) and of the removed images
+        self.removeImageOutputs(manifest, loadDates, changed, removed, feat_DS)
+        loadImages = [image for image in changed if conditionManifest.imageDate(os.path.basename(os.path.normpath(image))) in loadDates]
+        if len(loadImages) > 0:
+            loadSHP = loadDarkTargets()
+            loadSHPparams = loadSHP.getParameterInfo()
+            # Define year workspace folder value
+            loadSHPparams[0] = parameters[0]
+            # Define dark features dataset value
+            loadSHPparams[1] = parameters[1]
+            # Define number of worker processes value
+            loadSHPparams[2] = parameters[6]
+            # Define new or changed image folders value
+            loadSHPparams[3].values = [os.path.basename(os.path.normpath(image)) for image in loadImages]
+            # Execute Load Dark Targets script
+            loadSHP.execute(loadSHPparams, None)
+        conditionCheckpoint.markComplete(gdbWorkspace, checkpoints, "loadDarkTargets", sorted(loadDates), loadFingerprints)
+
+        # ======================================= #
+        # Condition acquisition dates (4 stages)  #
+        # ======================================= #
+
+        conditionStages = conditionCheckpoint.STAGES[1:]
+        if parameters[9].value == True:
+            # Pipeline mode: stage outputs of each acquisition date are kept in memory, only the final feature class is written
+            arcpy.AddMessage("\nConditioning " + str(len(dates)) + " acquisition dates in memory (pipeline mode)...")
+            logging.info("Pipeline mode: %d acquisition dates conditioned in memory\n", len(dates))
+            for date in sorted(dates):
+                # In-memory outputs do not survive an interruption, the acquisition date is the unit of the checkpoints
+                if conditionCheckpoint.isComplete(checkpoints, "mergeAreas", date, conditionFingerprints[date]):
+                    arcpy.AddMessage("\nAcquisition date " + date + " already conditioned, skipped.")
+                    logging.info("Checkpoint: acquisition date '%s' already conditioned, skipped\n", date)
+                    continue
+                arcpy.AddMessage("\n========== Acquisition date " + date + " ==========")
+                conditionCheckpoint.invalidate(checkpoints, conditionStages[0], date)
+                for stage in conditionStages:
+                    self.discardStageOutputs(stage, [date], union_DS, overlap_DS, gdbWorkspace)
+                self.conditionDates(parameters, [date], "in_memory", "in_memory")
+                arcpy.Delete_management("in_memory")
+                logging.info("Delete: 'in_memory' workspace cleared after acquisition date '%s'\n", date)
+                for stage in conditionStages:
+                    conditionCheckpoint.markComplete(gdbWorkspace, checkpoints, stage, [date], conditionFingerprints)
+        else:
+            # Each stage is executed once for its incomplete acquisition dates, which are checkpointed together once complete
+            for stage in conditionStages:
+                stageDates = [date for date in sorted(dates)
+                              if not conditionCheckpoint.isComplete(checkpoints, stage, date, conditionFingerprints[date])]
+                if len(stageDates) < len(dates):
+                    arcpy.AddMessage("\n" + stage + " already complete for " + str(len(dates) - len(stageDates)) + " acquisition dates, skipped.")
+                    logging.info("Checkpoint: '%s' already complete for %d acquisition dates, skipped\n", stage, len(dates) - len(stageDates))
+                if len(stageDates) == 0:
+                    continue
+                for date in stageDates:
+                    conditionCheckpoint.invalidate(checkpoints, stage, date)
+                self.discardStageOutputs(stage, stageDates, union_DS, overlap_DS, gdbWorkspace)
+                self.conditionStage(stage, parameters, stageDates, union_DS, overlap_DS)
+                conditionCheckpoint.markComplete(gdbWorkspace, checkpoints, stage, stageDates, conditionFingerprints)
+
+        # ====================== #
+        # Update ingest manifest #
+        # ====================== #
+
+        self.updateManifest(manifest, signatures, dates, union_DS, overlap_DS, gdbWorkspace)
+        logging.info("Manifest: '%s' updated\n", conditionManifest.manifestPath(gdbWorkspace))
+        conditionCheckpoint.clearDates(gdbWorkspace, checkpoints, dates)
 
+        logging.info("condition_darkTargets.py script finished.\n\n")
+
+        return
+
+    def conditionDates(self, parameters, dates, unionWorkspace, overlapWorkspace):
+        """Condition acquisition dates: parse overlapping targets and regions that do not overlap, evaluate conflicting
+        attributes and merge areas into the final acquisition day feature classes.
+
+        Parameters:
+            parameters = Parameters of the tool.
+            dates = List of acquisition dates (YYYYMMDD) to condition.
+            unionWorkspace, overlapWorkspace = Workspaces of the union and overlap outputs ("feature_union" and "feature_overlap"
+            datasets, or "in_memory" in pipeline mode).
+
+        Return:
+            No return"""
+        for stage in conditionCheckpoint.STAGES[1:]:
+            self.conditionStage(stage, parameters, dates, unionWorkspace, overlapWorkspace)
+
+    def conditionStage(self, stage, parameters, dates, unionWorkspace, overlapWorkspace):
+        """Execute a conditioning stage for acquisition dates.
+
+        Parameters:
+            stage = Conditioning stage ("parseOverlap", "parseNoOverlap", "evalAttributes" or "mergeAreas").
+            parameters = Parameters of the tool.
+            dates = List of acquisition dates (YYYYMMDD) to condition.
+            unionWorkspace, overlapWorkspace = Workspaces of the union and overlap outputs ("feature_union" and "feature_overlap"
+            datasets, or "in_memory" in pipeline mode).
+
+        Return:
+            No return"""
         # ========================= #
         # Parse overlapping targets #
         # ========================= #
 
-        parseTargetOverlap = parseOverlap()
-        parseTargetOverlapParams = parseTargetOverlap.getParameterInfo()
-        # Define dark features dataset value
-        parseTargetOverlapParams[0] = parameters[1]
-        # Define features union dataset value
-        parseTargetOverlapParams[1] = parameters[2]
-        # Define features overlap dataset value
-        parseTargetOverlapParams[2] = parameters[3]
-        # Execute Parse Overlap script
-        parseTargetOverlap.execute(parseTargetOverlapParams, None)
+        if stage == "parseOverlap":
+            parseTargetOverlap = parseOverlap()
+            parseTargetOverlapParams = parseTargetOverlap.getParameterInfo()
+            # Define dark features dataset value
+            parseTargetOverlapParams[0] = parameters[1]
+            # Define features union dataset value
+            parseTargetOverlapParams[1].value = unionWorkspace
+            # Define features overlap dataset value
+            parseTargetOverlapParams[2].value = overlapWorkspace
+            # Define acquisition dates value
+            parseTargetOverlapParams[3].values = dates
+            # Define frame pairing value (skipped pairs of the adjacent frames pairing are reported)
+            parseTargetOverlapParams[4] = parameters[7]
+            # Define overlay value
+            parseTargetOverlapParams[8] = parameters[8]
+            # Execute Parse Overlap script
+            parseTargetOverlap.execute(parseTargetOverlapParams, None)
 
         # =========================================== #
         # Parse regions of targets that do no overlap #
         # =========================================== #
 
-        parseTargetNoOverlap = parseNoOverlap()
-        parseTargetNoOverlapParams = parseTargetNoOverlap.getParameterInfo()
-        # Define dark features dataset value
-        parseTargetNoOverlapParams[0] = parameters[1]
-        # Define features overlap dataset value
-        parseTargetNoOverlapParams[1] = parameters[3]
-        # Execute Parse No Overlap script
-        parseTargetNoOverlap.execute(parseTargetNoOverlapParams, None)
+        elif stage == "parseNoOverlap":
+            parseTargetNoOverlap = parseNoOverlap()
+            parseTargetNoOverlapParams = parseTargetNoOverlap.getParameterInfo()
+            # Define dark features dataset value
+            parseTargetNoOverlapParams[0] = parameters[1]
+            # Define features overlap dataset value
+            parseTargetNoOverlapParams[1].value = overlapWorkspace
+            # Define acquisition dates value
+            parseTargetNoOverlapParams[2].values = dates
+            # Execute Parse No Overlap script
+            parseTargetNoOverlap.execute(parseTargetNoOverlapParams, None)
 
         # =============================== #
         # Evaluate conflicting attributes #
         # =============================== #
 
-        evalAttr = evalAttributes()
-        evalAttrParams = evalAttr.getParameterInfo()
-        # Define features overlap dataset value
-        evalAttrParams[0] = parameters[3]
-        # Define attribute selection criteria value
-        evalAttrParams[1] = parameters[5]
-        # Execute Evaluate Attributes script
-        evalAttr.execute(evalAttrParams, None)
+        elif stage == "evalAttributes":
+            evalAttr = evalAttributes()
+            evalAttrParams = evalAttr.getParameterInfo()
+            # Define features overlap dataset value
+            evalAttrParams[0].value = overlapWorkspace
+            # Define attribute selection criteria value
+            evalAttrParams[1] = parameters[5]
+            # Define acquisition dates value
+            evalAttrParams[2].values = dates
+            # Define dark features dataset value
+            evalAttrParams[3] = parameters[1]
+            # Execute Evaluate Attributes script
+            evalAttr.execute(evalAttrParams, None)
 
         # =============================== #
         # Merge areas and finalize output #
         # =============================== #
 
-        mergeTargetAreas = mergeAreas()
-        mergeTargetsAreasParams = mergeTargetAreas.getParameterInfo()
-        # Define features overlap dataset value
-        mergeTargetsAreasParams[0] = parameters[3]
-        # Define GDB workspace value
-        mergeTargetsAreasParams[1] = parameters[4]
-        # Define dark features dataset value
-        mergeTargetsAreasParams[2] = parameters[1]
-        #Execute Merge Areas script
-        mergeTargetAreas.execute(mergeTargetsAreasParams, None)
-
-        logging.info("condition_darkTargets.py script finished.\n\n")
-
-        return
\ No newline at end of file
+        elif stage == "mergeAreas":
+            mergeTargetAreas = mergeAreas()
+            mergeTargetsAreasParams = mergeTargetAreas.getParameterInfo()
+            # Define features overlap dataset value
+            mergeTargetsAreasParams[0].value = overlapWorkspace
+            # Define GDB workspace value
+            mergeTargetsAreasParams[1] = parameters[4]
+            # Define dark features dataset value
+            mergeTargetsAreasParams[2] = parameters[1]
+            # Define acquisition dates value
+            mergeTargetsAreasParams[3].values = dates
+            #Execute Merge Areas script
+            mergeTargetAreas.execute(mergeTargetsAreasParams, None)
+
+    def dateFeatureClasses(self, workspace, dates):
+        """List the feature classes of a workspace belonging to acquisition dates (date as second element of the name).
+
+        Parameters:
+            workspace = Workspace (feature dataset or GDB) to list.
+            dates = Set of acquisition dates (YYYYMMDD).
+
+        Return:
+            Returns the list of feature class names."""
+        arcpy.env.workspace = workspace
+        fcList = arcpy.ListFeatureClasses()
+
+        return [fc for fc in fcList if len(fc.split("_")) > 1 and fc.split("_")[1] in dates]
+
+    def discardStageOutputs(self, stage, dates, union_DS, overlap_DS, gdbWorkspace):
+        """Delete the outputs of a conditioning stage for acquisition dates (partial outputs of an interrupted execution,
+        or outputs of a previous conditioning of the dates), before the stage is executed. Each workspace is listed once.
+
+        Parameters:
+            stage = Conditioning stage ("parseOverlap", "parseNoOverlap", "evalAttributes" or "mergeAreas").
+            dates = List of acquisition dates (YYYYMMDD).
+            union_DS, overlap_DS = Union and overlap datasets.
+            gdbWorkspace = Yearly data file geodatabase, containing the acquisition day feature classes.
+
+        Return:
+            No return"""
+        outputs = []
+        for workspace in [union_DS, overlap_DS]:
+            for fc in self.dateFeatureClasses(workspace, set(dates)):
+                if any([fc.endswith(suffix) for suffix in STAGE_OUTPUTS[stage]]):
+                    outputs.append(os.path.join(workspace, fc))
+        if stage == "mergeAreas":
+            outputs += [os.path.join(gdbWorkspace, fc) for fc in self.dateFeatureClasses(gdbWorkspace, set(dates))]
+
+        for output in outputs:
+            arcpy.Delete_management(output)
+            logging.info("Delete: '%s' feature class deleted", output)
+
+    def removeImageOutputs(self, manifest, dates, changed, removed, feat_DS):
+        """Delete the dark targets feature classes of the new, changed or removed image folders of the acquisition dates to
+        load again.
+
+        Parameters:
+            manifest = Ingest manifest dictionary.
+            dates = Set of acquisition dates to load again.
+            changed = List of new or changed image folders.
+            removed = List of image names removed from the year folder.
+            feat_DS = Dark features dataset.
+
+        Return:
+            No return"""
+        if len(dates) > 0:
+            arcpy.AddMessage("Removing previous dark targets of the acquisition dates to load...")
+        imageNames = [os.path.basename(os.path.normpath(image)) for image in changed] + removed
+        for imageName in imageNames:
+            if conditionManifest.imageDate(imageName) not in dates:
+                continue
+            fcPath = os.path.join(feat_DS, conditionManifest.imageFeatureClass(imageName))
+            if arcpy.Exists(fcPath):
+                arcpy.Delete_management(fcPath)
+                logging.info("Delete: '%s' feature class deleted", fcPath)
+        for imageName in removed:
+            del manifest["images"][imageName]
+
+    def updateManifest(self, manifest, signatures, dates, union_DS, overlap_DS, gdbWorkspace):
+        """Record the conditioned image folders and the outputs of the conditioned acquisition dates in the ingest manifest.
+
+        Parameters:
+            manifest = Ingest manifest dictionary.
+            signatures = Shapefile signature of every image folder (by image name).
+            dates = Set of conditioned acquisition dates.
+            union_DS, overlap_DS = Union and overlap datasets.
+            gdbWorkspace = Yearly data file geodatabase, containing the acquisition day feature classes.
+
+        Return:
+            No return"""
+        for imageName in signatures:
+            entry = dict(signatures[imageName])
+            entry["featureClass"] = conditionManifest.imageFeatureClass(imageName)
+            entry["date"] = conditionManifest.imageDate(imageName)
+            manifest["images"][imageName] = entry
+
+        for date in dates:
+            outputs = []
+            for workspace in [union_DS, overlap_DS, gdbWorkspace]:
+                outputs += [os.path.join(os.path.basename(workspace), fc) for fc in self.dateFeatureClasses(workspace, set([date]))]
+            if len(outputs) > 0:
+                manifest["dates"][date] = sorted(outputs)
+            elif date in manifest["dates"]:
+                del manifest["dates"][date]
+
+        conditionManifest.saveManifest(gdbWorkspace, manifest)
\ No newline at end of file
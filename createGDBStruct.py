@@ -97,30 +97,42 @@ class createGDBStruct(object):
         coord_sys = arcpy.SpatialReference("NAD 1983 Canada Atlas Lambert")
         logging.info("Spatial Reference set: NAD 1983 Canada Atlas Lambert")
 
-        # Create file GDB and define path
-        arcpy.CreateFileGDB_management(working_folder, gdbName, "CURRENT")
-        logging.info("Create File GDB: '%s' created in %s", gdbName, working_folder)
+        # Create file GDB and define path (the GDB and datasets of an interrupted execution are kept)
         file_GDB = os.path.join(working_folder, gdbName) + ".gdb"
+        if arcpy.Exists(file_GDB):
+            logging.info("File GDB: '%s' already exists in %s", gdbName, working_folder)
+        else:
+            arcpy.CreateFileGDB_management(working_folder, gdbName, "CURRENT")
+            logging.info("Create File GDB: '%s' created in %s", gdbName, working_folder)
 
         # Create dark features dataset
         arcpy.AddMessage("Creating Dark Features Dataset...")
         dark_featDSstring = "dark_features"
-        arcpy.CreateFeatureDataset_management(file_GDB, dark_featDSstring, coord_sys)
-        logging.info("Create Feature Dataset: '%s' created in %s", dark_featDSstring, file_GDB)
+        if arcpy.Exists(os.path.join(file_GDB, dark_featDSstring)):
+            logging.info("Feature Dataset: '%s' already exists in %s", dark_featDSstring, file_GDB)
+        else:
+            arcpy.CreateFeatureDataset_management(file_GDB, dark_featDSstring, coord_sys)
+            logging.info("Create Feature Dataset: '%s' created in %s", dark_featDSstring, file_GDB)
         feat_DS = os.path.join(file_GDB, dark_featDSstring)
 
         # Create features union dataset
         arcpy.AddMessage("Creating Union Dataset...")
         unionDSstring = "feature_union"
-        arcpy.CreateFeatureDataset_management(file_GDB, unionDSstring, coord_sys)
-        logging.info("Create Feature Dataset: '%s' created in %s", unionDSstring, file_GDB)
+        if arcpy.Exists(os.path.join(file_GDB, unionDSstring)):
+            logging.info("Feature Dataset: '%s' already exists in %s", unionDSstring, file_GDB)
+        else:
+            arcpy.CreateFeatureDataset_management(file_GDB, unionDSstring, coord_sys)
+            logging.info("Create Feature Dataset: '%s' created in %s", unionDSstring, file_GDB)
         union_DS = os.path.join(file_GDB, unionDSstring)
 
         # Create features overlap dataset
         arcpy.AddMessage("Creating Overlap Dataset...")
         overlapDSstring = "feature_overlap"
-        arcpy.CreateFeatureDataset_management(file_GDB, overlapDSstring, coord_sys)
-        logging.info("Create Feature Dataset: '%s' created in %s", overlapDSstring, file_GDB)
+        if arcpy.Exists(os.path.join(file_GDB, overlapDSstring)):
+            logging.info("Feature Dataset: '%s' already exists in %s", overlapDSstring, file_GDB)
+        else:
+            arcpy.CreateFeatureDataset_management(file_GDB, overlapDSstring, coord_sys)
+            logging.info("Create Feature Dataset: '%s' created in %s", overlapDSstring, file_GDB)
         overlap_DS = os.path.join(file_GDB, overlapDSstring)
         logging.info("createGDBStruct.py script finished\n\n")
 
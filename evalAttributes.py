@@ -27,20 +27,37 @@ which set of attributes is selected and applied in those regions of overlapping
 dark targets which contains two sets of attributes.
 
 OUTPUT
-- toMerge Feature Classes (automated output): Output feature classes resulting
-from the Merge of the selection of polygons meeting the attribute evaluation
-criteria for the first set of attributes and the selection of the second set of
-attributes for the polygons that do not meet the attribute evaluation criteria.
+- toMerge Feature Classes (automated output): Output feature classes containing
+the first set of attributes for the polygons meeting the attribute evaluation
+criteria and the second set of attributes for the polygons that do not meet the
+attribute evaluation criteria. The total overlap feature class is read once and
+the evaluation criteria is applied to all of its polygons at once ("sqlCriteria.py",
+with the null values of a selection by attributes).
 This has the effect of merging the original polygon geometries with a single set
  of attributes for each polygon. These feature classes are used in the final
  merge conditioning step where each acquisition day is merged together as a single
- feature class."""
+ feature class.
+
+- toMerge Feature Classes of the N-way overlay (automated output): For total overlap
+feature classes produced by the N-way overlay of "parseOverlap.py", each overlap
+region lists its contributing dark targets. The evaluation criteria is applied to
+the contributing dark targets in turn, and each region is written once with the
+selected set of attributes.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- resolveOverlap
+- evaluateContributors"""
 
 # Libraries
 # =========
 import arcpy
 import os
 import logging
+import numpy
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import sqlCriteria                          # get module reference for reload
+reload(sqlCriteria)                         # reload step 1
 
 
 class evalAttributes(object):
@@ -53,7 +70,7 @@ class evalAttributes(object):
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-        params = [None]*2
+        params = [None]*4
 
         params[0] = arcpy.Parameter(
             displayName="Overlap Dataset",
@@ -69,6 +86,21 @@ class evalAttributes(object):
             parameterType="Required",
             direction="Input")
 
+        params[2] = arcpy.Parameter(
+            displayName="Acquisition Dates (incremental conditioning)",
+            name="acquisition_dates",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
+        params[3] = arcpy.Parameter(
+            displayName="Dark Features Dataset",
+            name="dark_featDS",
+            datatype=["DEWorkspace", "DEFeatureDataset"],
+            parameterType="Optional",
+            direction="Input")
+
         return params
 
     def isLicensed(self):
@@ -93,10 +125,18 @@ class evalAttributes(object):
         # Define variables from parameters
         overlapWorkspace = parameters[0].valueAsText
         where_clause = parameters[1].valueAsText
+        # Acquisition dates to process (every date if not defined)
+        dateFilter = parameters[2].values if len(parameters) > 2 else None
+        # Dark features dataset (beside the overlap dataset if not defined), for the N-way overlay
+        featWorkspace = parameters[3].valueAsText if len(parameters) > 3 and parameters[3].value is not None else None
+        if featWorkspace is None:
+            featWorkspace = os.path.join(os.path.dirname(overlapWorkspace), "dark_features")
 
         # Determine list of total overlap feature classes to process
         arcpy.env.workspace = overlapWorkspace
         overlapList = arcpy.ListFeatureClasses("*_TotalOverlap")
+        if dateFilter is not None:
+            overlapList = [fc for fc in overlapList if fc.split("_")[1] in dateFilter]
 
         # Check for presence of total overlap feature classes
         if len(overlapList) > 0:
@@ -107,51 +147,15 @@ class evalAttributes(object):
                 arcpy.AddMessage("\nProcessing " + fc)
                 logging.info("Processing '%s' feature class", fc)
 
-                # Create feature layer to apply evaluation criteria selection
-                arcpy.MakeFeatureLayer_management(fc, "fc_lyr")
-                logging.info("Make Feature Layer: 'fc_lyr' layer created from '%s' feature class", fc)
-                arcpy.AddMessage("Evaluating overlapping attributes...")
+                # Overlap regions of the N-way overlay: evaluate the contributing dark targets of each region
+                if "Contributors" in [field.name for field in arcpy.ListFields(fc)]:
+                    self.evaluateContributors(fc, overlapWorkspace, featWorkspace, where_clause)
+                    logging.info("Processing for '%s' feature class complete\n", fc)
+                    continue
 
-                # Apply selection for values on first set of attributes (left side columns) and copy results to an output feature class
-                arcpy.SelectLayerByAttribute_management("fc_lyr", "NEW_SELECTION", where_clause)
-                logging.info("Select Layer by Attribute: Features from 'fc_lyr' selected, meeting the following evaluation criteria: '%s'", where_clause)
-                selectOutputString = fc + "_Select"
-                selectOutput = os.path.join(overlapWorkspace, selectOutputString)
-                arcpy.CopyFeatures_management("fc_lyr", selectOutput)
-                logging.info("Copy Features: '%s' feature class created from 'fc_lyr' selection", selectOutput)
-
-                # Apply inverted selection for values on second set of attributes (right side columns) and copy results to an output feature class
-                arcpy.SelectLayerByAttribute_management("fc_lyr", "SWITCH_SELECTION")
-                logging.info("Select Layer By Attribute: Selection switched on 'fc_lyr'")
-                selectOutputString_1 = fc + "_Select_1"
-                selectOutput_1 = os.path.join(overlapWorkspace, selectOutputString_1)
-                arcpy.CopyFeatures_management("fc_lyr", selectOutput_1)
-                logging.info("Copy Features: '%s' feature class created from switched 'fc_lyr' selection", selectOutput_1)
-
-                # Delete and rename extra fields to prepare selection output feature classes for merge back to single set of attributes
-                arcpy.AddMessage("Deleting extra attribute fields...")
-                fieldList = arcpy.ListFields(selectOutput)
-                for field in fieldList:
-                    if field.name.endswith("_1"):
-                        arcpy.DeleteField_management(selectOutput, field.name)
-                fieldList_1 = arcpy.ListFields(selectOutput_1)
-                noDeleteField = ["OBJECTID","Shape","targetID","Shape_Length","Shape_Area"]
-                for field in fieldList_1:
-                    if field.name.endswith("_1"):
-                        arcpy.AlterField_management(selectOutput_1, field.name, field.name[:-2])
-                    if field.name in noDeleteField:
-                        continue
-                    else:
-                        arcpy.DeleteField_management(selectOutput_1, field.name)
-
-                # Merge selection output feature classes into single feature class for subsequent merging with remainder of acquisition swathe
-                arcpy.AddMessage("Merging results together into single toMerge feature class...")
-                fcName = fc.strip("_TotalOverlap")
-                mergeList = [selectOutput, selectOutput_1]
-                mergeString = fcName + "_toMerge"
-                mergeOutput = os.path.join(overlapWorkspace, mergeString)
-                arcpy.Merge_management(mergeList, mergeOutput)
-                logging.info("Merge: '%s' created from merging the following feature classes: '%s'", mergeOutput, str(mergeList))
+                # Resolve each overlap region to the set of attributes meeting the evaluation criteria in a single pass
+                arcpy.AddMessage("Evaluating overlapping attributes...")
+                self.resolveOverlap(fc, overlapWorkspace, where_clause)
 
                 logging.info("Processing for '%s' feature class complete\n", fc)
 
@@ -160,4 +164,122 @@ class evalAttributes(object):
 
         logging.info("evalAttributes.py script finished\n\n")
 
-        return
\ No newline at end of file
+        return
+
+    def resolveOverlap(self, fc, overlapWorkspace, where_clause):
+        """Resolve the overlap regions of a total overlap feature class (two sets of attributes, the second with a "_1" suffix)
+        into a toMerge feature class with a single set of attributes. The feature class is read once into columns, the
+        evaluation criteria is applied to every region at once and the selected set of attributes is written in one pass.
+
+        Parameters:
+            fc = Total overlap feature class.
+            overlapWorkspace = Dataset of the total overlap feature class.
+            where_clause = Attribute evaluation criteria (SQL expression).
+
+        Return:
+            No return"""
+        # Attribute fields of the two sets (the combined targetID has no second set)
+        fieldNames = [field.name for field in arcpy.ListFields(fc) if field.type not in ("OID", "Geometry")
+                      and not field.name.startswith("Shape_")]
+        firstFields = [name for name in fieldNames if not name.endswith("_1")]
+        secondFields = [name for name in fieldNames if name.endswith("_1")]
+
+        # Read the total overlap feature class once
+        rows = []
+        with arcpy.da.SearchCursor(fc, ["SHAPE@"] + fieldNames) as cursor:
+            for row in cursor:
+                rows.append(row)
+        logging.info("Search Cursor: %s overlap regions read from '%s' feature class", len(rows), fc)
+
+        # Columns of the two sets of attributes, null values of numeric fields being NaN
+        first = {}
+        second = {}
+        for i, name in enumerate(fieldNames):
+            values = [row[i + 1] for row in rows]
+            if all([value is None or (isinstance(value, (int, float)) and not isinstance(value, bool)) for value in values]):
+                column = numpy.array([sqlCriteria.NULL if value is None else value for value in values], dtype=float)
+            else:
+                column = numpy.empty(len(values), dtype=object)
+                column[:] = values
+            if name in secondFields:
+                second[name[:-2]] = column
+            else:
+                first[name] = column
+        selectFirst = sqlCriteria.vectorCriteria(where_clause)(first, second, len(rows))
+        logging.info("Evaluation criteria '%s' applied: first set of attributes selected for %s of %s overlap regions",
+                     where_clause, int(selectFirst.sum()), len(rows))
+
+        # Output feature class with the single set of attributes
+        fcName = fc.replace("_TotalOverlap", "")
+        mergeString = fcName + "_toMerge"
+        mergeOutput = os.path.join(overlapWorkspace, mergeString)
+        if arcpy.Exists(mergeOutput):
+            arcpy.Delete_management(mergeOutput)
+        arcpy.CreateFeatureclass_management(overlapWorkspace, mergeString, "POLYGON", fc, "DISABLED", "DISABLED", fc)
+        if len(secondFields) > 0:
+            arcpy.DeleteField_management(mergeOutput, secondFields)
+        logging.info("Create Feature Class: '%s' feature class created with a single set of attributes", mergeOutput)
+
+        # Index of the selected value of each output field, in the first or the second set of attributes (as by the selection
+        # switched to the second set, a field without a second value is null, except for the combined targetID)
+        firstIndex = [fieldNames.index(name) + 1 for name in firstFields]
+        secondIndex = [fieldNames.index(name + "_1") + 1 if name + "_1" in fieldNames else
+                       fieldNames.index(name) + 1 if name == "targetID" else None for name in firstFields]
+        # Regions meeting the criteria are written first, then the other regions (as merged from the two selections)
+        with arcpy.da.InsertCursor(mergeOutput, ["SHAPE@"] + firstFields) as cursor:
+            for selected in (True, False):
+                index = firstIndex if selected else secondIndex
+                for row in [row for row, rowSelected in zip(rows, selectFirst) if rowSelected == selected]:
+                    cursor.insertRow([row[0]] + [None if k is None else row[k] for k in index])
+        logging.info("Insert Cursor: %s overlap regions written to '%s' feature class", len(rows), mergeOutput)
+
+    def evaluateContributors(self, fc, overlapWorkspace, featWorkspace, where_clause):
+        """Evaluate the overlap regions of the N-way overlay (total overlap feature class with a "Contributors" field). For each
+        region, the attribute evaluation criteria is applied to its contributing dark targets in turn: the selected set of
+        attributes is compared with the next contributing dark target (the selected set being the first set of attributes,
+        e.g. "PcontrDb", and the next dark target the second set, e.g. "PcontrDb_1"), and replaced by it if the criteria is
+        not met. The regions are written with the selected attributes and their combined targetID to the toMerge feature class.
+
+        Parameters:
+            fc = Total overlap feature class of the N-way overlay.
+            overlapWorkspace = Overlap dataset (or in_memory workspace), in which the toMerge feature class is created.
+            featWorkspace = Dark features dataset, containing the contributing dark targets.
+            where_clause = Attribute evaluation criteria (SQL expression).
+
+        Return:
+            No return"""
+        arcpy.AddMessage("Evaluating attributes of contributing dark targets...")
+
+        # Read overlap regions and the attributes of their contributing dark targets (targetID "<Pid>_<date>_<time>")
+        regions = []
+        with arcpy.da.SearchCursor(fc, ["SHAPE@", "targetID", "Contributors"]) as cursor:
+            for shape, targetID, contributors in cursor:
+                regions.append((shape, targetID, contributors.split(";")))
+        targetFCs = sorted(set(["RS2_" + "_".join(contributor.split("_")[1:3]) for region in regions for contributor in region[2]]))
+        fieldNames = [field.name for field in arcpy.ListFields(os.path.join(featWorkspace, targetFCs[0]))
+                      if field.type not in ("OID", "Geometry") and not field.name.startswith("Shape_")]
+        targets = {}
+        for targetFC in targetFCs:
+            with arcpy.da.SearchCursor(os.path.join(featWorkspace, targetFC), fieldNames) as cursor:
+                for row in cursor:
+                    targets[row[fieldNames.index("targetID")]] = dict(zip(fieldNames, row))
+        criteria = sqlCriteria.criteriaFunction(where_clause)
+
+        # Write each region with the selected set of attributes and the combined targetID
+        fcName = fc.replace("_TotalOverlap", "")
+        mergeString = fcName + "_toMerge"
+        mergeOutput = os.path.join(overlapWorkspace, mergeString)
+        if arcpy.Exists(mergeOutput):
+            arcpy.Delete_management(mergeOutput)
+        arcpy.CreateFeatureclass_management(overlapWorkspace, mergeString, "POLYGON", os.path.join(featWorkspace, targetFCs[0]),
+                                            spatial_reference=arcpy.Describe(fc).spatialReference)
+        with arcpy.da.InsertCursor(mergeOutput, ["SHAPE@"] + fieldNames) as cursor:
+            for shape, targetID, contributors in regions:
+                selected = targets[contributors[0]]
+                for contributor in contributors[1:]:
+                    if not criteria(selected, targets[contributor]):
+                        selected = targets[contributor]
+                values = dict(selected)
+                values["targetID"] = targetID
+                cursor.insertRow([shape] + [values[name] for name in fieldNames])
+        logging.info("Evaluate Contributors: '%s' created from the %d overlap regions of '%s'", mergeOutput, len(regions), fc)
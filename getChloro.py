@@ -15,7 +15,12 @@ tool in the "GEM2_Oil_Seep_Detection_Analysis" Python Toolbox.
 SUMMARY
 Downloads MODIS chlorophyll_a data for those acquisition days where a corresponding
 acquisition day for a dark targets feature class exists. If specified, chlorophyll_a data
-is acquired for a range of days around each dark targets feature class.
+is acquired for a range of days around each dark targets feature class. A download
+plan is first established from the union of the days required by every GDB: only
+the days missing locally are listed on the FTP server, and the number and total
+size of the files to download are reported before each missing file is fetched once.
+Downloads are resumed after a failure and verified against their .md5 checksum
+before being moved into place.
 
 INPUT
 - Folder Location of Dark Targets GDBs (user input): Folder containing the geodatabases
@@ -23,8 +28,36 @@ produced by "1_Condition Yearly Dark Targets Data". The script will iterate thro
 the geodatabases in order to determine the dates required to download the appropriate
 chlorophyll_a raster data.
 
-- Chlorophyll_a Data FTP Directory (default user input): String parameter containing
-the FTP directory where the chlorophyll_a MODIS data is available for download.
+- Chlorophyll_a Data Source (default user input): String parameter containing the
+FTP directory where the chlorophyll_a MODIS data is available for download. A URL
+("http(s)://..." or "file:///...") or a local or network mirror folder organised in
+"YYYY/DDD" directories can be given instead (see "chloroSource.py").
+
+- Chlorophyll Day Range (user input): Integer parameter indicating the range of days
++/- from the date of acquisition of each dark features feature class for which
+chlorophyll_a data is downloaded.
+
+- Number of Concurrent FTP Sessions (default user input): Integer parameter setting
+the number of sessions (e.g. authenticated FTP sessions) downloading files in
+parallel (see "chloroDownload.py"). Each session runs in its own thread and takes
+work from a shared queue of remote directories and files.
+
+- Chlorophyll Archive Quota (GB) (optional user input): Maximum size of the local
+"Chlorophyll" archive. When specified, only the days required by unprocessed
+feature classes (without chlorophyll_a attribute fields) are downloaded, and the
+least recently used files are evicted above the quota (see "chloroArchive.py").
+Files of the days required by unprocessed feature classes are never evicted.
+
+- Site Chlorophyll Cache Folder (optional user input): Folder shared by every analyst
+of the site (e.g. on a network drive). Files already fetched by anyone on the site
+are copied from this content-addressed cache instead of being downloaded, and
+verified downloads are published to it.
+
+- Delete Global Files Once Ingested (optional user input): Boolean parameter (off
+by default) indicating whether the verified global NetCDF files are deleted once
+ingested into the regional store, to reduce the size of the archive. A store entry
+then makes its day available; any later use outside the pertinent region (or a
+change of the region) requires the files to be downloaded again.
 
 OUTPUT
 - Chlorophyll_a NetCDF Files (automated output): Chlorophyll_a raster data in
@@ -34,19 +67,41 @@ necessary), inside which a "Chlorophyll" folder organizes the downloads by year
 ("2010", "2011", etc). The "Auxiliary" folder is created in the same directory as
 the selected Folder Location of Dark Targets GDBs (usually the "Products" folder).
 
+- Transfer Journal (automated output): "chloro_transfers.jsonl" file in the "logs"
+folder, with one JSON record per listed directory and downloaded file (size,
+duration, throughput, attempts and error classes, see "chloroDownload.py"). A
+summary of the transfers (throughput, retries, errors and slowest days) is reported
+at the end of the run.
+
+- Regional Chlorophyll_a Store (automated output): Once downloaded, each NetCDF file
+is ingested into a compact store limited to the pertinent region (see
+"chloroStore.py"), placed in a "store" folder inside each year folder. The store
+is read by the "1b_Apply Chlorophyll_a Values" script tool.
+
 ADDITIONAL FUNCTIONS (explained in script below)
-- yearDay
-- getChloroFile"""
+- requiredDays
+- localDayExists
+- yearDay"""
 
 # Libraries
 # =========
 import arcpy
 import os
 import datetime
-import ftplib
-from ftplib import FTP
 import logging
-import time
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import chloroStore                          # get module reference for reload
+reload(chloroStore)                         # reload step 1
+
+import chloroSource                         # get module reference for reload
+reload(chloroSource)                        # reload step 1
+
+import chloroDownload                       # get module reference for reload
+reload(chloroDownload)                      # reload step 1
+
+import chloroArchive                        # get module reference for reload
+reload(chloroArchive)                       # reload step 1
 
 
 class getChloro(object):
@@ -67,7 +122,7 @@ class getChloro(object):
             direction="Input")
 
         params1 = arcpy.Parameter(
-            displayName="Chlorophyll_a Data FTP Directory",
+            displayName="Chlorophyll_a Data Source (FTP Directory, URL or Mirror Folder)",
             name="ftp_dir",
             datatype="GPString",
             parameterType="Required",
@@ -83,7 +138,39 @@ class getChloro(object):
 
 
 
-        params = [params0, params1, params2]
+        params3 = arcpy.Parameter(
+            displayName="Number of Concurrent FTP Sessions",
+            name="session_count",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params3.value = 4
+
+        params4 = arcpy.Parameter(
+            displayName="Chlorophyll Archive Quota (GB)",
+            name="archive_quota",
+            datatype="GPDouble",
+            parameterType="Optional",
+            direction="Input")
+
+        params5 = arcpy.Parameter(
+            displayName="Site Chlorophyll Cache Folder",
+            name="site_cache",
+            datatype="DEFolder",
+            parameterType="Optional",
+            direction="Input")
+
+        params6 = arcpy.Parameter(
+            displayName="Delete Global Files Once Ingested",
+            name="release_sources",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        params6.value = False
+
+        params = [params0, params1, params2, params3, params4, params5, params6]
 
         return params
 
@@ -120,67 +207,131 @@ class getChloro(object):
             os.makedirs(local_chloroFolder)
         ftpDir = parameters[1].valueAsText
         dayRange = parameters[2].value
-
-        # Set value for FTP address of host site for MODIS data
-        fileHostPath = ftpDir.split('/')[0]
-
-        # Set value for FTP file directory pointing to daily chlorophyll_a data
-        fileDir = '/' + '/'.join(ftpDir.split('/')[1:])
+        sessionCount = parameters[3].value
+        if sessionCount is None:
+            sessionCount = 1
+        archiveQuota = parameters[4].value
+        cache = None
+        if parameters[5].valueAsText:
+            cache = chloroSource.siteCache(parameters[5].valueAsText)
+        releaseSources = parameters[6].value == True
+
+        # Open chlorophyll_a source (FTP site, web site or mirror folder) and directory pointing to daily chlorophyll_a data
+        source, fileDir = chloroSource.openSource(ftpDir)
 
         # Determine list of yearly GDBs in workspace
         arcpy.env.workspace = working_folder
         gdbList = arcpy.ListWorkspaces("*", "FileGDB")
         arcpy.AddMessage("Workspace contains the following " + str(len(gdbList)) + " GDBs: " + str(gdbList))
 
-        # Connect to ftp host
-        arcpy.AddMessage("\nConnecting to host ftp site2: " + fileHostPath)
-        ftp = FTP(fileHostPath)
-        ftp.login()
-        logging.info("Login established to FTP host '%s'\n", fileHostPath)
+        # Prepare download pool of concurrent source sessions
+        arcpy.AddMessage("\nPreparing " + str(sessionCount) + " sessions to " + source.name)
+        downloadPool = chloroDownload.downloadPool(source, local_chloroFolder, sessionCount, cache=cache,
+                                                   journalPath=os.path.join(logPath, "chloro_transfers.jsonl"))
+
+        # Planning phase: determine the union of the days required by every GDB (by unprocessed feature classes only if the archive has a quota)
+        arcpy.AddMessage("\nVerifying files to download...")
+        requiredDays = self.requiredDays(gdbList, dayRange, archiveQuota is not None)
+
+        # Only days without a verified local chlorophyll_a file are listed on the ftp server
+        missingDays = [day for day in requiredDays if not self.localDayExists(local_chloroFolder, day)]
+        arcpy.AddMessage(str(len(requiredDays)) + " days required, " + str(len(requiredDays) - len(missingDays)) + " already available locally.")
+        logging.info("Download plan: %d days required, %d days missing locally: '%s'\n", len(requiredDays), len(missingDays), str(missingDays))
+        plannedFiles = downloadPool.plan([fileDir + day for day in missingDays], arcpy.AddMessage)
+        totalBytes = sum([size for remoteDir, fileName, size in plannedFiles])
+        arcpy.AddMessage("\n" + str(len(plannedFiles)) + " files to download (" + str(round(totalBytes / 1000000.0, 1)) + " MB).")
+        logging.info("Download plan: %d files to download (%d bytes)\n", len(plannedFiles), totalBytes)
+
+        # Download phase: fetch each missing file once
+        arcpy.AddMessage("\nDownloading files...")
+        downloaded, failed = downloadPool.download(plannedFiles, arcpy.AddMessage)
+        arcpy.AddMessage("\n" + str(len(downloaded)) + " files downloaded (" + str(downloadPool.cacheCount) + " copied from site cache).")
+        logging.info("%d files downloaded, %d copied from site cache\n", len(downloaded), downloadPool.cacheCount)
+        if len(failed) > 0:
+            arcpy.AddWarning("The following items could not be downloaded: " + str(failed))
+            logging.info("Failed downloads: '%s'\n", str(failed))
+
+        # Report summary of the transfers recorded in the transfer journal
+        summary = downloadPool.summaryReport()
+        arcpy.AddMessage("\n" + "\n".join(summary))
+        logging.info("%s\n", "\n".join(summary))
+
+        # Ingest downloaded files into the regional chlorophyll_a store
+        arcpy.AddMessage("\nIngesting chlorophyll files into regional store...")
+        for year in sorted(os.listdir(local_chloroFolder)):
+            chloroYear = os.path.join(local_chloroFolder, year)
+            if os.path.isdir(chloroYear):
+                ingestCount = chloroStore.ingestFolder(chloroYear, releaseSources)
+                arcpy.AddMessage(str(ingestCount) + " files ingested for " + year)
+                logging.info("Ingest: %d files of '%s' ingested into regional store", ingestCount, chloroYear)
+
+        # Evict least recently used files above the archive quota, files required by unprocessed feature classes are pinned
+        if archiveQuota is not None:
+            arcpy.AddMessage("\nEvicting least recently used chlorophyll files above " + str(archiveQuota) + " GB quota...")
+            evicted, archiveBytes = chloroArchive.evictFiles(local_chloroFolder, int(archiveQuota * 1000000000), set(requiredDays))
+            arcpy.AddMessage(str(len(evicted)) + " files evicted, archive size: " + str(round(archiveBytes / 1000000000.0, 2)) + " GB.")
+            logging.info("Archive: %d files evicted, archive size %d bytes (quota %s GB)\n", len(evicted), archiveBytes, str(archiveQuota))
+            if archiveBytes > archiveQuota * 1000000000:
+                arcpy.AddWarning("Chlorophyll archive exceeds its quota with the files required by unprocessed feature classes.")
+        arcpy.AddMessage("\nChlorophyll file downloads complete.")
+        logging.info("getChloro.py script finished\n\n")
+
+        return
+
+    def requiredDays(self, gdbList, dayRange, unprocessedOnly=False):
+        """Determine the union of the days of chlorophyll_a data required by the feature classes of every yearly GDB.
+
+        Parameters:
+            gdbList = List of yearly dark targets GDBs.
+            dayRange = Integer input by user that sets the range +/- of days around each acquisition day.
+            unprocessedOnly = If True, only the feature classes without chlorophyll_a attribute fields ("chlor_a...") are considered.
 
-        # Iterate through yearly GDBs in order to determine required chlorophyll_a files for download
-        arcpy.AddMessage("\nConnected. Verifying files to download...")
+        Return:
+            Returns the sorted list of required sub-directory strings (YYYY/DDD), each listed once."""
+        requiredDays = set()
         for gdb in gdbList:
 
             # Determine list of feature classes requiring files in current GDB
             arcpy.env.workspace = gdb
             logging.info("Processing '%s' geodatabase", gdb)
             fcList = arcpy.ListFeatureClasses()
-
             arcpy.AddMessage("\nGDB contains the following " + str(len(fcList)) + " feature classes: " + str(fcList))
             logging.info("List of acquisition days requiring file downloads: '%s'\n", str(fcList))
 
-            # Iterate through feature classes in GDB
+            # Determine corresponding year and date path for location on ftp server of every feature class
             for fc in fcList:
-                arcpy.AddMessage("Started to go through days")
-                # Determine corresponding year and date path for location on ftp server
-                dateFolder = self.yearDay(fc.split('_')[1], dayRange)
-                arcpy.AddMessage("{}".format(dateFolder))
-
-                for day in dateFolder:
-                    chloroFilePath = fileDir + day
-                    arcpy.AddMessage("{}".format(chloroFilePath))
-                    # Initiate download of files for current feature class
-                    logging.info("Attempting file downloads for '%s' feature class\n", fc)
-                    for tries in range(5):
-                      try:
-                             self.getChloroFile(ftp, chloroFilePath, local_chloroFolder)
-                             break
-                      except ftplib.all_errors as e:
-                             x = 20
-                             arcpy.AddMessage('\n --------------------ERROR: FAILED ATTEMPT #{a} of 5. WILL ATTEMPT TO DOWNLOAD FILE AGAIN IN {x} SECONDS-----------------\n'.format(a = tries,x = x))
-                             time.sleep(x)
-
-
-
-            logging.info("Processing for '%s' geodatabase complete\n", gdb)
-
-        # Disconnect from ftp host
-        ftp.quit()
-        arcpy.AddMessage("\nChlorophyll file downloads complete.")
-        logging.info("getChloro.py script finished\n\n")
+                if unprocessedOnly and any(field.name.startswith("chlor_a") for field in arcpy.ListFields(fc)):
+                    continue
+                requiredDays.update(self.yearDay(fc.split('_')[1], dayRange))
 
-        return
+        return sorted(requiredDays)
+
+    def localDayExists(self, localChloro, day):
+        """Check if the chlorophyll_a file of a day is already available locally: an up to date regional store entry
+        (when the NetCDF file was deleted once ingested), or a NetCDF file that matches its local .md5 checksum (verified
+        lazily, only once for an unchanged file).
+
+        Parameters:
+            localChloro = The local folder directory, normally named "Chlorophyll", in which the chlorophyll_a data is downloaded.
+            day = Sub-directory string of the day (YYYY/DDD).
+
+        Return:
+            Returns True if the day (file named "AYYYYDDD...") is available locally."""
+        year, yDay = day.split('/')
+        localFolder = os.path.join(localChloro, year)
+        prefix = "A" + year + yDay
+        for fileName in chloroStore.listSources(localFolder):
+            if fileName.startswith(prefix):
+                ncFilePath = os.path.join(localFolder, fileName)
+                if os.path.exists(ncFilePath):
+                    available = chloroDownload.verifyLocalFile(ncFilePath) == True
+                else:
+                    available = chloroStore.storeCurrent(ncFilePath)
+                if available:
+                    chloroStore.recordAccess(ncFilePath)
+                return available
+
+        return False
 
     def yearDay(self, fc_dateString, dayRange):
         """Calculate the day of the year for each RADARSAT-2 acquisition (to conform to MODIS naming convention) and the day of year within the range desired
@@ -210,57 +361,4 @@ class getChloro(object):
             yDay = chloroDate.timetuple().tm_yday
             chloroDateList.append(str(chloroDate.year) + '/' + str(yDay).rjust(3,'0'))
 
-        return chloroDateList
-
-    def getChloroFile(self, ftp, chloroFilePath, localChloro):
-        """Download chlorophyll_a data corresponding to the identified RADARSAT-2 acquisition day.
-
-        Parameters:
-            ftp = The ftp connection object, activated via connection to the ftp upon execution of this script.
-            chloroFilePath = The folder directory on the ftp server specific to the required year and day of MODIS acquisition
-            localChloro = The local folder directory, normally named "Chlorophyll", in which the chlorophyll_a data is downloaded
-
-        Return:
-            No return"""
-        # Change working directory on ftp server to required year and day of the chlorophyll_a data.
-        logging.info("Accessing '%s' on ftp server", chloroFilePath)
-        ftp.cwd(chloroFilePath)
-        arcpy.AddMessage("{}".format(chloroFilePath))
-
-
-        # List all files in current ftp server folder (should be 1x .nc file and 1x .md5 file)
-        files = ftp.nlst()
-        logging.info("Directory contains following files to download: '%s'", str(files))
-
-        # Identify year of data in order to point to appropriate local folder for download
-        year = chloroFilePath.split('/')[len(chloroFilePath.split('/'))-2]
-
-        # Iterate through files in current ftp server folder
-        for item in files:
-
-            # Determine local paths for file downloads (within appropriate year folder)
-            local_folderPath = os.path.join(localChloro, year)
-            local_filePath = os.path.join(local_folderPath, item)
-
-            # Check if file has already been downloaded
-            if os.path.exists(local_filePath):
-                arcpy.AddMessage(item + " already downloaded.")
-                logging.info("'%s' already downloaded in '%s'", item, local_folderPath)
-
-            # Initiate file download
-            else:
-
-                # Check if year folder already exists or needs to be created on local directory
-                if not os.path.exists(local_folderPath):
-                    os.makedirs(local_folderPath)
-                    logging.info("'%s' created for file download", local_folderPath)
-
-                # Download file
-                arcpy.AddMessage("Downloading " + item + "... (" + str(ftp.size(item)/1000000) + " MB)")
-                logging.info("Starting download of '%s'", item)
-                local_file = open(local_filePath, 'wb')
-                ftp.retrbinary('RETR ' + item, open(local_filePath, 'wb').write)
-                local_file.close()
-                logging.info("Download of '%s' complete", item)
-
-        logging.info("Downloads from '%s' complete\n", chloroFilePath)
\ No newline at end of file
+        return chloroDateList
\ No newline at end of file
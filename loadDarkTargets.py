@@ -17,6 +17,15 @@ them to feature classes in the output file geodatabase previously created by
 "createGDBStruct.py". Some data clean-up occurs, and a datetime field and
 targetID field are added to the feature class.
 
+In parallel ingest mode (more than one worker process), each image folder is
+imported by a worker process into its own scratch GDB, and the feature classes
+are then bulk-loaded into the dark features dataset.
+
+Shapefiles are read by "shapeReader.py", which skips the background ocean polygon
+(Pid = 1) without reading its geometry. Records are grouped by "Pid" and each
+dissolved dark target is written once, with its datetime and targetID values, to
+a feature class created with its final schema.
+
 INPUT
 - Dark Targets Shapefiles (automated input): Shapefiles located in the Year Folder
  produced by the RADARSAT-2 dark target feature extraction process. Every shapefile
@@ -26,6 +35,9 @@ INPUT
 - Dark Feature Dataset (automated input): Feature dataset in the output file
 geodatabase in which the shapefiles are directly converted to feature classes.
 
+- Number of Worker Processes (automated input): Number of image folders imported
+at the same time (parallel ingest mode if more than one).
+
 OUTPUT
 - Dark Targets Feature Classes (automated output): Feature classes converted
 from the input shapefiles. Each feature class is projected and placed in the
@@ -38,7 +50,19 @@ a concatenation of each target's "Pid" and datetime stamp."""
 # =========
 import arcpy
 import os
+import sys
+import datetime
+import shutil
 import logging
+import traceback
+import multiprocessing
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import shapeReader                          # get module reference for reload
+reload(shapeReader)                         # reload step 1
+from shapeReader import shapeReader         # reload step 2
+import workerLog                            # get module reference for reload
+reload(workerLog)                           # reload step 1
 
 
 class loadDarkTargets(object):
@@ -51,7 +75,7 @@ class loadDarkTargets(object):
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-        params = [None]*2
+        params = [None]*4
 
         params[0] = arcpy.Parameter(
             displayName="Year Folder",
@@ -67,6 +91,23 @@ class loadDarkTargets(object):
             parameterType="Required",
             direction="Input")
 
+        params[2] = arcpy.Parameter(
+            displayName="Number of Worker Processes (parallel ingest)",
+            name="worker_count",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params[2].value = 1
+
+        params[3] = arcpy.Parameter(
+            displayName="Image Folders (incremental conditioning)",
+            name="image_names",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
         return params
 
     def isLicensed(self):
@@ -91,85 +132,236 @@ class loadDarkTargets(object):
         # Define variables from parameters
         arcpy.env.workspace = parameters[0].valueAsText
         featWorkspace = parameters[1].valueAsText
+        workerCount = parameters[2].value if len(parameters) > 2 else None
+        if workerCount is None:
+            workerCount = 1
 
         # Determine list of RADARSAT-2 image folder workspaces
         image_list = arcpy.ListWorkspaces()
+        # Restrict to the requested image folders (incremental conditioning)
+        imageFilter = parameters[3].values if len(parameters) > 3 else None
+        if imageFilter is not None:
+            image_list = [image for image in image_list if os.path.basename(os.path.normpath(image)) in imageFilter]
         arcpy.AddMessage("Workspace contains " + str(len(image_list)) + " image folders to import.")
 
-        # Iterate through image folders
-        for image in image_list:
-            logging.info("Processing '%s' source image", image)
-            # Set workspace to "Features" folder inside current image folder
-            arcpy.env.workspace = os.path.join(image,"Features")
+        # Process image folders in worker processes (parallel mode) or one after another
+        if workerCount > 1 and len(image_list) > 1:
+            self.executeParallel(image_list, workerCount, featWorkspace)
+        else:
+            for image in image_list:
+                self.loadImage(image, featWorkspace)
+
+        logging.info("loadDarkTargets.py script finished\n\n")
+
+        return
 
-            # Detect shapefile to import
-            fcList = arcpy.ListFeatureClasses()
-            fc = fcList[0]
-            path_split = image.split("\\")
-            imageName = path_split[len(path_split)-1]
-            arcpy.AddMessage("\nProcessing " + imageName + " -- " + fc)
+    def loadImage(self, image, outWorkspace):
+        """Import the dark targets shapefile of a RADARSAT-2 image folder as a feature class, dissolved by "Pid" and with its
+        DateTime and targetID fields.
 
-            # Create feature layer from shapefile, excluding ocean polygon
+        Parameters:
+            image = RADARSAT-2 image folder, containing the shapefile in its "Features" folder.
+            outWorkspace = Workspace (dark features dataset, or scratch GDB of a worker process) in which the feature class is created.
+
+        Return:
+            Returns the path of the created feature class."""
+        logging.info("Processing '%s' source image", image)
+        # Set workspace to "Features" folder inside current image folder
+        arcpy.env.workspace = os.path.join(image,"Features")
+
+        # Detect shapefile to import
+        fcList = arcpy.ListFeatureClasses()
+        fc = fcList[0]
+        path_split = image.split("\\")
+        imageName = path_split[len(path_split)-1]
+        arcpy.AddMessage("\nProcessing " + imageName + " -- " + fc)
+
+        # Parse datetime from folder name
+        folder_split = imageName.split("_")
+        fcName = folder_split[0] + "_" + folder_split[5] + "_" + folder_split[6]
+        dateTime = datetime.datetime.strptime(folder_split[5] + folder_split[6], "%Y%m%d%H%M%S")
+        # Target ID suffix: concatenation of the acquisition date and time strings
+        idSuffix = "_" + folder_split[5] + "_" + folder_split[6]
+
+        # Dissolve dark targets by "Pid" and write them with their DateTime and targetID values in one pass
+        arcpy.AddMessage("Dissolving and adding datetime and targetID fields...")
+        outFeatureClass = self.dissolveTargets(os.path.join(arcpy.env.workspace, fc), outWorkspace, fcName, dateTime, idSuffix)
+
+        logging.info("Processing for '%s' source image complete\n", image)
+
+        return outFeatureClass
+
+    def dissolveTargets(self, shpPath, outWorkspace, fcName, dateTime, idSuffix):
+        """Dissolve the dark targets of a shapefile by "Pid" into a new feature class, excluding the background ocean polygon
+        (Pid = 1). Records are grouped by "Pid" in a dictionary (the first attribute values of each group being kept) and
+        every dissolved target is written once, with its DateTime and targetID values, to a feature class created with
+        its final schema.
+
+        Parameters:
+            shpPath = Path of the dark targets shapefile.
+            outWorkspace = Workspace (dark features dataset, or scratch GDB of a worker process) in which the feature class is created.
+            fcName = Name of the feature class.
+            dateTime = Acquisition date and time (datetime) of the image.
+            idSuffix = Suffix of the targetID values ("_<date>_<time>").
+
+        Return:
+            Returns the path of the created feature class."""
+        outFeatureClass = os.path.join(outWorkspace, fcName)
+        shpRef = arcpy.Describe(shpPath).spatialReference
+        outRef = shpRef
+        if arcpy.Describe(outWorkspace).dataType == "FeatureDataset":
+            outRef = arcpy.Describe(outWorkspace).spatialReference
+        project = outRef.name != shpRef.name
+
+        with shapeReader(shpPath) as reader:
+            # Group records by "Pid": first attribute values and polygons of each dark target
             # ============================================================== #
             # Attribute assumption: Background ocean polygon's "Pid" = 1     #
             # ============================================================== #
-            tempLayer = "darkTargetsLyr"
-            arcpy.MakeFeatureLayer_management(fc, tempLayer, "NOT \"Pid\" = 1")
-            logging.info("Make Feature Layer: '%s' layer created from '%s' feature class", tempLayer, fc)
-
-            # Parse datetime from folder name
-            folder_split = imageName.split("_")
-            fcName = folder_split[0] + "_" + folder_split[5] + "_" + folder_split[6]
-            outFeatureClass = os.path.join(featWorkspace, fcName)
-
-            # Dissolve feature layer to collapse polygons with identical attributes together
-            arcpy.AddMessage("Dissolving...")
-            fieldList = arcpy.ListFields(fc)
-            statsFields = []
-            for field in fieldList:
-                if "FID" in field.name or "Shape" in field.name or "Pid" in field.name or field.name == "ID":
+            targets = {}
+            for pid, attributes, rings in reader.records("Pid", 1):
+                if len(rings) == 0:
                     continue
-                statsField = [field.name,"FIRST"]
-                statsFields.append(statsField)
-            arcpy.Dissolve_management(tempLayer, outFeatureClass, "Pid", statsFields)
-            logging.info("Dissolve: '%s' feature class created from '%s' layer dissolve", outFeatureClass, tempLayer)
-
-            # Rename attribute fields to revert to original field names
-            arcpy.AddMessage("Renaming attribute fields...")
-            fieldList = arcpy.ListFields(outFeatureClass)
-            for field in fieldList:
-                if field.name.startswith("FIRST_"):
-                    newName = field.name[6:]
-                    arcpy.AlterField_management(outFeatureClass, field.name, newName)
-
-            # Add Date field
-            arcpy.AddMessage("Adding datetime field...")
+                parts = arcpy.Array()
+                for ring in rings:
+                    parts.add(arcpy.Array([arcpy.Point(ring[i], ring[i + 1]) for i in range(0, len(ring), 2)]))
+                polygon = arcpy.Polygon(parts, shpRef)
+                if pid in targets:
+                    targets[pid][1].append(polygon)
+                else:
+                    targets[pid] = [attributes, [polygon]]
+
+            # Create feature class with its final schema: "Pid", attribute fields, DateTime and targetID
+            arcpy.CreateFeatureclass_management(outWorkspace, fcName, "POLYGON", spatial_reference=outRef)
+            logging.info("Create Feature Class: '%s' feature class created", outFeatureClass)
+            pidIndex = reader.fieldNames.index("Pid")
+            fieldIndexes = [pidIndex]
+            for i, field in enumerate(reader.fields):
+                if "FID" in field[0] or "Shape" in field[0] or "Pid" in field[0] or field[0] == "ID":
+                    continue
+                fieldIndexes.append(i)
+            for i in fieldIndexes:
+                name, fieldType, length, decimals = reader.fields[i][:4]
+                arcpy.AddField_management(outFeatureClass, name, self.fieldType(fieldType, length, decimals), field_length=length)
             arcpy.AddField_management(outFeatureClass, "DateTime", "DATE")
-            logging.info("Add Field: 'DateTime' field (date data type) added to '%s' feature class", outFeatureClass)
-            year = folder_split[5][:4]
-            month = folder_split[5][4:6].lstrip("0")
-            day = folder_split[5][-2:].lstrip("0")
-            hour = folder_split[6][:2].lstrip("0")
-            minute = folder_split[6][2:4].lstrip("0")
-            if minute == "":
-                minute = "0"
-            second = folder_split[6][-2:].lstrip("0")
-            if second == "" :
-                second = "0"
-            expression = "datetime.datetime(" + year + "," + month + "," + day + "," + hour + "," + minute + "," + second + ")"
-            arcpy.CalculateField_management(outFeatureClass, "DateTime", expression, "PYTHON_9.3")
-            logging.info("Calculate Field: 'DateTime' field value calculated for '%s' feature class", outFeatureClass)
-
-            # Add target ID field to uniquely identify dark targets
-            arcpy.AddMessage("Adding targetID field...")
             arcpy.AddField_management(outFeatureClass, "targetID", "TEXT")
-            logging.info("Add Field: 'targetID' field (string data type) added to '%s' feature class", outFeatureClass)
-            expression = "str(!Pid!)[:-2] + '_' + str(" + folder_split[5] + ") + '_' + str(" + folder_split[6] + ")"
-            arcpy.CalculateField_management(outFeatureClass, "targetID", expression, "PYTHON_9.3")
-            logging.info("Calculate Field: 'targetID' field value calculated for '%s' feature class", outFeatureClass)
+            logging.info("Add Field: %d attribute fields, 'DateTime' and 'targetID' fields added to '%s' feature class", len(fieldIndexes), outFeatureClass)
 
-            logging.info("Processing for '%s' source image complete\n", image)
+            # Write each dissolved target (sorted by "Pid", as by Dissolve)
+            cursorFields = ["SHAPE@"] + [reader.fieldNames[i] for i in fieldIndexes] + ["DateTime", "targetID"]
+            with arcpy.da.InsertCursor(outFeatureClass, cursorFields) as cursor:
+                for pid in sorted(targets):
+                    attributes, polygons = targets[pid]
+                    # Union the polygons of the target pairwise (tree reduction) rather than into one growing geometry
+                    while len(polygons) > 1:
+                        polygons = [polygons[i].union(polygons[i + 1]) if i + 1 < len(polygons) else polygons[i]
+                                    for i in range(0, len(polygons), 2)]
+                    dissolved = polygons[0]
+                    if project:
+                        dissolved = dissolved.projectAs(outRef)
+                    targetID = str(int(pid)) + idSuffix
+                    cursor.insertRow([dissolved] + [attributes[i] for i in fieldIndexes] + [dateTime, targetID])
+        logging.info("Dissolve: %d dark targets of '%s' dissolved by 'Pid' into '%s' with 'DateTime' and 'targetID' values", len(targets), shpPath, outFeatureClass)
 
-        logging.info("loadDarkTargets.py script finished\n\n")
+        return outFeatureClass
+
+    def fieldType(self, dbfType, length, decimals):
+        """Determine the geodatabase field type of a .dbf field, as converted by ArcGIS.
+
+        Parameters:
+            dbfType = Type character of the .dbf field.
+            length, decimals = Length and number of decimals of the .dbf field.
+
+        Return:
+            Returns the field type (string) used by AddField."""
+        if dbfType == 'N' and decimals == 0 and length <= 4:
+            return "SHORT"
+        if dbfType == 'N' and decimals == 0 and length <= 9:
+            return "LONG"
+        if dbfType in ('N', 'F'):
+            return "DOUBLE"
+        if dbfType == 'D':
+            return "DATE"
+
+        return "TEXT"
+
+    def executeParallel(self, image_list, workerCount, featWorkspace):
+        """Import the image folders with a pool of worker processes (parallel mode). Each worker imports its images into
+        its own scratch GDB, then the feature classes are bulk-loaded into the dark features dataset.
+
+        Parameters:
+            image_list = List of RADARSAT-2 image folders to import.
+            workerCount = Maximum number of worker processes.
+            featWorkspace = Dark features dataset into which the feature classes are loaded.
+
+        Return:
+            No return"""
+        poolSize = min(workerCount, len(image_list))
+        arcpy.AddMessage("Dispatching " + str(len(image_list)) + " image folders to " + str(poolSize) + " worker processes...")
+        logging.info("Parallel ingest: %d image folders dispatched to %d worker processes\n", len(image_list), poolSize)
+
+        # Worker logs and scratch workspaces are placed beside the year folder, with "conditionData.log"
+        gdbWorkspace = os.path.dirname(featWorkspace)
+        productsFolder = os.path.dirname(gdbWorkspace)
+        logPath = os.path.join(productsFolder, "logs")
+        scratchRoot = os.path.join(productsFolder, "scratch_" + os.path.splitext(os.path.basename(gdbWorkspace))[0])
+
+        # Worker processes must be started with python rather than the ArcGIS application running the tool
+        if not os.path.basename(sys.executable).lower().startswith("python"):
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+        pool = multiprocessing.Pool(poolSize, initWorker, (logPath, scratchRoot))
+        try:
+            results = pool.map(runWorkerTask, image_list, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+        # Bulk-load worker feature classes into the dark features dataset (projected to the dataset coordinate system)
+        arcpy.AddMessage("\nLoading worker feature classes into " + featWorkspace + "...")
+        for image, scratchFC, error in results:
+            if error is not None:
+                arcpy.AddError("Import of " + image + " failed:\n" + error)
+                logging.info("Parallel ingest: import of '%s' failed", image)
+                continue
+            fcName = os.path.basename(scratchFC)
+            arcpy.FeatureClassToFeatureClass_conversion(scratchFC, featWorkspace, fcName)
+            logging.info("Feature Class to Feature Class: '%s' feature class loaded into '%s'", fcName, featWorkspace)
+
+        # Merge worker logs into conditionData.log and remove worker scratch workspaces
+        workerLog.mergeWorkerLogs(logPath, "conditionData")
+        shutil.rmtree(scratchRoot, ignore_errors=True)
+
+        return
+
+
+def initWorker(logPath, scratchRoot):
+    """Initialize a loadDarkTargets worker process (parallel ingest) with its own log file and scratch GDB.
+
+    Parameters:
+        logPath = Folder in which the worker log is written (merged into "conditionData.log" once every worker is finished).
+        scratchRoot = Folder in which the worker scratch workspace is created.
+
+    Return:
+        No return"""
+    workerName = workerLog.initWorkerLog(logPath, "conditionData")
+    scratchFolder = os.path.join(scratchRoot, workerName)
+    if not os.path.exists(scratchFolder):
+        os.makedirs(scratchFolder)
+    # The scratch GDB (scratch.gdb) is created in the scratch workspace folder
+    arcpy.env.scratchWorkspace = scratchFolder
+
+
+def runWorkerTask(image):
+    """Import a RADARSAT-2 image folder into the scratch GDB of a loadDarkTargets worker process (parallel ingest).
+
+    Parameter:
+        image = RADARSAT-2 image folder, as for loadDarkTargets.loadImage.
 
-        return
\ No newline at end of file
+    Return:
+        Returns a tuple of the image folder, the scratch feature class and the error traceback (None if successful)."""
+    try:
+        scratchFC = loadDarkTargets().loadImage(image, arcpy.env.scratchGDB)
+        return image, scratchFC, None
+    except Exception:
+        logging.exception("Import of '%s' failed", image)
+        return image, None, traceback.format_exc()
\ No newline at end of file
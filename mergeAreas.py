@@ -30,9 +30,13 @@ overlapping regions that have been evaluated with a single set of attributes.
 OUTPUT
 - Acquisition day Feature Classes (automated output): Output feature classes
 resulting from the Merge of the toMerge and noOverlap feature classes for each
-acquisition day. The Total Overlap feature class is used to pull the combined
-targetID value and apply it to this feature class. These feature classes are
-placed in the Yearly Dark Targets geodatabase for the specified year."""
+acquisition day. The Total Overlap feature class is read to build the combined
+targetID of each overlapping dark target (by Pid and RsatID), which is applied to
+this feature class once it is dissolved. These feature classes are placed in the
+Yearly Dark Targets geodatabase for the specified year.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- combinedTargetIDs"""
 
 # Libraries
 # =========
@@ -51,7 +55,7 @@ class mergeAreas(object):
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-        params = [None]*3
+        params = [None]*4
 
         params[0] = arcpy.Parameter(
             displayName="Overlap Dataset",
@@ -74,6 +78,14 @@ class mergeAreas(object):
             parameterType="Required",
             direction="Input")
 
+        params[3] = arcpy.Parameter(
+            displayName="Acquisition Dates (incremental conditioning)",
+            name="acquisition_dates",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
         return params
 
     def isLicensed(self):
@@ -99,12 +111,19 @@ class mergeAreas(object):
         overlapWorkspace = parameters[0].valueAsText
         gdbWorkspace = parameters[1].valueAsText
         featWorkspace = parameters[2].valueAsText
+        # Acquisition dates to process (every date if not defined)
+        dateFilter = parameters[3].values if len(parameters) > 3 else None
 
         # Determine list of total overlap, no overlap and to merge feature classes in overlap feature dataset workspace to process.
         arcpy.env.workspace = overlapWorkspace
         mergeList = arcpy.ListFeatureClasses("*_toMerge")
         totalOverlapList = arcpy.ListFeatureClasses("*_TotalOverlap")
         noOverlapList = arcpy.ListFeatureClasses("*_noOverlap")
+        if dateFilter is not None:
+            mergeList = [fc for fc in mergeList if fc.split("_")[1] in dateFilter]
+            totalOverlapList = [fc for fc in totalOverlapList if fc.split("_")[1] in dateFilter]
+            noOverlapList = [fc for fc in noOverlapList if fc.split("_")[1] in dateFilter]
+        totalOverlapDictByDate = dict([(fc.split("_")[1], os.path.join(overlapWorkspace, fc)) for fc in totalOverlapList])
         if len(mergeList) > 0:
             arcpy.AddMessage("Workspace contains the following " + str(len(mergeList)) + " feature classes to merge: " + str(mergeList))
 
@@ -124,6 +143,8 @@ class mergeAreas(object):
         # Organize dark targets feature classes by date
         arcpy.env.workspace = featWorkspace
         fcList = arcpy.ListFeatureClasses()
+        if dateFilter is not None:
+            fcList = [fc for fc in fcList if fc.split("_")[1] in dateFilter]
         fcDictByDate = {}
         for fc in fcList:
             fcPath = os.path.join(featWorkspace, fc)
@@ -168,11 +189,11 @@ class mergeAreas(object):
             arcpy.Merge_management(mergeList, outputDissolve)
             logging.info("Merge: '%s' created from merging the following feature classes: '%s'", outputDissolve, str(mergeList))
 
-            # Dissolve attribute duplicates and rename fields
+            # Dissolve attribute duplicates into the acquisition date feature class and rename fields
             arcpy.AddMessage("Dissolving...")
             dissolveLyr = "dissolveLyr"
-            outputMergeString = "RS2_" + key + "_merged"
-            outputMerge = os.path.join(gdbWorkspace, outputMergeString)
+            finalOutputString = "RS2_" + key
+            finalOutput = os.path.join(gdbWorkspace, finalOutputString)
             dissolveFields = ["Pid", "RsatID"]
             fieldList = arcpy.ListFields(outputDissolve)
             statsFields = []
@@ -183,66 +204,32 @@ class mergeAreas(object):
                 statsFields.append(statsField)
             arcpy.MakeFeatureLayer_management(outputDissolve, dissolveLyr)
             logging.info("Make Feature Layer: '%s' layer created from '%s' feature class", dissolveLyr, outputDissolve)
-            arcpy.Dissolve_management(dissolveLyr, outputMerge, dissolveFields, statsFields)
-            logging.info("Dissolve: '%s' feature class created from '%s' layer dissolve", outputMerge, dissolveLyr)
-            fieldList = arcpy.ListFields(outputMerge)
+            arcpy.Dissolve_management(dissolveLyr, finalOutput, dissolveFields, statsFields)
+            logging.info("Dissolve: '%s' feature class created from '%s' layer dissolve", finalOutput, dissolveLyr)
+            fieldList = arcpy.ListFields(finalOutput)
             for field in fieldList:
                 if field.name.startswith("FIRST_"):
                     newName = field.name[6:]
-                    arcpy.AlterField_management(outputMerge, field.name, newName)
-
-            # Update targetID with combined target ID for overlapping features
-            arcpy.AddMessage("Updating targetID...")
-            finalOutputString = "RS2_" + key
-            overlapBool = False
-
-            # Iterate through total overlap feature classes
-            for fc in totalOverlapList:
-
-                # Check for merged acquisition date feature class containing overlapping features (by finding equivalent total overlap feature class)
-                if finalOutputString == fc.strip("_TotalOverlap"):
-                    overlapBool = True
-
-                    # Perform spatial join to access targetID field from total overlap feature class
-                    totalOverlapFc = os.path.join(overlapWorkspace, fc)
-                    finalOutput = os.path.join(gdbWorkspace, finalOutputString)
-                    fieldmappings = arcpy.FieldMappings()
-                    fieldmappings.addTable(outputMerge)
-                    fldmap_TARGETID = arcpy.FieldMap()
-                    fldmap_TARGETID.addInputField(totalOverlapFc, "targetID")
-                    fld_TARGETID = fldmap_TARGETID.outputField
-                    fld_TARGETID.name = "targetID_1"
-                    fldmap_TARGETID.outputField = fld_TARGETID
-                    fieldmappings.addFieldMap(fldmap_TARGETID)
-                    arcpy.SpatialJoin_analysis(outputMerge, totalOverlapFc, finalOutput, "#", "#", fieldmappings)
-                    logging.info("Spatial Join: '%s' feature class created by joining '%s' with '%s'", finalOutput, outputMerge, totalOverlapFc)
-
-                    # Update targetID with combined targetID determined from total overlap feature class
-                    expression = "copyTargetID(!targetID!, !targetID_1!)"
-                    codeblock = """def copyTargetID(targetID, comb_targetID):
-                        if comb_targetID is None:
-                            return targetID
-                        else:
-                            return comb_targetID"""
-                    arcpy.CalculateField_management(finalOutput, "targetID", expression, "PYTHON_9.3", codeblock)
-                    logging.info("Calculate Field: 'targetID' field value calculated for '%s' feature class", finalOutput)
-
-                    # Delete extraneous fields
-                    arcpy.DeleteField_management(finalOutput, "targetID_1")
-                    arcpy.DeleteField_management(finalOutput, "Join_Count")
-                    arcpy.DeleteField_management(finalOutput, "TARGET_FID")
-
-            # Rename merged acquisition date feature class to appropriate name if it does not contain overlapping targets
-            if overlapBool is False:
-                arcpy.Rename_management(outputMerge, finalOutputString)
-                logging.info("Rename: '%s' feature class renamed to '%s'", outputMerge, finalOutputString)
-
-            # Delete unneeded process outputs (dissolve and merge outputs)
+                    arcpy.AlterField_management(finalOutput, field.name, newName)
+
+            # Update targetID with combined target ID for overlapping features, found by Pid and RsatID in the total overlap feature class
+            if key in totalOverlapDictByDate:
+                arcpy.AddMessage("Updating targetID...")
+                combinedIDs = self.combinedTargetIDs(totalOverlapDictByDate[key], fcDictByDate.get(key, []))
+                updateCount = 0
+                with arcpy.da.UpdateCursor(finalOutput, ["Pid", "RsatID", "targetID"]) as cursor:
+                    for row in cursor:
+                        if row[0] is None:
+                            continue
+                        combinedID = combinedIDs.get((int(row[0]), row[1]))
+                        if combinedID is not None and combinedID != row[2]:
+                            cursor.updateRow([row[0], row[1], combinedID])
+                            updateCount += 1
+                logging.info("Update Cursor: 'targetID' field value updated for %s features of '%s' feature class", updateCount, finalOutput)
+
+            # Delete unneeded process outputs (merge output)
             arcpy.Delete_management(outputDissolve)
             logging.info("Delete: '%s' feature class deleted", outputDissolve)
-            if arcpy.Exists(outputMerge):
-                arcpy.Delete_management(outputMerge)
-                logging.info("Delete: '%s' feature class deleted", outputMerge)
 
             logging.info("Processing for merges for acquisition date '%s' complete\n", key)
 
@@ -265,4 +252,45 @@ class mergeAreas(object):
 
         logging.info("mergeAreas.py script finished\n\n")
 
-        return
\ No newline at end of file
+        return
+
+    def combinedTargetIDs(self, totalOverlapFc, fcList):
+        """Build the combined targetID of each overlapping dark target of an acquisition date from its total overlap feature
+        class, without a spatial join: the dark targets of each overlap region are known from its attributes ("Pid"/"Pid_1"
+        and "RsatID"/"RsatID_1" pairs, or "Contributors" targetIDs for the N-way overlay).
+
+        Parameters:
+            totalOverlapFc = Total overlap feature class of the acquisition date.
+            fcList = List of dark targets feature classes of the acquisition date (used to find the Pid and RsatID of the
+                     contributing targetIDs of the N-way overlay).
+
+        Return:
+            Returns the dictionary of combined targetIDs by (Pid, RsatID) of the overlapping dark targets."""
+        combinedIDs = {}
+        fieldNames = [field.name for field in arcpy.ListFields(totalOverlapFc)]
+
+        # Overlap regions of the N-way overlay list the targetIDs of their contributing dark targets
+        if "Contributors" in fieldNames:
+            targetKeys = {}
+            for fc in fcList:
+                with arcpy.da.SearchCursor(fc, ["targetID", "Pid", "RsatID"]) as cursor:
+                    for row in cursor:
+                        if row[1] is not None:
+                            targetKeys[row[0]] = (int(row[1]), row[2])
+            with arcpy.da.SearchCursor(totalOverlapFc, ["targetID", "Contributors"]) as cursor:
+                for row in cursor:
+                    for targetID in (row[1] or "").split(";"):
+                        if targetID in targetKeys:
+                            combinedIDs.setdefault(targetKeys[targetID], row[0])
+
+        # Overlap regions of the pairwise union hold the Pid and RsatID of both overlapping dark targets
+        else:
+            with arcpy.da.SearchCursor(totalOverlapFc, ["targetID", "Pid", "RsatID", "Pid_1", "RsatID_1"]) as cursor:
+                for row in cursor:
+                    if row[1] is not None:
+                        combinedIDs.setdefault((int(row[1]), row[2]), row[0])
+                    if row[3] is not None:
+                        combinedIDs.setdefault((int(row[3]), row[4]), row[0])
+        logging.info("Search Cursor: combined targetID of %s overlapping dark targets read from '%s' feature class", len(combinedIDs), totalOverlapFc)
+
+        return combinedIDs
\ No newline at end of file
@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "parseOverlap.py" script to group overlapping
+dark targets for the N-way overlay. It does not require arcpy.
+
+SUMMARY
+Groups the overlapping dark targets of an acquisition date with a union-find
+(disjoint sets) structure: every overlapping pair joins the sets of its two dark
+targets, so that the dark targets connected through overlapping pairs form one
+group, however many frames overlap. The combined targetID of the overlapping dark
+targets of a region is built from their targetIDs.
+
+INPUT
+- Overlapping Pairs (automated input): Pairs of overlapping dark targets, each
+dark target identified by its (feature class, OID) tuple.
+
+OUTPUT
+- Groups (automated output): Lists of the dark targets connected through
+overlapping pairs.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- targetGroups
+- combinedTargetID"""
+
+
+def targetGroups(pairs):
+    """Group the dark targets connected through overlapping pairs (union-find with path halving).
+
+    Parameter:
+        pairs = List of (target, target2) pairs of overlapping dark targets.
+
+    Return:
+        Returns the list of groups (list of dark targets, in the order they first appear in the pairs); dark targets which
+        are not part of any pair are not grouped."""
+    parents = {}
+    order = []
+
+    def root(target):
+        if target not in parents:
+            parents[target] = target
+            order.append(target)
+        while parents[target] != target:
+            parents[target] = parents[parents[target]]
+            target = parents[target]
+        return target
+
+    for target, target2 in pairs:
+        parents[root(target)] = root(target2)
+    groups = {}
+    groupList = []
+    for target in order:
+        top = root(target)
+        if top not in groups:
+            groups[top] = []
+            groupList.append(groups[top])
+        groups[top].append(target)
+
+    return groupList
+
+
+def combinedTargetID(targetIDs):
+    """Determine the common targetID of overlapping dark targets, as "<Pid>_<Pid>_..._<date>_<time>_<time>_..." (the
+    targetID of each dark target being "<Pid>_<date>_<time>").
+
+    Parameter:
+        targetIDs = List of targetIDs of the overlapping dark targets.
+
+    Return:
+        Returns the combined targetID."""
+    idSplits = [targetID.split("_") for targetID in targetIDs]
+
+    return "_".join([idSplit[0] for idSplit in idSplits] + [idSplits[0][1]] + [idSplit[2] for idSplit in idSplits])
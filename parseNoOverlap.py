@@ -47,7 +47,7 @@ class parseNoOverlap(object):
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-        params = [None]*2
+        params = [None]*3
 
         params[0] = arcpy.Parameter(
             displayName="Dark Features Dataset",
@@ -63,6 +63,14 @@ class parseNoOverlap(object):
             parameterType="Required",
             direction="Input")
 
+        params[2] = arcpy.Parameter(
+            displayName="Acquisition Dates (incremental conditioning)",
+            name="acquisition_dates",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
         return params
 
     def isLicensed(self):
@@ -87,6 +95,8 @@ class parseNoOverlap(object):
         # Define variables from parameters
         featWorkspace = parameters[0].valueAsText
         overlapWorkspace = parameters[1].valueAsText
+        # Acquisition dates to process (every date if not defined)
+        dateFilter = parameters[2].values if len(parameters) > 2 else None
 
         # Determine list of total overlap feature classes to process
         arcpy.env.workspace = overlapWorkspace
@@ -107,6 +117,10 @@ class parseNoOverlap(object):
                 else:
                     fcDictByDate[fcSplit[1]] = [fc]
 
+            # Restrict to the requested acquisition dates (incremental conditioning)
+            if dateFilter is not None:
+                fcDictByDate = dict([(key, fcDictByDate[key]) for key in fcDictByDate if key in dateFilter])
+
             # Iterate through dark targets acquisition dates
             for key in fcDictByDate:
                 # Check for dates which contain more than one feature class (for possible overlaps within the acquisition day)
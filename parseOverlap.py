@@ -13,7 +13,24 @@ executed after "loadDarkTargets.py" and is followed by "parseNoOverlap.py".
 
 SUMMARY
 Isolates regions of overlapping polygons within an acquisition swathe and
-preserves both sets of attribute values by executing the Union tool.
+preserves both sets of attribute values by executing the Union tool. Overlapping
+feature classes are detected with STR-trees ("strTree.py") of the feature class
+extents and dark target envelopes, so that only dark targets with intersecting
+envelopes are compared, and the Union tool is executed once per overlapping pair.
+
+With the "ADJACENT_FRAMES" frame pairing, only adjacent frames of the acquisition
+pass (sorted by acquisition time and footprint, within a maximum sequence distance
+and time gap) are paired. In verification mode, the skipped pairs are checked to
+have disjoint extents; any skipped pair with intersecting extents is reported as a
+warning (its overlap is not parsed), the pairs parsed remaining the adjacent pairs.
+
+With the "N_WAY" overlay, every frame of an acquisition date is overlaid in a
+single pass instead of a Union per pair: overlapping dark targets are grouped
+("overlapGroups.py") and each overlap region is produced once, with its
+contributing dark targets ("Contributors" field), even where three or more frames
+overlap. The regions are written directly to the Total Overlap feature class of
+the date, which is then evaluated by "evalAttributes.py" (no Union or Overlap
+feature classes).
 
 INPUT
 - Dark Targets Feature Classes (automated input): Feature classes previously
@@ -48,6 +65,12 @@ import arcpy
 import os
 import logging
 
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import strTree                              # get module reference for reload
+reload(strTree)                             # reload step 1
+import overlapGroups                        # get module reference for reload
+reload(overlapGroups)                       # reload step 1
+
 
 class parseOverlap(object):
     def __init__(self):
@@ -60,7 +83,7 @@ class parseOverlap(object):
 
     def getParameterInfo(self):
         """Define parameter definitions"""
-        params = [None]*3
+        params = [None]*9
 
         params[0] = arcpy.Parameter(
             displayName="Dark Features Dataset",
@@ -72,17 +95,74 @@ class parseOverlap(object):
         params[1] = arcpy.Parameter(
             displayName="Union Dataset",
             name="unionDS",
-            datatype="DEFeatureDataset",
+            datatype=["DEWorkspace", "DEFeatureDataset"],
             parameterType="Required",
             direction="Input")
 
         params[2] = arcpy.Parameter(
             displayName="Overlap Dataset",
             name="overlapDS",
-            datatype="DEFeatureDataset",
+            datatype=["DEWorkspace", "DEFeatureDataset"],
             parameterType="Required",
             direction="Input")
 
+        params[3] = arcpy.Parameter(
+            displayName="Acquisition Dates (incremental conditioning)",
+            name="acquisition_dates",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input",
+            multiValue=True)
+
+        params[4] = arcpy.Parameter(
+            displayName="Frame Pairing",
+            name="frame_pairing",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        params[4].filter.type = "ValueList"
+        params[4].filter.list = ["ALL_PAIRS", "ADJACENT_FRAMES"]
+        params[4].value = "ALL_PAIRS"
+
+        params[5] = arcpy.Parameter(
+            displayName="Adjacent Frames: Maximum Sequence Distance (frames)",
+            name="frame_distance",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params[5].value = 1
+
+        params[6] = arcpy.Parameter(
+            displayName="Adjacent Frames: Maximum Time Gap (seconds)",
+            name="frame_time_gap",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params[6].value = 120
+
+        params[7] = arcpy.Parameter(
+            displayName="Adjacent Frames: Verify Skipped Pairs",
+            name="verify_pairing",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        params[7].value = True
+
+        params[8] = arcpy.Parameter(
+            displayName="Overlay",
+            name="overlay_mode",
+            datatype="GPString",
+            parameterType="Optional",
+            direction="Input")
+
+        params[8].filter.type = "ValueList"
+        params[8].filter.list = ["PAIRWISE_UNION", "N_WAY"]
+        params[8].value = "PAIRWISE_UNION"
+
         return params
 
     def isLicensed(self):
@@ -108,9 +188,15 @@ class parseOverlap(object):
         featWorkspace = parameters[0].valueAsText
         unionWorkspace = parameters[1].valueAsText
         overlapWorkspace = parameters[2].valueAsText
-
-        # Initialize noUnion list (to contain pairs of feature classes that no longer require Union)
-        noUnion = []
+        # Acquisition dates to process (every date if not defined)
+        dateFilter = parameters[3].values if len(parameters) > 3 else None
+        # Frame pairing strategy (every pair of feature classes, or adjacent frames of the acquisition pass only)
+        pairing = parameters[4].valueAsText if len(parameters) > 4 and parameters[4].value is not None else "ALL_PAIRS"
+        frameDistance = parameters[5].value if len(parameters) > 5 and parameters[5].value is not None else 1
+        timeGap = parameters[6].value if len(parameters) > 6 and parameters[6].value is not None else 120
+        verifyPairing = parameters[7].value != False if len(parameters) > 7 else True
+        # Overlay of overlapping feature classes (Union of each pair, or N-way overlay of every frame of the date)
+        overlayMode = parameters[8].valueAsText if len(parameters) > 8 and parameters[8].value is not None else "PAIRWISE_UNION"
 
         # Determine list of feature classes in dark_features dataset
         arcpy.env.workspace = featWorkspace
@@ -126,10 +212,27 @@ class parseOverlap(object):
             else:
                 fcDictByDate[fcSplit[1]] = [fc]
 
+        # Restrict to the requested acquisition dates (incremental conditioning)
+        if dateFilter is not None:
+            fcDictByDate = dict([(key, fcDictByDate[key]) for key in fcDictByDate if key in dateFilter])
+
         # Iterate through dark targets acquisition dates
         for key in fcDictByDate:
             arcpy.env.workspace = featWorkspace
 
+            # N-way overlay: every overlap region of the date is produced once, with its contributing dark targets
+            if overlayMode == "N_WAY":
+                if len(fcDictByDate[key]) == 1:
+                    arcpy.AddMessage("\nOnly one feature class for " + key + ", no overlay necessary!")
+                else:
+                    self.overlayDate(key, fcDictByDate[key], overlapWorkspace, pairing, frameDistance, timeGap, verifyPairing)
+                continue
+
+            # Detect overlapping pairs of feature classes within acquisition date
+            overlapPairs = {}
+            if len(fcDictByDate[key]) > 1:
+                overlapPairs = self.overlapPairs(fcDictByDate[key], pairing, frameDistance, timeGap, verifyPairing)
+
             # Iterate through feature classes within acquisition date
             for fc in fcDictByDate[key]:
                 arcpy.AddMessage("\nProcessing " + fc)
@@ -139,84 +242,67 @@ class parseOverlap(object):
                 if len(fcDictByDate[key]) == 1:
                     arcpy.AddMessage("Only one feature class for this date, no Union necessary!")
                 else:
-                    # Create feature layer from feature class for subsequent geoprocessing
-                    arcpy.MakeFeatureLayer_management(fc,'fc_lyr')
-                    logging.info("Make Feature Layer: 'fc_lyr' layer created from '%s' feature class", fc)
-
                     # Second iteration through feature classes for pairing within acquisition date
                     for fc2 in fcDictByDate[key]:
-                        # Check to skip pairing of same dark targets feature class
-                        if fc2 != fc:
-                            # Compare paired feature classes to detect spatial intersection of dark targets
-                            arcpy.SelectLayerByLocation_management('fc_lyr','intersect',fc2)
-                            logging.info("Select Layer by Location: Selected features from 'fc_lyr' which intersect with '%s'", fc2)
-                            selectioncount = int(arcpy.GetCount_management('fc_lyr')[0])
-                            logging.info("Get Count: Counted '%d' features in selection from 'fc_lyr'", selectioncount)
+                        # Check for overlap between paired feature classes (each overlapping pair is listed once, first feature class first)
+                        if (fc, fc2) in overlapPairs:
+                            selectioncount = overlapPairs[(fc, fc2)]
                             arcpy.AddMessage(str(selectioncount) + " features intersect between " + fc + " and " + fc2)
 
-                            # Check selection count (at least 1 selection) to detect overlap between paired feature classes
-                            if selectioncount != 0:
-                                # Check noUnion list to determine if paired feature classes have already performed Union on a previous iteration
-                                if fc2 in noUnion:
-                                    arcpy.AddMessage("Already performed Union for these feature classes!")
-                                else:
-                                    # Perform Union on paired feature classes
-                                    arcpy.AddMessage("Performing Union for " + fc + " and " + fc2)
-                                    unionOutputString = fc + "_" + fc2 + "_Union"
-                                    unionOutput = os.path.join(unionWorkspace, unionOutputString)
-                                    arcpy.Union_analysis([fc, fc2], unionOutput)
-                                    logging.info("Union: Created '%s' feature class from union of '%s' and '%s' feature classes", unionOutput, fc, fc2)
-
-                                    # Append overlapping paired feature class to noUnion list to skip on subsequent iterations
-                                    noUnion.append(fc)
-
-                                    # Select polygons in Union feature class that have two sets of attribute values (overlapping regions of dark targets)
-                                    selectOutputString = fc + "_" + fc2 + "_Select"
-                                    selectOutput = os.path.join(overlapWorkspace, selectOutputString)
-                                    where_clause = 'NOT FID_' + fc + ' = -1 AND NOT FID_' + fc2 + ' = -1'
-                                    arcpy.Select_analysis(unionOutput, selectOutput, where_clause)
-                                    logging.info("Select: '%s' feature class created from '%s' selection", selectOutput, unionOutput)
-
-                                    # Dissolve selected polygons to remove attribute value duplicates
-                                    arcpy.AddMessage("Dissolving " + selectOutputString)
-                                    selectLayer = "selectLyr"
-                                    overlapOutputString = fc + "_" + fc2 + "_Overlap"
-                                    overlapOutput = os.path.join(overlapWorkspace, overlapOutputString)
-                                    dissolveFields = ["Pid", "Pid_1"]
-                                    fieldList = arcpy.ListFields(selectOutput)
-                                    statsFields = []
-                                    for field in fieldList:
-                                        if "OBJECTID" in field.name or "FID" in field.name or "Shape" in field.name or "Pid" in field.name or "targetID_1" in field.name:
-                                            continue
-                                        statsField = [field.name,"FIRST"]
-                                        statsFields.append(statsField)
-                                    arcpy.MakeFeatureLayer_management(selectOutput, selectLayer)
-                                    logging.info("Make Feature Layer: '%s' layer created from '%s' feature class", selectLayer, selectOutput)
-                                    arcpy.Dissolve_management(selectLayer, overlapOutput, dissolveFields, statsFields)
-                                    logging.info("Dissolve: '%s' feature class created from '%s' layer dissolve", overlapOutput, selectLayer)
-
-                                    # Delete selection output feature class
-                                    arcpy.Delete_management(selectOutput)
-                                    logging.info("Delete: '%s' feature class deleted", selectOutput)
-
-                                    # Rename attribute fields to revert to original field names
-                                    arcpy.AddMessage("Renaming attribute fields...")
-                                    fieldList = arcpy.ListFields(overlapOutput)
-                                    for field in fieldList:
-                                        if field.name.startswith("FIRST_"):
-                                            newName = field.name[6:]
-                                            arcpy.AlterField_management(overlapOutput, field.name, newName)
-
-                                    # Modify and update targetID of overlapping dark targets to a common targetID for overlapping targets
-                                    expression = "calcTargetID(str(!Pid!)[:-2],str(!Pid_1!)[:-2],!RsatID!,!RsatID_1!)"
-                                    codeblock = """def calcTargetID(pid,pid1,rsat,rsat1):
-                                        rsatSplit = rsat.split('_')
-                                        rsatSplit1 = rsat1.split('_')
-                                        date = rsatSplit[5] + '_' + rsatSplit[6] + '_' + rsatSplit1[6]
-                                        targetID = pid + '_' + pid1 + '_' + date
-                                        return targetID"""
-                                    arcpy.CalculateField_management(overlapOutput, "targetID", expression, "PYTHON_9.3", codeblock)
-                                    logging.info("Calculate Field: 'targetID' field value calculated for '%s' feature class", overlapOutput)
+                            # Perform Union on paired feature classes
+                            arcpy.AddMessage("Performing Union for " + fc + " and " + fc2)
+                            unionOutputString = fc + "_" + fc2 + "_Union"
+                            unionOutput = os.path.join(unionWorkspace, unionOutputString)
+                            arcpy.Union_analysis([fc, fc2], unionOutput)
+                            logging.info("Union: Created '%s' feature class from union of '%s' and '%s' feature classes", unionOutput, fc, fc2)
+
+                            # Select polygons in Union feature class that have two sets of attribute values (overlapping regions of dark targets)
+                            selectOutputString = fc + "_" + fc2 + "_Select"
+                            selectOutput = os.path.join(overlapWorkspace, selectOutputString)
+                            where_clause = 'NOT FID_' + fc + ' = -1 AND NOT FID_' + fc2 + ' = -1'
+                            arcpy.Select_analysis(unionOutput, selectOutput, where_clause)
+                            logging.info("Select: '%s' feature class created from '%s' selection", selectOutput, unionOutput)
+
+                            # Dissolve selected polygons to remove attribute value duplicates
+                            arcpy.AddMessage("Dissolving " + selectOutputString)
+                            selectLayer = "selectLyr"
+                            overlapOutputString = fc + "_" + fc2 + "_Overlap"
+                            overlapOutput = os.path.join(overlapWorkspace, overlapOutputString)
+                            dissolveFields = ["Pid", "Pid_1"]
+                            fieldList = arcpy.ListFields(selectOutput)
+                            statsFields = []
+                            for field in fieldList:
+                                if "OBJECTID" in field.name or "FID" in field.name or "Shape" in field.name or "Pid" in field.name or "targetID_1" in field.name:
+                                    continue
+                                statsField = [field.name,"FIRST"]
+                                statsFields.append(statsField)
+                            arcpy.MakeFeatureLayer_management(selectOutput, selectLayer)
+                            logging.info("Make Feature Layer: '%s' layer created from '%s' feature class", selectLayer, selectOutput)
+                            arcpy.Dissolve_management(selectLayer, overlapOutput, dissolveFields, statsFields)
+                            logging.info("Dissolve: '%s' feature class created from '%s' layer dissolve", overlapOutput, selectLayer)
+
+                            # Delete selection output feature class
+                            arcpy.Delete_management(selectOutput)
+                            logging.info("Delete: '%s' feature class deleted", selectOutput)
+
+                            # Rename attribute fields to revert to original field names
+                            arcpy.AddMessage("Renaming attribute fields...")
+                            fieldList = arcpy.ListFields(overlapOutput)
+                            for field in fieldList:
+                                if field.name.startswith("FIRST_"):
+                                    newName = field.name[6:]
+                                    arcpy.AlterField_management(overlapOutput, field.name, newName)
+
+                            # Modify and update targetID of overlapping dark targets to a common targetID for overlapping targets
+                            expression = "calcTargetID(str(!Pid!)[:-2],str(!Pid_1!)[:-2],!RsatID!,!RsatID_1!)"
+                            codeblock = """def calcTargetID(pid,pid1,rsat,rsat1):
+                                rsatSplit = rsat.split('_')
+                                rsatSplit1 = rsat1.split('_')
+                                date = rsatSplit[5] + '_' + rsatSplit[6] + '_' + rsatSplit1[6]
+                                targetID = pid + '_' + pid1 + '_' + date
+                                return targetID"""
+                            arcpy.CalculateField_management(overlapOutput, "targetID", expression, "PYTHON_9.3", codeblock)
+                            logging.info("Calculate Field: 'targetID' field value calculated for '%s' feature class", overlapOutput)
 
                 logging.info("Processing for '%s' feature class complete\n", fc)
 
@@ -236,4 +322,200 @@ class parseOverlap(object):
 
         logging.info("parseOverlap.py script finished\n\n")
 
-        return
\ No newline at end of file
+        return
+
+    def overlapPairs(self, fcList, pairing="ALL_PAIRS", frameDistance=1, timeGap=120, verifyPairing=True):
+        """Detect the pairs of feature classes of an acquisition date with intersecting dark targets. Candidate pairs of feature
+        classes are found with an STR-tree of their extents (or among adjacent frames of the acquisition pass), then candidate
+        pairs of dark targets within them with an STR-tree of the target envelopes; only the candidate pairs of dark targets
+        are tested for exact intersection.
+
+        Parameters:
+            fcList = List of dark targets feature classes of the acquisition date.
+            pairing, frameDistance, timeGap, verifyPairing = Frame pairing strategy, as for framePairs.
+
+        Return:
+            Returns a dictionary of the number of dark targets of the first feature class intersecting the second, by pair of
+            feature classes (fc, fc2) with at least one intersecting dark target, fc preceding fc2 in the list."""
+        geometries, envelopes, extents, attributes = self.readTargets(fcList)
+
+        overlapPairs = {}
+        for i, j in self.framePairs(fcList, extents, pairing, frameDistance, timeGap, verifyPairing):
+            fc, fc2 = fcList[i], fcList[j]
+            # Candidate pairs of dark targets (intersecting envelopes), then exact intersection test
+            candidates = strTree.intersectingPairs(envelopes[fc], envelopes[fc2])
+            intersecting = set()
+            for oid, oid2 in candidates:
+                if oid not in intersecting and not geometries[fc][oid].disjoint(geometries[fc2][oid2]):
+                    intersecting.add(oid)
+            logging.info("STR-tree: %d candidate pairs of dark targets between '%s' and '%s', %d dark targets of '%s' intersect", len(candidates), fc, fc2, len(intersecting), fc)
+            if len(intersecting) > 0:
+                overlapPairs[(fc, fc2)] = len(intersecting)
+
+        return overlapPairs
+
+    def readTargets(self, fcList, fieldNames=None):
+        """Read the dark targets of the feature classes of an acquisition date.
+
+        Parameters:
+            fcList = List of dark targets feature classes of the acquisition date.
+            fieldNames = Attribute fields to read (none if not defined).
+
+        Return:
+            Returns the dark target geometries (by feature class and OID), the envelopes ((xmin, ymin, xmax, ymax, OID) list by
+            feature class), the feature class extents ((xmin, ymin, xmax, ymax, fc) list in the order of fcList) and the attribute
+            values (tuple in the order of fieldNames, by feature class and OID)."""
+        if fieldNames is None:
+            fieldNames = []
+        geometries = {}
+        envelopes = {}
+        attributes = {}
+        extents = []
+        for fc in fcList:
+            geometries[fc] = {}
+            envelopes[fc] = []
+            attributes[fc] = {}
+            with arcpy.da.SearchCursor(fc, ["OID@", "SHAPE@"] + fieldNames) as cursor:
+                for row in cursor:
+                    oid, shape = row[0], row[1]
+                    if shape is None:
+                        continue
+                    geometries[fc][oid] = shape
+                    envelopes[fc].append((shape.extent.XMin, shape.extent.YMin, shape.extent.XMax, shape.extent.YMax, oid))
+                    attributes[fc][oid] = row[2:]
+            extent = arcpy.Describe(fc).extent
+            extents.append((extent.XMin, extent.YMin, extent.XMax, extent.YMax, fc))
+
+        return geometries, envelopes, extents, attributes
+
+    def framePairs(self, fcList, extents, pairing="ALL_PAIRS", frameDistance=1, timeGap=120, verifyPairing=True):
+        """Determine the candidate pairs of feature classes of an acquisition date.
+
+        Parameters:
+            fcList = List of dark targets feature classes of the acquisition date.
+            extents = (xmin, ymin, xmax, ymax, fc) extent of each feature class, in the order of fcList.
+            pairing = "ALL_PAIRS" (every pair of feature classes with intersecting extents) or "ADJACENT_FRAMES" (see adjacentPairs).
+            frameDistance, timeGap = Maximum sequence distance (frames) and time gap (seconds) of adjacent frames.
+            verifyPairing = Check that the pairs skipped by the adjacent frames pairing have disjoint extents (a warning is given for any other pair, which is not added).
+
+        Return:
+            Returns the sorted list of (i, j) index pairs of the feature classes (i < j)."""
+        if pairing == "ADJACENT_FRAMES":
+            framePairs = self.adjacentPairs(fcList, extents, frameDistance, timeGap)
+            if verifyPairing:
+                # Skipped pairs should have disjoint extents, otherwise their overlap is missed (reported only, the
+                # candidate pairs remain the adjacent pairs)
+                skippedPairs = sorted(set(strTree.selfPairs(extents)) - set(framePairs))
+                for i, j in skippedPairs:
+                    arcpy.AddWarning("Frames " + fcList[i] + " and " + fcList[j] + " are not adjacent but their extents intersect, overlap not parsed.")
+                    logging.info("Frame pairing: '%s' and '%s' not adjacent but their extents intersect, overlap not parsed", fcList[i], fcList[j])
+        else:
+            framePairs = strTree.selfPairs(extents)
+        logging.info("Frame pairing (%s): %d candidate pairs of feature classes out of %d", pairing, len(framePairs), len(fcList) * (len(fcList) - 1) / 2)
+
+        return framePairs
+
+    def overlayDate(self, key, fcList, overlapWorkspace, pairing="ALL_PAIRS", frameDistance=1, timeGap=120, verifyPairing=True):
+        """Overlay every dark targets feature class of an acquisition date in a single pass (N-way overlay). Overlapping dark
+        targets are grouped (connected through candidate pairs found with STR-trees and tested for exact overlap) and each group
+        is overlaid, so that each overlap region is produced once with the list of its contributing dark targets, however
+        many frames overlap. The regions are written to the total overlap feature class of the date, with their combined
+        targetID and contributing targetIDs ("Contributors" field), for evalAttributes.
+
+        Parameters:
+            key = Acquisition date (YYYYMMDD).
+            fcList = List of dark targets feature classes of the acquisition date.
+            overlapWorkspace = Overlap dataset in which the total overlap feature class is created.
+            pairing, frameDistance, timeGap, verifyPairing = Frame pairing strategy, as for framePairs.
+
+        Return:
+            Returns the number of overlap regions."""
+        arcpy.AddMessage("\nOverlaying " + str(len(fcList)) + " feature classes of " + key + "...")
+        logging.info("N-way overlay of '%s' feature classes", str(fcList))
+        geometries, envelopes, extents, attributes = self.readTargets(fcList, ["targetID"])
+
+        # Group overlapping dark targets (union-find over the overlapping pairs)
+        overlappingPairs = []
+        for i, j in self.framePairs(fcList, extents, pairing, frameDistance, timeGap, verifyPairing):
+            fc, fc2 = fcList[i], fcList[j]
+            for oid, oid2 in strTree.intersectingPairs(envelopes[fc], envelopes[fc2]):
+                # Overlap requires a common area (dark targets only touching do not overlap)
+                if geometries[fc][oid].disjoint(geometries[fc2][oid2]) or geometries[fc][oid].intersect(geometries[fc2][oid2], 4).area <= 0:
+                    continue
+                overlappingPairs.append(((fc, oid), (fc2, oid2)))
+        groups = overlapGroups.targetGroups(overlappingPairs)
+        logging.info("N-way overlay: %d overlapping pairs of dark targets in %d groups", len(overlappingPairs), len(groups))
+
+        # Overlay each group: regions are split by each dark target added, keeping the list of contributing dark targets
+        overlapRegions = []
+        for group in groups:
+            group.sort(key=lambda target: (fcList.index(target[0]), target[1]))
+            regions = []
+            for target in group:
+                geometry = geometries[target[0]][target[1]]
+                newRegions = []
+                remainder = geometry
+                for region, contributors in regions:
+                    if region.disjoint(geometry):
+                        newRegions.append((region, contributors))
+                        continue
+                    inside = region.intersect(geometry, 4)
+                    outside = region.difference(geometry)
+                    if inside.area > 0:
+                        newRegions.append((inside, contributors + [target]))
+                    if outside.area > 0:
+                        newRegions.append((outside, contributors))
+                    remainder = remainder.difference(region)
+                if remainder.area > 0:
+                    newRegions.append((remainder, [target]))
+                regions = newRegions
+            overlapRegions += [(region, contributors) for region, contributors in regions if len(contributors) > 1]
+
+        # Write overlap regions to the total overlap feature class of the date
+        overlapOutputString = "RS2_" + key + "_TotalOverlap"
+        overlapOutput = os.path.join(overlapWorkspace, overlapOutputString)
+        if len(overlapRegions) == 0:
+            arcpy.AddMessage("No overlapping dark targets for " + key + ", no overlay necessary!")
+            return 0
+        arcpy.CreateFeatureclass_management(overlapWorkspace, overlapOutputString, "POLYGON", spatial_reference=arcpy.Describe(fcList[0]).spatialReference)
+        arcpy.AddField_management(overlapOutput, "targetID", "TEXT", field_length=255)
+        arcpy.AddField_management(overlapOutput, "Contributors", "TEXT", field_length=2000)
+        arcpy.AddField_management(overlapOutput, "ContributorCount", "SHORT")
+        with arcpy.da.InsertCursor(overlapOutput, ["SHAPE@", "targetID", "Contributors", "ContributorCount"]) as cursor:
+            for region, contributors in overlapRegions:
+                targetIDs = [attributes[fc][oid][0] for fc, oid in contributors]
+                cursor.insertRow([region, overlapGroups.combinedTargetID(targetIDs), ";".join(targetIDs), len(targetIDs)])
+        arcpy.AddMessage(str(len(overlapRegions)) + " overlap regions written to " + overlapOutputString)
+        logging.info("N-way overlay: '%s' created with %d overlap regions\n", overlapOutput, len(overlapRegions))
+
+        return len(overlapRegions)
+
+    def adjacentPairs(self, fcList, extents, frameDistance, timeGap):
+        """Pair the adjacent frames of an acquisition pass. Frames are sorted by acquisition time (from the feature class name,
+        e.g. "RS2_20100812_083000") and footprint, and each frame is paired with the following frames within the maximum
+        sequence distance and time gap, if their extents intersect.
+
+        Parameters:
+            fcList = List of dark targets feature classes of the acquisition date.
+            extents = (xmin, ymin, xmax, ymax, fc) extent of each feature class, in the order of fcList.
+            frameDistance = Maximum sequence distance (number of frames) of paired frames.
+            timeGap = Maximum acquisition time gap (seconds) of paired frames.
+
+        Return:
+            Returns the sorted list of (i, j) index pairs of the feature classes (i < j)."""
+        def seconds(fc):
+            acquisitionTime = fc.split("_")[2]
+            return int(acquisitionTime[:2]) * 3600 + int(acquisitionTime[2:4]) * 60 + int(acquisitionTime[4:6])
+
+        order = sorted(range(len(fcList)), key=lambda i: (seconds(fcList[i]), extents[i][1] + extents[i][3], extents[i][0] + extents[i][2]))
+        pairs = []
+        for position, i in enumerate(order):
+            for j in order[position + 1:position + 1 + frameDistance]:
+                if seconds(fcList[j]) - seconds(fcList[i]) > timeGap:
+                    break
+                extent, extent2 = extents[i], extents[j]
+                if extent[0] > extent2[2] or extent[2] < extent2[0] or extent[1] > extent2[3] or extent[3] < extent2[1]:
+                    continue
+                pairs.append((min(i, j), max(i, j)))
+
+        return sorted(pairs)
\ No newline at end of file
@@ -0,0 +1,222 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "loadDarkTargets.py" script to read the dark
+targets shapefiles. It does not require arcpy, so it can also be used (and
+tested) outside of ArcGIS.
+
+SUMMARY
+Streams the records of a polygon shapefile (.shp, .shx and .dbf files) with the
+struct module, the files being memory-mapped (mmap). The attributes of each record
+are read from the .dbf file first: records of the background ocean polygon
+(Pid = 1), which is usually the largest geometry of the file, are skipped without
+their geometry being read. The geometry of the other records is decoded into
+compact ring arrays of x, y coordinates.
+
+INPUT
+- Dark Targets Shapefile (automated input): Polygon shapefile produced by the
+RADARSAT-2 dark target feature extraction process.
+
+OUTPUT
+- Dark Target Records (automated output): (Pid, attributes, rings) tuple for each
+retained record, where the attributes are in the order of the .dbf fields and each
+ring is an array of x, y coordinates (array('d', [x0, y0, x1, y1, ...])).
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- shapeReader"""
+
+# Libraries
+# =========
+import os
+import mmap
+import array
+import struct
+import datetime
+
+# Shape types of polygon records (Polygon, PolygonZ, PolygonM), others are read as null shapes
+POLYGON_TYPES = (5, 15, 25)
+
+
+class shapeReader(object):
+    """
+    Streaming reader of a polygon shapefile, with its .shx index and .dbf attribute table.
+    """
+    def __init__(self, shpPath, encoding=None):
+        """Open and memory-map the files of a shapefile and read the .dbf field descriptors.
+
+        Parameters:
+            shpPath = Path of the .shp file (the .dbf file must be beside it, the .shx index is used if present).
+            encoding = Encoding of the .dbf text values (read from the .cpg file if not given, latin-1 by default).
+
+        Return:
+            No return"""
+        basePath = os.path.splitext(shpPath)[0]
+        self.shpPath = shpPath
+        self.files = []
+        self.shp = self.mapFile(shpPath)
+        self.dbf = self.mapFile(basePath + ".dbf")
+        self.shx = self.mapFile(basePath + ".shx") if os.path.exists(basePath + ".shx") else None
+
+        if encoding is None:
+            encoding = "latin-1"
+            if os.path.exists(basePath + ".cpg"):
+                with open(basePath + ".cpg", 'r') as cpgFile:
+                    encoding = cpgFile.read().strip() or encoding
+        self.encoding = encoding
+
+        # Header of the .dbf file (record count, header and record lengths), followed by a 32 byte descriptor per field
+        self.recordCount, self.headerLength, self.recordLength = struct.unpack("<IHH", self.dbf[4:12])
+        self.fields = []
+        offset = 32
+        fieldOffset = 1
+        while offset < self.headerLength - 1 and self.dbf[offset:offset + 1] != b'\r':
+            descriptor = self.dbf[offset:offset + 32]
+            name = descriptor[:11].split(b'\x00')[0].decode("ascii")
+            fieldType = descriptor[11:12].decode("ascii")
+            length, decimals = struct.unpack("<BB", descriptor[16:18])
+            self.fields.append((name, fieldType, length, decimals, fieldOffset))
+            fieldOffset += length
+            offset += 32
+        self.fieldNames = [field[0] for field in self.fields]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        self.close()
+
+    def mapFile(self, path):
+        """Open and memory-map a file for reading.
+
+        Parameter:
+            path = Path of the file.
+
+        Return:
+            Returns the memory-mapped file (the file content as a string if the file is empty)."""
+        openFile = open(path, 'rb')
+        self.files.append(openFile)
+        if os.path.getsize(path) == 0:
+            return b''
+        mapped = mmap.mmap(openFile.fileno(), 0, access=mmap.ACCESS_READ)
+        self.files.append(mapped)
+
+        return mapped
+
+    def close(self):
+        """Close the memory-mapped files."""
+        for openFile in reversed(self.files):
+            openFile.close()
+        self.files = []
+
+    def fieldValue(self, field, raw):
+        """Decode the value of a .dbf field.
+
+        Parameters:
+            field = Field descriptor (name, type, length, decimals, offset).
+            raw = Raw bytes of the field in the record.
+
+        Return:
+            Returns the value (number, text, date or boolean), None if the field is empty."""
+        fieldType, length, decimals = field[1], field[2], field[3]
+        if fieldType in ('N', 'F'):
+            text = raw.strip().strip(b'\x00')
+            if len(text) == 0 or text.startswith(b'*'):
+                return None
+            # Numbers without decimals are read as integers by ArcGIS if they fit in a long (9 digits or less)
+            if fieldType == 'N' and decimals == 0 and length <= 9:
+                return int(text)
+            return float(text)
+        if fieldType == 'D':
+            text = raw.strip()
+            if len(text) != 8 or not text.isdigit():
+                return None
+            return datetime.datetime(int(text[:4]), int(text[4:6]), int(text[6:8]))
+        if fieldType == 'L':
+            text = raw.strip().upper()
+            if text in (b'Y', b'T'):
+                return True
+            if text in (b'N', b'F'):
+                return False
+            return None
+
+        return raw.rstrip(b' \x00').decode(self.encoding, "replace")
+
+    def shapeOffset(self, index, previousOffset):
+        """Determine the byte offset of the shape record of a .dbf record.
+
+        Parameters:
+            index = Index of the record.
+            previousOffset = Byte offset of the previous shape record (None for the first record), used without .shx index.
+
+        Return:
+            Returns the byte offset of the shape record header in the .shp file."""
+        if self.shx is not None:
+            # Offsets of the .shx index are in 16-bit words (big-endian)
+            return struct.unpack(">i", self.shx[100 + 8 * index:104 + 8 * index])[0] * 2
+        if previousOffset is None:
+            return 100
+        # Skip the previous record from its content length, without reading its content
+        contentLength = struct.unpack(">i", self.shp[previousOffset + 4:previousOffset + 8])[0]
+
+        return previousOffset + 8 + contentLength * 2
+
+    def rings(self, offset):
+        """Decode the rings of a polygon shape record.
+
+        Parameter:
+            offset = Byte offset of the shape record header in the .shp file.
+
+        Return:
+            Returns the list of rings, each an array of x, y coordinates (empty list for a null shape)."""
+        shapeType = struct.unpack("<i", self.shp[offset + 8:offset + 12])[0]
+        if shapeType not in POLYGON_TYPES:
+            return []
+        # Content: shape type, bounding box (4 doubles), part and point counts, part indexes, then x, y points
+        partCount, pointCount = struct.unpack("<ii", self.shp[offset + 44:offset + 52])
+        partStart = offset + 52
+        parts = struct.unpack("<" + str(partCount) + "i", self.shp[partStart:partStart + 4 * partCount])
+        pointStart = partStart + 4 * partCount
+        points = array.array('d', self.shp[pointStart:pointStart + 16 * pointCount])
+        if struct.pack("=i", 1) != struct.pack("<i", 1):
+            points.byteswap()
+
+        ringList = []
+        for i in range(partCount):
+            end = parts[i + 1] if i + 1 < partCount else pointCount
+            ringList.append(points[2 * parts[i]:2 * end])
+
+        return ringList
+
+    def records(self, pidField="Pid", skipPid=1):
+        """Stream the records of the shapefile, skipping deleted records and records of the background ocean polygon.
+
+        Parameters:
+            pidField = Name of the dark target identifier field.
+            skipPid = Identifier of the skipped records (background ocean polygon), None to keep every record.
+
+        Return:
+            Yields a (Pid, attributes, rings) tuple for each retained record, the attributes (tuple) being in the order of
+            fieldNames."""
+        pidIndex = self.fieldNames.index(pidField)
+        shapeOffset = None
+        for index in range(self.recordCount):
+            start = self.headerLength + index * self.recordLength
+            record = self.dbf[start:start + self.recordLength]
+            shapeOffset = self.shapeOffset(index, shapeOffset)
+            if record[:1] == b'*':
+                continue
+
+            # Attributes are read first, the geometry of skipped records is never decoded
+            pidDescriptor = self.fields[pidIndex]
+            pid = self.fieldValue(pidDescriptor, record[pidDescriptor[4]:pidDescriptor[4] + pidDescriptor[2]])
+            if skipPid is not None and pid == skipPid:
+                continue
+            attributes = tuple([self.fieldValue(field, record[field[4]:field[4] + field[2]]) for field in self.fields])
+
+            yield pid, attributes, self.rings(shapeOffset)
\ No newline at end of file
@@ -0,0 +1,270 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "evalAttributes.py" script to evaluate the
+attribute evaluation criteria without a selection by attributes. It does not
+require arcpy.
+
+SUMMARY
+Compiles the attribute evaluation criteria, an SQL expression comparing a first
+and a second set of attributes (e.g. "PcontrDb < PcontrDb_1"), into Python code
+evaluated for a single pair of sets of attributes or for the columns of a table.
+As with a selection by attributes, the three-valued logic of SQL is applied:
+conditions on null values (None or NaN) are unknown and unknown conditions are not
+selected (the second set of attributes being kept, as by a switched selection).
+
+The grammar supported is limited to field names, numbers, string literals,
+parentheses, arithmetic (+, -, *, /) and comparison (=, <>, !=, <, <=, >, >=)
+operators, AND, OR, NOT and IS [NOT] NULL. Any other expression (e.g. LIKE, IN,
+BETWEEN or functions) raises a ValueError.
+
+INPUT
+- Attribute Evaluation Criteria (automated input): SQL expression, the fields of
+the second set of attributes having a "_1" suffix.
+
+OUTPUT
+- Criteria Function (automated output): Function of the two sets of attributes,
+True (or array of values True) where the first set of attributes is selected.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- criteriaExpression
+- checkExpression
+- criteriaCode
+- criteriaFunction
+- vectorCriteria"""
+
+# Libraries
+# =========
+import re
+import ast
+import copy
+import sys
+import numpy
+
+# Null value of the attribute evaluation criteria (comparisons with NaN are false)
+NULL = float("nan")
+
+# Keywords of the SQL expression translated into Python
+KEYWORDS = {"AND": "and", "OR": "or", "NOT": "not", "=": "==", "<>": "!=", "NULL": "NULL", "IS": "is"}
+
+# SQL keywords which are not supported by the criteria (rejected rather than read as field names)
+UNSUPPORTED_KEYWORDS = set(["LIKE", "IN", "BETWEEN", "ESCAPE", "EXISTS", "ANY", "ALL", "SOME", "CASE", "WHEN", "THEN",
+                            "ELSE", "END", "CAST", "SELECT", "FROM", "WHERE", "TRUE", "FALSE"])
+
+# Python syntax nodes allowed in the translated criteria
+ALLOWED_NODES = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.UAdd, ast.USub, ast.BinOp,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+                 ast.Is, ast.IsNot, ast.Call, ast.Attribute, ast.Name, ast.Load) + \
+    tuple([getattr(ast, name) for name in ("Num", "Str", "Constant", "Index") if hasattr(ast, name)])
+
+
+def criteriaExpression(where_clause):
+    """Translate the attribute evaluation criteria (SQL expression comparing a first and second set of attributes, e.g.
+    "PcontrDb < PcontrDb_1") into a Python expression.
+
+    Parameter:
+        where_clause = Attribute evaluation criteria (SQL expression).
+
+    Return:
+        Returns the Python expression, in which the fields are read from the "first" and "second" dictionaries by field
+        name and null values are NULL."""
+    tokens = re.findall(r"\s*(<>|!=|<=|>=|=|<|>|\(|\)|[-+*/]|'(?:[^']|'')*'|\"[^\"]*\"|\d+\.?\d*|\w+)", where_clause)
+    if "".join(tokens).replace(" ", "") != where_clause.replace(" ", ""):
+        raise ValueError("Attribute evaluation criteria not supported: " + where_clause)
+    expression = []
+    for token in tokens:
+        if token.startswith("'"):
+            # String literal ('' being a quote within the string)
+            expression.append(repr(token[1:-1].replace("''", "'")))
+        elif token.upper() in KEYWORDS:
+            expression.append(KEYWORDS[token.upper()])
+        elif token.upper() in UNSUPPORTED_KEYWORDS:
+            raise ValueError("Attribute evaluation criteria not supported (" + token + "): " + where_clause)
+        elif re.match(r"^(\"[A-Za-z_]\w*\"|[A-Za-z_]\w*)$", token):
+            # Field of the second set of attributes ("_1" suffix) or of the first set
+            name = token.strip('"')
+            if name.endswith("_1"):
+                expression.append("second.get('" + name[:-2] + "', NULL)")
+            else:
+                expression.append("first.get('" + name + "', NULL)")
+        elif token.startswith('"'):
+            raise ValueError("Attribute evaluation criteria not supported (" + token + "): " + where_clause)
+        else:
+            expression.append(token)
+
+    return " ".join(expression)
+
+
+def checkExpression(tree, where_clause):
+    """Check that the translated criteria only uses the supported grammar (see module description).
+
+    Parameters:
+        tree = Syntax tree of the translated criteria.
+        where_clause = Attribute evaluation criteria (SQL expression).
+
+    Return:
+        No return (a ValueError is raised if the criteria is not supported)"""
+    for node in ast.walk(tree):
+        supported = isinstance(node, ALLOWED_NODES)
+        if isinstance(node, ast.Call):
+            # Only the field values read from the sets of attributes
+            supported = isinstance(node.func, ast.Attribute) and node.func.attr == "get" and \
+                isinstance(node.func.value, ast.Name) and node.func.value.id in ("first", "second")
+        elif isinstance(node, ast.Name):
+            supported = node.id in ("first", "second", "NULL")
+        elif isinstance(node, ast.Compare):
+            # Single comparisons, IS [NOT] NULL only
+            supported = len(node.ops) == 1 and (not isinstance(node.ops[0], (ast.Is, ast.IsNot)) or
+                                                (isinstance(node.comparators[0], ast.Name) and node.comparators[0].id == "NULL"))
+        if not supported:
+            raise ValueError("Attribute evaluation criteria not supported: " + where_clause)
+
+
+def criteriaCode(where_clause):
+    """Compile the attribute evaluation criteria with the three-valued logic of SQL, for single values or for columns of a
+    table. Each condition gives a pair of (true, unknown) values: comparisons with null values (None or NaN) are unknown,
+    NOT of an unknown condition is unknown, and AND and OR are unknown unless decided by their known operands. As with a
+    selection by attributes, unknown conditions are not selected.
+
+    Parameter:
+        where_clause = Attribute evaluation criteria (SQL expression).
+
+    Return:
+        Returns the compiled criteria, evaluated with the "first" and "second" sets of attributes, and the functions it
+        requires. The evaluation gives the value (or array of values) which is True where the first set is selected."""
+    def call(name, args):
+        node = ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=args, keywords=[])
+        if sys.version_info[0] < 3:
+            node.starargs = None
+            node.kwargs = None
+        return node
+
+    class threeValued(ast.NodeTransformer):
+        # "and", "or", "not" and comparisons are replaced by element-wise functions of (true, unknown) pairs
+        def visit_BoolOp(self, node):
+            self.generic_visit(node)
+            function = "sqlAnd" if isinstance(node.op, ast.And) else "sqlOr"
+            result = node.values[0]
+            for value in node.values[1:]:
+                result = call(function, [result, value])
+            return result
+
+        def visit_UnaryOp(self, node):
+            self.generic_visit(node)
+            if isinstance(node.op, ast.Not):
+                return call("sqlNot", [node.operand])
+            return node
+
+        def visit_Compare(self, node):
+            self.generic_visit(node)
+            if isinstance(node.ops[0], (ast.Is, ast.IsNot)):
+                return call("sqlIsNotNull" if isinstance(node.ops[0], ast.IsNot) else "sqlIsNull", [node.left])
+            operands = [copy.deepcopy(operand) for operand in [node.left] + node.comparators]
+            return call("sqlCompare", [node, ast.List(elts=operands, ctx=ast.Load())])
+
+    def isNull(value):
+        # Null values are NaN in numeric columns and None in the others
+        if isinstance(value, numpy.ndarray) and value.dtype.kind == 'f':
+            return numpy.isnan(value)
+        if isinstance(value, numpy.ndarray):
+            return numpy.array([item is None or item != item for item in value], dtype=bool)
+        return value is None or value != value
+
+    def condition(value):
+        # Value used as a condition (e.g. a field alone): unknown if null
+        if isinstance(value, tuple):
+            return value
+        unknown = isNull(value)
+        return numpy.logical_and(numpy.asarray(value, dtype=bool), numpy.logical_not(unknown)), unknown
+
+    def sqlCompare(result, operands):
+        unknown = isNull(operands[0])
+        for operand in operands[1:]:
+            unknown = numpy.logical_or(unknown, isNull(operand))
+        return numpy.logical_and(result, numpy.logical_not(unknown)), unknown
+
+    def sqlIsNull(value):
+        result = isNull(value)
+        return result, numpy.zeros_like(result, dtype=bool)
+
+    def sqlIsNotNull(value):
+        result = isNull(value)
+        return numpy.logical_not(result), numpy.zeros_like(result, dtype=bool)
+
+    def sqlNot(value):
+        true, unknown = condition(value)
+        return numpy.logical_not(numpy.logical_or(true, unknown)), unknown
+
+    def sqlAnd(left, right):
+        (leftTrue, leftUnknown), (rightTrue, rightUnknown) = condition(left), condition(right)
+        leftFalse = numpy.logical_not(numpy.logical_or(leftTrue, leftUnknown))
+        rightFalse = numpy.logical_not(numpy.logical_or(rightTrue, rightUnknown))
+        unknown = numpy.logical_and(numpy.logical_or(leftUnknown, rightUnknown), numpy.logical_not(numpy.logical_or(leftFalse, rightFalse)))
+        return numpy.logical_and(leftTrue, rightTrue), unknown
+
+    def sqlOr(left, right):
+        (leftTrue, leftUnknown), (rightTrue, rightUnknown) = condition(left), condition(right)
+        true = numpy.logical_or(leftTrue, rightTrue)
+        return true, numpy.logical_and(numpy.logical_or(leftUnknown, rightUnknown), numpy.logical_not(true))
+
+    try:
+        tree = ast.parse(criteriaExpression(where_clause), mode="eval")
+    except SyntaxError:
+        raise ValueError("Attribute evaluation criteria not supported: " + where_clause)
+    checkExpression(tree, where_clause)
+    tree = threeValued().visit(tree)
+    tree.body = call("sqlSelected", [tree.body])
+    code = compile(ast.fix_missing_locations(tree), "<criteria>", "eval")
+    functions = {"__builtins__": {}, "NULL": NULL, "sqlCompare": sqlCompare, "sqlIsNull": sqlIsNull, "sqlIsNotNull": sqlIsNotNull,
+                 "sqlNot": sqlNot, "sqlAnd": sqlAnd, "sqlOr": sqlOr, "sqlSelected": lambda value: condition(value)[0]}
+
+    return code, functions
+
+
+def criteriaFunction(where_clause):
+    """Translate the attribute evaluation criteria into a Python function of a single pair of sets of attributes; as in
+    SQL, conditions on null values are unknown and not selected (see criteriaCode).
+
+    Parameter:
+        where_clause = Attribute evaluation criteria (SQL expression).
+
+    Return:
+        Returns a function of the two sets of attributes (dictionaries by field name), True if the first set is selected."""
+    code, functions = criteriaCode(where_clause)
+
+    def criteria(first, second):
+        # Null values are replaced by NaN, so that arithmetic operators can be applied to them
+        first = dict([(name, NULL if value is None else value) for name, value in first.items()])
+        second = dict([(name, NULL if value is None else value) for name, value in second.items()])
+        with numpy.errstate(invalid="ignore"):
+            return bool(eval(code, functions, {"first": first, "second": second}))
+
+    return criteria
+
+
+def vectorCriteria(where_clause):
+    """Translate the attribute evaluation criteria into a vectorized function of the columns of a table, so that the
+    criteria is evaluated for every row at once; as in SQL, conditions on null values (NaN or None) are unknown and not
+    selected (see criteriaCode).
+
+    Parameter:
+        where_clause = Attribute evaluation criteria (SQL expression).
+
+    Return:
+        Returns a function of the two sets of attribute columns (dictionaries of arrays by field name), giving a boolean
+        array which is True for the rows where the first set is selected."""
+    code, functions = criteriaCode(where_clause)
+
+    def criteria(first, second, rowCount):
+        # Comparisons with NaN give a warning, their result being discarded as unknown
+        with numpy.errstate(invalid="ignore"):
+            selected = eval(code, functions, {"first": first, "second": second})
+        return numpy.ones(rowCount, dtype=bool) & numpy.asarray(selected, dtype=bool)
+
+    return criteria
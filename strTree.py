@@ -0,0 +1,145 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "parseOverlap.py" script to detect overlapping
+dark targets feature classes. It does not require arcpy.
+
+SUMMARY
+Packed R-tree of bounding boxes built with the Sort-Tile-Recursive (STR)
+algorithm. Boxes are sorted by the x coordinate of their centre, cut into vertical
+slices, sorted by the y coordinate within each slice and packed into nodes; the
+nodes are packed the same way up to a single root node. A query visits only the
+nodes whose box intersects the query box, so finding the candidate pairs of n
+boxes costs about n log(n) box comparisons instead of n x n.
+
+INPUT
+- Bounding Boxes (automated input): (xmin, ymin, xmax, ymax, value) tuple of each
+feature class extent or feature envelope.
+
+OUTPUT
+- Candidate Pairs (automated output): Pairs of values whose bounding boxes
+intersect (touching boxes included).
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- strTree
+- intersectingPairs
+- selfPairs"""
+
+# Libraries
+# =========
+import math
+
+
+class strTree(object):
+    """
+    Sort-Tile-Recursive packed R-tree of bounding boxes.
+    """
+    def __init__(self, items, nodeCapacity=8):
+        """Build the tree.
+
+        Parameters:
+            items = List of (xmin, ymin, xmax, ymax, value) tuples.
+            nodeCapacity = Maximum number of entries of each node.
+
+        Return:
+            No return"""
+        self.nodeCapacity = max(2, nodeCapacity)
+        self.size = len(items)
+        # Entries are (xmin, ymin, xmax, ymax, children, value), children being None for the boxes of the items
+        level = [(item[0], item[1], item[2], item[3], None, item[4]) for item in items]
+        while len(level) > 1:
+            level = self.pack(level)
+        self.root = level[0] if len(level) > 0 else None
+
+    def pack(self, entries):
+        """Pack the entries of a level into the nodes of the level above.
+
+        Parameter:
+            entries = List of entries of the level.
+
+        Return:
+            Returns the list of node entries."""
+        capacity = self.nodeCapacity
+        nodeCount = int(math.ceil(float(len(entries)) / capacity))
+        sliceSize = int(math.ceil(math.sqrt(nodeCount))) * capacity
+        entries = sorted(entries, key=lambda entry: entry[0] + entry[2])
+
+        nodes = []
+        for i in range(0, len(entries), sliceSize):
+            tile = sorted(entries[i:i + sliceSize], key=lambda entry: entry[1] + entry[3])
+            for j in range(0, len(tile), capacity):
+                children = tile[j:j + capacity]
+                nodes.append((min([child[0] for child in children]), min([child[1] for child in children]),
+                              max([child[2] for child in children]), max([child[3] for child in children]), children, None))
+
+        return nodes
+
+    def query(self, xmin, ymin, xmax, ymax):
+        """Find the items whose box intersects a query box.
+
+        Parameters:
+            xmin, ymin, xmax, ymax = Query box.
+
+        Return:
+            Returns the list of values of the items whose box intersects (or touches) the query box."""
+        values = []
+        if self.root is None:
+            return values
+        stack = [self.root]
+        while len(stack) > 0:
+            entry = stack.pop()
+            if entry[0] > xmax or entry[2] < xmin or entry[1] > ymax or entry[3] < ymin:
+                continue
+            if entry[4] is None:
+                values.append(entry[5])
+            else:
+                stack.extend(entry[4])
+
+        return values
+
+
+def intersectingPairs(itemsA, itemsB, nodeCapacity=8):
+    """Find the pairs of items of two lists whose boxes intersect.
+
+    Parameters:
+        itemsA, itemsB = Lists of (xmin, ymin, xmax, ymax, value) tuples.
+        nodeCapacity = Maximum number of entries of each node of the tree.
+
+    Return:
+        Returns the list of (valueA, valueB) pairs."""
+    # Index the larger list, query with the smaller one
+    swap = len(itemsA) > len(itemsB)
+    if swap:
+        itemsA, itemsB = itemsB, itemsA
+    tree = strTree(itemsB, nodeCapacity)
+    pairs = []
+    for item in itemsA:
+        for value in tree.query(item[0], item[1], item[2], item[3]):
+            pairs.append((value, item[4]) if swap else (item[4], value))
+
+    return pairs
+
+
+def selfPairs(items, nodeCapacity=8):
+    """Find the pairs of items of a list whose boxes intersect.
+
+    Parameters:
+        items = List of (xmin, ymin, xmax, ymax, value) tuples.
+        nodeCapacity = Maximum number of entries of each node of the tree.
+
+    Return:
+        Returns the list of (i, j) index pairs of the items (i < j), sorted."""
+    tree = strTree([item[:4] + (i,) for i, item in enumerate(items)], nodeCapacity)
+    pairs = []
+    for i, item in enumerate(items):
+        for j in tree.query(item[0], item[1], item[2], item[3]):
+            if i < j:
+                pairs.append((i, j))
+
+    return sorted(pairs)
\ No newline at end of file
@@ -0,0 +1,398 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 chlorophyll_a tools, 2017.                            #
+#==============================================================================#
+"""USAGE
+Module imported and used as the "1c_Download and Apply Chlorophyll_a (Pipelined)"
+script tool in the "GEM2_Oil_Seep_Detection_Analysis" Python Toolbox.
+
+SUMMARY
+Combines the "1a_Download Chlorophyll_a NetCDF Files" and "1b_Apply Chlorophyll_a
+Values" script tools in a single pipelined run, so that downloads and the extraction
+of chlorophyll_a values overlap. The FTP sessions of the download pool (see
+"chloroDownload.py") run in background threads and push each verified MODIS day onto
+a priority queue as soon as it is downloaded. The tool consumes the queue: each day
+is loaded once from the regional store and applied to every feature class waiting on
+it, and each feature class is written as soon as all of its days are resolved (applied,
+unavailable on the FTP server or failed).
+
+Days closest to an acquisition date are listed, downloaded and applied first (the
+acquisition day of any feature class, then the days at +/- 1, etc.), so an interrupted
+or partially complete run still provides the most useful chlorophyll_a values. Days
+already available locally are applied first, while the remaining days are downloaded.
+
+INPUT
+- Folder Location of Dark Targets GDBs (user input): Folder containing the geodatabases
+produced by "1_Condition Yearly Dark Targets Data".
+
+- Chlorophyll_a Data Source (default user input): FTP directory, URL or mirror folder
+where the chlorophyll_a MODIS data is available (as for "1a_Download Chlorophyll_a
+NetCDF Files").
+
+- Chlorophyll Day Range (user input): Integer parameter indicating the range of days
++/- from the date of acquisition of each dark features feature class.
+
+- Neighbourhood Cell Size (default user input): List of integers indicating the
+sizes of the neighbourhood windows (as for "1b_Apply Chlorophyll_a Values").
+
+- Calculate Polygon Mean Chlorophyll_a (optional user input): Boolean parameter
+indicating whether the zonal values are also calculated (as for "1b_Apply
+Chlorophyll_a Values").
+
+- Number of Concurrent FTP Sessions (default user input): Integer parameter setting
+the number of source sessions downloading files in parallel.
+
+- Site Chlorophyll Cache Folder (optional user input): Shared content-addressed
+cache (as for "1a_Download Chlorophyll_a NetCDF Files").
+
+OUTPUT
+- Chlorophyll_a NetCDF Files and Regional Chlorophyll_a Store (automated output): As
+for "1a_Download Chlorophyll_a NetCDF Files".
+
+- Chlorophyll_a Attribute Fields (automated output): As for "1b_Apply Chlorophyll_a
+Values". The values written are those of the two tools run one after the other,
+except for the days of an adjacent year: each day is read from the folder of its
+own year, whereas "1b_Apply Chlorophyll_a Values" only reads the year folder of the
+GDB. Days of the previous or next year (e.g. 31 December for an acquisition on 1
+January) are therefore applied by this tool only.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- waitingDays
+- localDayFile
+- produceDays
+- consumeDay"""
+
+# Libraries
+# =========
+import arcpy
+import os
+import logging
+import threading
+import traceback
+import Queue
+
+# Reload steps required to refresh memory if Catalog is open when changes are made
+import chloroStore                          # get module reference for reload
+reload(chloroStore)                         # reload step 1
+
+import chloroSource                         # get module reference for reload
+reload(chloroSource)                        # reload step 1
+
+import chloroDownload                       # get module reference for reload
+reload(chloroDownload)                      # reload step 1
+
+import getChloro                            # get module reference for reload
+reload(getChloro)                           # reload step 1
+from getChloro import getChloro             # reload step 2
+
+import applyChloro                          # get module reference for reload
+reload(applyChloro)                         # reload step 1
+from applyChloro import applyChloro         # reload step 2
+
+
+class streamChloro(object):
+    def __init__(self):
+        """Define the tool (tool name is the name of the class)."""
+        self.label = "1c_Download and Apply Chlorophyll_a (Pipelined)"
+        self.description = "Downloads MODIS chlorophyll_a data and applies\
+         the values to the dark targets feature classes as each day is downloaded."
+        self.canRunInBackground = False
+
+    def getParameterInfo(self):
+        """Define parameter definitions"""
+        params0 = arcpy.Parameter(
+            displayName="Input: Folder Location of Dark Targets GDBs",
+            name="working_folder",
+            datatype="DEFolder",
+            parameterType="Required",
+            direction="Input")
+
+        params1 = arcpy.Parameter(
+            displayName="Chlorophyll_a Data Source (FTP Directory, URL or Mirror Folder)",
+            name="ftp_dir",
+            datatype="GPString",
+            parameterType="Required",
+            direction="Input")
+        params1.value = 'podaac-ftp.jpl.nasa.gov/allData/modis/L3/aqua/chlA/v2014.0/4km/daily/'
+
+        params2 = arcpy.Parameter(
+            displayName="Chlorophyll Day Range",
+            name="Day Range",
+            datatype="GPLong",
+            parameterType="Required",
+            direction="Input")
+
+        params3 = arcpy.Parameter(
+            displayName="Input: Neighbourhood Cell Size (pixels)",
+            name="cell_size",
+            datatype="GPLong",
+            parameterType="Required",
+            direction="Input",
+            multiValue=True)
+
+        params3.values = [5]
+
+        params4 = arcpy.Parameter(
+            displayName="Input: Calculate Polygon Mean Chlorophyll_a (zonal)",
+            name="zonal_mode",
+            datatype="GPBoolean",
+            parameterType="Optional",
+            direction="Input")
+
+        params4.value = False
+
+        params5 = arcpy.Parameter(
+            displayName="Number of Concurrent FTP Sessions",
+            name="session_count",
+            datatype="GPLong",
+            parameterType="Optional",
+            direction="Input")
+
+        params5.value = 4
+
+        params6 = arcpy.Parameter(
+            displayName="Site Chlorophyll Cache Folder",
+            name="site_cache",
+            datatype="DEFolder",
+            parameterType="Optional",
+            direction="Input")
+
+        params = [params0, params1, params2, params3, params4, params5, params6]
+
+        return params
+
+    def isLicensed(self):
+        """Set whether tool is licensed to execute."""
+        return True
+
+    def updateParameters(self, parameters):
+        """Modify the values and properties of parameters before internal
+        validation is performed.  This method is called whenever a parameter
+        has been changed."""
+        return
+
+    def updateMessages(self, parameters):
+        """Modify the messages created by internal validation for each tool
+        parameter.  This method is called after internal validation."""
+        return
+
+    def execute(self, parameters, messages):
+        """The source code of the tool."""
+        # Set log configuration
+        logPath = os.path.join(parameters[0].valueAsText, "logs")
+        if not os.path.exists(logPath):
+            os.makedirs(logPath)
+        logFile = os.path.join(logPath, "chloro.log")
+        logging.basicConfig(filename=logFile, format='%(asctime)s -- %(message)s', datefmt='%d/%m/%Y %H:%M:%S', level=logging.INFO)
+        logging.info("Starting streamChloro.py script...\n")
+
+        # Define variables from parameters
+        working_folder = parameters[0].valueAsText
+        local_chloroFolder = os.path.join(os.path.dirname(working_folder), "Auxiliary", "Chlorophyll")
+        if not os.path.exists(local_chloroFolder):
+            os.makedirs(local_chloroFolder)
+        ftpDir = parameters[1].valueAsText
+        dayRange = parameters[2].value
+        cellSizes = sorted(set([int(size) for size in parameters[3].valueAsText.split(";")]))
+        zonalMode = parameters[4].value == True
+        sessionCount = parameters[5].value
+        if sessionCount is None:
+            sessionCount = 1
+        cache = None
+        if parameters[6].valueAsText:
+            cache = chloroSource.siteCache(parameters[6].valueAsText)
+        source, fileDir = chloroSource.openSource(ftpDir)
+
+        # MODIS chlorophyll_a rasters are in geographic coordinates (WGS 1984)
+        chloroSR = arcpy.SpatialReference(4326)
+
+        # Determine list of yearly GDBs in workspace
+        arcpy.env.workspace = working_folder
+        gdbList = arcpy.ListWorkspaces("*", "FileGDB")
+        arcpy.AddMessage("Workspace contains the following " + str(len(gdbList)) + " GDBs: " + str(gdbList))
+
+        # Determine feature classes waiting on each day, and priority of each day (closest to an acquisition date first)
+        waiting, pending = self.waitingDays(gdbList, cellSizes, dayRange, zonalMode, chloroSR)
+        priority = dict((day, min([dayIndex for values, dayIndex in waiting[day]])) for day in waiting)
+        dayOrder = sorted(waiting, key=lambda day: (priority[day], day))
+        arcpy.AddMessage("\n" + str(len(pending)) + " feature classes waiting on " + str(len(dayOrder)) + " days.")
+        logging.info("Pipelined mode: %d feature classes waiting on %d days\n", len(pending), len(dayOrder))
+
+        # Days already available locally are ready, other days are downloaded by the producer threads
+        readyQueue = Queue.PriorityQueue()
+        messageQueue = Queue.Queue()
+        missingDays = []
+        getTool = getChloro()
+        for day in dayOrder:
+            if getTool.localDayExists(local_chloroFolder, day):
+                readyQueue.put((priority[day], day, self.localDayFile(local_chloroFolder, day)))
+            else:
+                missingDays.append(day)
+        arcpy.AddMessage(str(len(dayOrder) - len(missingDays)) + " days already available locally, " + str(len(missingDays)) + " days to download.")
+
+        downloadPool = chloroDownload.downloadPool(source, local_chloroFolder, sessionCount, cache=cache,
+                                                   journalPath=os.path.join(logPath, "chloro_transfers.jsonl"))
+        producer = threading.Thread(target=self.produceDays, name="chloroProducer",
+                                    args=(downloadPool, fileDir, missingDays, priority, readyQueue, messageQueue))
+        producer.daemon = True
+        producer.start()
+
+        # Consume ready days, highest priority first, until the producer is done and every ready day is applied
+        consumed = set()
+        while True:
+            while not messageQueue.empty():
+                arcpy.AddMessage(messageQueue.get())
+            try:
+                item = readyQueue.get(timeout=0.1)
+            except Queue.Empty:
+                if not producer.is_alive() and readyQueue.empty():
+                    break
+                continue
+            self.consumeDay(item, waiting, pending, consumed, chloroSR)
+        while not messageQueue.empty():
+            arcpy.AddMessage(messageQueue.get())
+
+        # Write feature classes still waiting on days that never became available
+        applyTool = applyChloro()
+        for values in pending.values():
+            applyTool.writeValues(values[0])
+            logging.info("Processing for '%s' feature class complete\n", values[0].fc)
+
+        arcpy.AddMessage("\nChlorophyll_a download and application complete.")
+        logging.info("streamChloro.py script finished\n\n")
+
+        return
+
+    def waitingDays(self, gdbList, cellSizes, dayRange, zonalMode, chloroSR):
+        """Prepare the feature classes requiring chlorophyll_a values and determine the days each one is waiting on.
+
+        Parameters:
+            gdbList = List of yearly dark targets GDBs.
+            cellSizes, dayRange, zonalMode, chloroSR = As for applyChloro.processFeatureClass.
+
+        Return:
+            Returns a dictionary of the (targetValues, day position) waiting on each day (YYYY/DDD), and a dictionary of
+            [targetValues, number of unresolved days] by feature class path."""
+        applyTool = applyChloro()
+        waiting = {}
+        pending = {}
+        for gdb in gdbList:
+            arcpy.env.workspace = gdb
+            logging.info("Processing '%s' geodatabase", gdb)
+            for fc in arcpy.ListFeatureClasses():
+                values = applyTool.prepareFeatureClass(os.path.join(gdb, fc), cellSizes, dayRange, zonalMode, chloroSR)
+                if values is None:
+                    continue
+                pending[values.fc] = [values, len(values.yDay)]
+                for dayIndex in range(len(values.yDay)):
+                    day = values.yDay[dayIndex][:4] + '/' + values.yDay[dayIndex][4:]
+                    waiting.setdefault(day, []).append((values, dayIndex))
+
+        return waiting, pending
+
+    def localDayFile(self, localChloro, day):
+        """Determine the local chlorophyll_a file of a day.
+
+        Parameters:
+            localChloro = The local folder directory, normally named "Chlorophyll", in which the chlorophyll_a data is downloaded.
+            day = Sub-directory string of the day (YYYY/DDD).
+
+        Return:
+            Returns the path of the .nc file of the day (the file may have been deleted once ingested into the regional store),
+            or None if it is not available locally."""
+        year, yDay = day.split('/')
+        localFolder = os.path.join(localChloro, year)
+        for fileName in chloroStore.listSources(localFolder):
+            if fileName.startswith("A" + year + yDay):
+                return os.path.join(localFolder, fileName)
+
+        return None
+
+    def produceDays(self, downloadPool, fileDir, missingDays, priority, readyQueue, messageQueue):
+        """Producer thread: plan and download the missing days, highest priority first, pushing each verified day onto the ready queue.
+        Days found valid locally while listing are pushed with their local file. Days without a file on the FTP server, or whose download
+        failed, are pushed without a file so their feature classes are resolved.
+
+        Parameters:
+            downloadPool = chloroDownload.downloadPool used for the downloads.
+            fileDir = Source directory pointing to daily chlorophyll_a data.
+            missingDays = Days (YYYY/DDD) to download, highest priority first.
+            priority = Dictionary of the priority of each day (0 for an acquisition day, 1 for a day at +/- 1, etc.).
+            readyQueue = Priority queue of (priority, day, .nc file path) ready to be applied.
+            messageQueue = Queue of progress messages relayed by the tool.
+
+        Return:
+            No return"""
+        def remoteDay(remoteDir):
+            return '/'.join(remoteDir.rstrip('/').split('/')[-2:])
+
+        def completed(localFilePath):
+            fileName = os.path.basename(localFilePath)
+            if fileName.endswith(".nc"):
+                day = fileName[1:5] + '/' + fileName[5:8]
+                readyQueue.put((priority[day], day, localFilePath))
+
+        try:
+            plannedFiles = downloadPool.plan([fileDir + day for day in missingDays], messageQueue.put)
+            plannedFiles.sort(key=lambda plannedFile: (priority[remoteDay(plannedFile[0])], plannedFile))
+            plannedDays = set([remoteDay(remoteDir) for remoteDir, fileName, size in plannedFiles if fileName.endswith(".nc")])
+            for day in missingDays:
+                if day not in plannedDays:
+                    readyQueue.put((priority[day], day, self.localDayFile(downloadPool.localChloro, day)))
+            totalBytes = sum([size for remoteDir, fileName, size in plannedFiles])
+            messageQueue.put("\n" + str(len(plannedFiles)) + " files to download (" + str(round(totalBytes / 1000000.0, 1)) + " MB).")
+            logging.info("Download plan: %d files to download (%d bytes)\n", len(plannedFiles), totalBytes)
+
+            downloaded, failed = downloadPool.download(plannedFiles, messageQueue.put, completed)
+            for remoteDir, fileName in failed:
+                if fileName is not None and fileName.endswith(".nc"):
+                    readyQueue.put((priority[remoteDay(remoteDir)], remoteDay(remoteDir), None))
+            messageQueue.put("\n" + str(len(downloaded)) + " files downloaded.")
+            logging.info("%d files downloaded, failed downloads: '%s'\n", len(downloaded), str(failed))
+            summary = downloadPool.summaryReport()
+            messageQueue.put("\n" + "\n".join(summary))
+            logging.info("%s\n", "\n".join(summary))
+        except Exception:
+            logging.exception("Download of chlorophyll_a files failed")
+            messageQueue.put("Download of chlorophyll_a files failed:\n" + traceback.format_exc())
+
+    def consumeDay(self, item, waiting, pending, consumed, chloroSR):
+        """Apply a ready day to every feature class waiting on it, and write the feature classes whose days are all resolved.
+        A day queued more than once is only applied the first time.
+
+        Parameters:
+            item = Tuple of (priority, day, .nc file path) taken from the ready queue. The file path is None if the day is unavailable.
+            waiting, pending = Dictionaries returned by waitingDays.
+            consumed = Set of the days already consumed, updated with the day.
+            chloroSR = Spatial reference of the chlorophyll_a rasters.
+
+        Return:
+            No return"""
+        applyTool = applyChloro()
+        dayPriority, day, ncFilePath = item
+        if day in consumed:
+            logging.info("Pipelined mode: day '%s' already applied, skipped", day)
+            return
+        consumed.add(day)
+        if ncFilePath is not None:
+            arcpy.AddMessage("\nApplying " + os.path.basename(ncFilePath) + " to " + str(len(waiting[day])) + " feature classes...")
+            chloroGrid = chloroStore.loadGrid(ncFilePath)
+            logging.info("Load Grid: regional chlorophyll_a values of '%s' loaded from store", ncFilePath)
+        else:
+            logging.info("Pipelined mode: day '%s' unavailable", day)
+
+        for values, dayIndex in waiting[day]:
+            if ncFilePath is not None:
+                applyTool.applyDay(values, dayIndex, chloroGrid, chloroSR)
+            pending[values.fc][1] -= 1
+            if pending[values.fc][1] == 0:
+                applyTool.writeValues(values)
+                del pending[values.fc]
+                arcpy.AddMessage("Values applied to " + values.fc)
+                logging.info("Processing for '%s' feature class complete\n", values.fc)
+        if ncFilePath is not None:
+            chloroGrid.close()
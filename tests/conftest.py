@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Test configuration: the modules of the toolbox are imported from the repository root."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
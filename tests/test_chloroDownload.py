@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Tests of the transfer journal and retry backoff of "chloroDownload.py" (no arcpy required)."""
+import json
+import os
+import random
+
+import pytest
+
+import chloroDownload
+
+
+class source(object):
+    name = "test source"
+    errors = (EOFError,)
+
+
+def downloadPool(tmpdir, **options):
+    return chloroDownload.downloadPool(source(), str(tmpdir), 2, journalPath=os.path.join(str(tmpdir), "journal.jsonl"), **options)
+
+
+@pytest.mark.parametrize("retryDelay, maxRetryDelay", [(5, 120), (1, 3), (0.5, 60)])
+def test_backoff_bounds(tmpdir, retryDelay, maxRetryDelay):
+    pool = downloadPool(tmpdir, retryDelay=retryDelay, maxRetryDelay=maxRetryDelay)
+    random.seed(0)
+    for tries in range(10):
+        bound = min(maxRetryDelay, retryDelay * 2 ** tries)
+        delays = [pool.backoff(tries) for i in range(200)]
+        assert all([0 <= delay <= bound for delay in delays])
+        # Full jitter: the delays are spread over the whole interval
+        assert min(delays) < bound * 0.1 and max(delays) > bound * 0.9
+
+
+def test_recordTransfer_journal(tmpdir):
+    pool = downloadPool(tmpdir)
+    pool.recordTransfer(("/sub/MODIS/L3SMI/2010/268/", "A2010268.L3m_DAY_CHL_chlor_a_4km.nc"),
+                        {"bytes": 2000, "source": "source", "offset": 500}, [("error_temp", "421 Timeout")], 4.0)
+    pool.recordTransfer(("/sub/MODIS/L3SMI/2010/269/", None), None, [("EOFError", ""), ("EOFError", "")], 0.0)
+
+    with open(pool.journalPath, 'r') as journal:
+        records = [json.loads(line) for line in journal]
+    assert records == pool.transfers
+    download, listing = records
+
+    assert download["kind"] == "download" and download["day"] == "2010/268" and download["status"] == "ok"
+    assert download["attempts"] == 2 and download["errorClasses"] == ["error_temp"]
+    assert download["bytes"] == 2000 and download["throughput"] == 500.0 and download["offset"] == 500
+    assert download["run"] == pool.runId
+
+    assert listing["kind"] == "list" and listing["day"] == "2010/269" and listing["file"] is None
+    assert listing["status"] == "failed" and listing["attempts"] == 2
+    assert listing["bytes"] == 0 and listing["throughput"] == 0.0
+
+    # Summary of the transfers of the run
+    report = "\n".join(pool.summaryReport())
+    assert "1 of 1 files transferred" in report
+    assert "EOFError = 2" in report and "error_temp = 1" in report
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Tests of "conditionCheckpoint.py" (no arcpy required)."""
+import os
+
+import conditionCheckpoint
+
+SIGNATURES = {"RS2_OK1001_PK1001_DK1001_SCWA_20100925_010203_HH_HV_SGF": {"hash": "aa"},
+              "RS2_OK1002_PK1002_DK1002_SCWA_20100925_010303_HH_HV_SGF": {"hash": "bb"},
+              "RS2_OK1003_PK1003_DK1003_SCWA_20100926_010203_HH_HV_SGF": {"hash": "cc"}}
+
+
+def test_fingerprint_depends_on_date_images_and_settings():
+    fingerprint = conditionCheckpoint.dateFingerprint("20100925", SIGNATURES)
+    assert fingerprint == conditionCheckpoint.dateFingerprint("20100925", dict(SIGNATURES))
+    assert fingerprint != conditionCheckpoint.dateFingerprint("20100925", SIGNATURES, ["PcontrDb < PcontrDb_1"])
+
+    # Changes to the images of another date do not affect the fingerprint
+    changed = dict(SIGNATURES)
+    changed["RS2_OK1003_PK1003_DK1003_SCWA_20100926_010203_HH_HV_SGF"] = {"hash": "dd"}
+    assert fingerprint == conditionCheckpoint.dateFingerprint("20100925", changed)
+    changed["RS2_OK1001_PK1001_DK1001_SCWA_20100925_010203_HH_HV_SGF"] = {"hash": "ee"}
+    assert fingerprint != conditionCheckpoint.dateFingerprint("20100925", changed)
+
+
+def test_checkpoints_round_trip(tmpdir):
+    gdbWorkspace = os.path.join(str(tmpdir), "2010.gdb")
+    checkpoints = conditionCheckpoint.loadCheckpoints(gdbWorkspace)
+    assert checkpoints == {}
+
+    fingerprints = {"20100925": "f1", "20100926": "f2"}
+    for stage in conditionCheckpoint.STAGES:
+        conditionCheckpoint.markComplete(gdbWorkspace, checkpoints, stage, ["20100925", "20100926"], fingerprints)
+    checkpoints = conditionCheckpoint.loadCheckpoints(gdbWorkspace)
+    assert conditionCheckpoint.isComplete(checkpoints, "evalAttributes", "20100926", "f2")
+    assert not conditionCheckpoint.isComplete(checkpoints, "evalAttributes", "20100926", "f1")
+
+    # A stage executed again invalidates the following stages of its date only
+    conditionCheckpoint.invalidate(checkpoints, "parseNoOverlap", "20100925")
+    assert sorted(checkpoints["20100925"]) == ["loadDarkTargets", "parseOverlap"]
+    assert len(checkpoints["20100926"]) == len(conditionCheckpoint.STAGES)
+
+    conditionCheckpoint.clearDates(gdbWorkspace, checkpoints, set(["20100925", "20100926"]))
+    assert not os.path.exists(conditionCheckpoint.checkpointPath(gdbWorkspace))
+
+
+def test_unreadable_checkpoints(tmpdir):
+    gdbWorkspace = os.path.join(str(tmpdir), "2010.gdb")
+    with open(conditionCheckpoint.checkpointPath(gdbWorkspace), 'w') as checkpointFile:
+        checkpointFile.write("{interrupted")
+    assert conditionCheckpoint.loadCheckpoints(gdbWorkspace) == {}
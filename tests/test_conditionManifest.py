@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Tests of the shapefile signature and change detection of "conditionManifest.py" (no arcpy required)."""
+import os
+
+import conditionManifest
+
+
+def imageFolder(tmpdir, name, content=b"shape", date="20100925"):
+    image = tmpdir.mkdir("RS2_OK1001_PK1001_DK1001_SCWA_" + date + "_" + name + "_HH_HV_SGF")
+    features = image.mkdir("Features")
+    for extension in (".shp", ".shx", ".dbf"):
+        features.join("targets" + extension).write_binary(content + extension.encode("ascii"))
+    return str(image)
+
+
+def test_shapefileSignature(tmpdir):
+    image = imageFolder(tmpdir, "010203")
+    signature = conditionManifest.shapefileSignature(image)
+    assert signature["shapefile"] == "targets.shp"
+    assert signature["size"] == 3 * len(b"shape.shp")
+    assert len(signature["hash"]) == 32
+    assert conditionManifest.shapefileSignature(image) == signature
+
+
+def test_shapefileSignature_reuses_previous_hash(tmpdir):
+    image = imageFolder(tmpdir, "010203")
+    signature = conditionManifest.shapefileSignature(image)
+    # Same name, size and mtime: the recorded digest is kept without reading the files
+    previous = dict(signature, hash="recorded")
+    assert conditionManifest.shapefileSignature(image, previous)["hash"] == "recorded"
+    previous = dict(signature, hash="recorded", size=signature["size"] + 1)
+    assert conditionManifest.shapefileSignature(image, previous)["hash"] == signature["hash"]
+
+
+def test_shapefileSignature_no_shapefile(tmpdir):
+    image = tmpdir.mkdir("RS2_OK1001_PK1001_DK1001_SCWA_20100925_010203_HH_HV_SGF")
+    assert conditionManifest.shapefileSignature(str(image)) is None
+    image.mkdir("Features")
+    assert conditionManifest.shapefileSignature(str(image)) is None
+
+
+def test_changedImages(tmpdir):
+    first = imageFolder(tmpdir, "010203")
+    second = imageFolder(tmpdir, "040506", date="20100926")
+    manifest = {"images": {}, "dates": {}}
+
+    changed, removed, signatures, dates = conditionManifest.changedImages(manifest, [first, second])
+    assert changed == [first, second]
+    assert removed == []
+    assert dates == set(["20100925", "20100926"])
+
+    # Unchanged images are skipped
+    manifest["images"] = signatures
+    changed, removed, signatures, dates = conditionManifest.changedImages(manifest, [first, second])
+    assert changed == [] and removed == [] and dates == set()
+
+    # A changed shapefile and a removed image condition their dates again
+    shpPath = os.path.join(second, "Features", "targets.shp")
+    with open(shpPath, 'wb') as shapeFile:
+        shapeFile.write(b"changed shape")
+    changed, removed, signatures, dates = conditionManifest.changedImages(manifest, [second])
+    assert changed == [second]
+    assert removed == [os.path.basename(first)]
+    assert dates == set(["20100925", "20100926"])
+    assert list(signatures) == [os.path.basename(second)]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""Tests of the overlapping dark targets grouping of "overlapGroups.py" (no arcpy required)."""
+import overlapGroups
+
+
+def test_targetGroups_chains():
+    # a overlaps b, b overlaps c (three frames): a single group; d/e form a second group
+    a, b, c = ("RS2_20100925_010203", 1), ("RS2_20100925_010303", 4), ("RS2_20100925_010403", 2)
+    d, e = ("RS2_20100925_010203", 7), ("RS2_20100925_010303", 9)
+    groups = overlapGroups.targetGroups([(a, b), (d, e), (b, c)])
+    assert [sorted(group) for group in groups] == [sorted([a, b, c]), sorted([d, e])]
+
+
+def test_targetGroups_merges_groups():
+    # Two groups joined by a later pair, repeated pairs counted once
+    pairs = [(1, 2), (3, 4), (2, 1), (5, 6), (4, 2), (6, 7)]
+    groups = overlapGroups.targetGroups(pairs)
+    assert [sorted(group) for group in groups] == [[1, 2, 3, 4], [5, 6, 7]]
+    assert sum([len(group) for group in groups]) == 7
+
+
+def test_targetGroups_long_chain():
+    pairs = [(i, i + 1) for i in range(2000)]
+    groups = overlapGroups.targetGroups(pairs[::-1])
+    assert len(groups) == 1
+    assert sorted(groups[0]) == list(range(2001))
+
+
+def test_targetGroups_empty():
+    assert overlapGroups.targetGroups([]) == []
+
+
+def test_combinedTargetID():
+    assert overlapGroups.combinedTargetID(["12_20100925_010203", "7_20100925_010303"]) == "12_7_20100925_010203_010303"
+    assert overlapGroups.combinedTargetID(["3_20100925_010203", "5_20100925_010303", "8_20100925_010403"]) == \
+        "3_5_8_20100925_010203_010303_010403"
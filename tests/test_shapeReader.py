@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Tests of "shapeReader.py" on a synthetic polygon shapefile (no arcpy required)."""
+import os
+import struct
+
+import pytest
+
+from shapeReader import shapeReader
+
+# .dbf fields: (name, type, length, decimals)
+FIELDS = [("Pid", 'N', 9, 0), ("RsatID", 'C', 20, 0), ("area", 'N', 12, 3)]
+
+
+def polygonContent(rings):
+    """Content of a polygon shape record (shape type 5) with the given rings of (x, y) points."""
+    points = [point for ring in rings for point in ring]
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    parts = []
+    for ring in rings:
+        parts.append(sum([len(previous) for previous in rings[:len(parts)]]))
+    content = struct.pack("<i4d2i", 5, min(xs), min(ys), max(xs), max(ys), len(rings), len(points))
+    content += struct.pack("<" + str(len(parts)) + "i", *parts)
+    for x, y in points:
+        content += struct.pack("<2d", x, y)
+
+    return content
+
+
+def writeShapefile(folder, records, writeIndex=True):
+    """Write a polygon shapefile of (deleted, values, rings) records; a record without rings is a null shape."""
+    basePath = os.path.join(str(folder), "RS2_OK1001_PK1001_DK1001_SCWA_20100925_010203_HH_HV_SGF")
+    contents = [polygonContent(rings) if rings else struct.pack("<i", 0) for deleted, values, rings in records]
+
+    # .shp and .shx files: 100 byte header, then the records (lengths and offsets in 16-bit words)
+    shpLength = 100 + sum([8 + len(content) for content in contents])
+    header = struct.pack(">7i", 9994, 0, 0, 0, 0, 0, shpLength // 2) + struct.pack("<2i4d4d", 1000, 5, 0, 0, 0, 0, 0, 0, 0, 0)
+    offset = 100
+    shp = [header]
+    shx = [header[:24] + struct.pack(">i", (100 + 8 * len(records)) // 2) + header[28:]]
+    for number, content in enumerate(contents):
+        shp.append(struct.pack(">2i", number + 1, len(content) // 2) + content)
+        shx.append(struct.pack(">2i", offset // 2, len(content) // 2))
+        offset += 8 + len(content)
+    with open(basePath + ".shp", 'wb') as shpFile:
+        shpFile.write(b"".join(shp))
+    if writeIndex:
+        with open(basePath + ".shx", 'wb') as shxFile:
+            shxFile.write(b"".join(shx))
+
+    # .dbf file: header, 32 byte descriptor per field, terminator, then fixed length records
+    recordLength = 1 + sum([field[2] for field in FIELDS])
+    headerLength = 32 + 32 * len(FIELDS) + 1
+    dbf = [struct.pack("<B3BIHH20x", 3, 110, 9, 25, len(records), headerLength, recordLength)]
+    for name, fieldType, length, decimals in FIELDS:
+        dbf.append(struct.pack("<11sc4xBB14x", name.encode("ascii"), fieldType.encode("ascii"), length, decimals))
+    dbf.append(b'\r')
+    for deleted, values, rings in records:
+        dbf.append(b'*' if deleted else b' ')
+        for (name, fieldType, length, decimals), value in zip(FIELDS, values):
+            if value is None:
+                text = " " * length
+            elif fieldType == 'N':
+                text = ("%." + str(decimals) + "f") % value if decimals > 0 else str(value)
+                text = text.rjust(length)
+            else:
+                text = value.ljust(length)
+            dbf.append(text.encode("ascii"))
+    dbf.append(b'\x1a')
+    with open(basePath + ".dbf", 'wb') as dbfFile:
+        dbfFile.write(b"".join(dbf))
+
+    return basePath + ".shp"
+
+
+BACKGROUND = [[(0.0, 0.0), (0.0, 100.0), (100.0, 100.0), (100.0, 0.0), (0.0, 0.0)]]
+TARGET = [[(1.0, 1.0), (1.0, 3.0), (3.0, 3.0), (3.0, 1.0), (1.0, 1.0)],
+          [(1.5, 1.5), (2.5, 1.5), (2.5, 2.5), (1.5, 2.5), (1.5, 1.5)]]
+SMALL = [[(10.0, 10.0), (10.0, 11.0), (11.0, 11.0), (10.0, 10.0)]]
+RECORDS = [(False, (1, "background", 10000.0), BACKGROUND),
+           (False, (2, "target", 3.75), TARGET),
+           (True, (3, "deleted", 1.0), SMALL),
+           (False, (4, None, None), SMALL),
+           (False, (5, "null shape", 0.0), None)]
+
+
+def flatten(ring):
+    return [coordinate for point in ring for coordinate in point]
+
+
+@pytest.mark.parametrize("writeIndex", [True, False])
+def test_records_skip_background(tmpdir, writeIndex):
+    shpPath = writeShapefile(tmpdir, RECORDS, writeIndex)
+    with shapeReader(shpPath) as reader:
+        assert reader.fieldNames == ["Pid", "RsatID", "area"]
+        records = list(reader.records("Pid", 1))
+
+    # Background (Pid = 1) and deleted records are skipped
+    assert [record[0] for record in records] == [2, 4, 5]
+    pid, attributes, rings = records[0]
+    assert attributes == (2, "target", 3.75)
+    assert [list(ring) for ring in rings] == [flatten(ring) for ring in TARGET]
+    assert records[1][1] == (4, "", None)
+    assert [list(ring) for ring in records[1][2]] == [flatten(SMALL[0])]
+    assert records[2][2] == []
+
+
+def test_records_keep_background(tmpdir):
+    shpPath = writeShapefile(tmpdir, RECORDS)
+    with shapeReader(shpPath) as reader:
+        records = list(reader.records("Pid", None))
+
+    assert [record[0] for record in records] == [1, 2, 4, 5]
+    assert [list(ring) for ring in records[0][2]] == [flatten(BACKGROUND[0])]
+
+
+def test_background_geometry_not_read(tmpdir):
+    # A corrupted background geometry is never decoded
+    shpPath = writeShapefile(tmpdir, RECORDS)
+    with open(shpPath, 'r+b') as shpFile:
+        shpFile.seek(100 + 8)
+        shpFile.write(struct.pack("<i", 5) + b'\xff' * 40 + struct.pack("<2i", 2 ** 30, 2 ** 30))
+    with shapeReader(shpPath) as reader:
+        assert [record[0] for record in reader.records("Pid", 1)] == [2, 4, 5]
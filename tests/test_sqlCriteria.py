@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Tests of the attribute evaluation criteria of "sqlCriteria.py" (no arcpy required)."""
+import numpy
+import pytest
+
+import sqlCriteria
+
+NAN = float("nan")
+
+
+def select(where_clause, first, second):
+    return sqlCriteria.criteriaFunction(where_clause)(first, second)
+
+
+def selectColumns(where_clause, first, second):
+    rowCount = len(list(first.values())[0])
+    columns = [dict([(name, numpy.array(values, dtype=float if name != "Name" else object)) for name, values in values.items()])
+               for values in (first, second)]
+    return list(sqlCriteria.vectorCriteria(where_clause)(columns[0], columns[1], rowCount))
+
+
+@pytest.mark.parametrize("where_clause, expected", [
+    ("PcontrDb < PcontrDb_1", True),
+    ("PcontrDb > PcontrDb_1", False),
+    ("PcontrDb = 3", True),
+    ("PcontrDb <> 3", False),
+    ("PcontrDb != PcontrDb_1", True),
+    ("PcontrDb <= 3 AND PcontrDb_1 >= 5", True),
+    ("\"PcontrDb\" * 2 - 1 = 5", True),
+    ("(PcontrDb + PcontrDb_1) / 2 = 4", True),
+    ("pcontrdb < 0 or PcontrDb > PcontrDb_1", False),
+    ("pcontrdb < 0 or PcontrDb < PcontrDb_1", True),
+])
+def test_comparisons(where_clause, expected):
+    assert select(where_clause, {"PcontrDb": 3, "pcontrdb": 1}, {"PcontrDb": 5}) == expected
+
+
+@pytest.mark.parametrize("null", [None, NAN])
+@pytest.mark.parametrize("where_clause, expected", [
+    # Unknown conditions are not selected, and NOT of an unknown condition is unknown
+    ("PcontrDb < PcontrDb_1", False),
+    ("NOT PcontrDb < PcontrDb_1", False),
+    ("PcontrDb = NULL", False),
+    # AND and OR are decided by their known operand
+    ("PcontrDb < PcontrDb_1 OR 1 = 1", True),
+    ("PcontrDb < PcontrDb_1 AND 1 = 1", False),
+    ("NOT (PcontrDb < PcontrDb_1 AND 1 = 0)", True),
+    ("NOT (PcontrDb < PcontrDb_1 OR 1 = 0)", False),
+    ("PcontrDb IS NULL", True),
+    ("PcontrDb IS NOT NULL", False),
+    ("NOT PcontrDb IS NULL", False),
+    ("PcontrDb_1 IS NOT NULL", True),
+])
+def test_null_values(null, where_clause, expected):
+    assert select(where_clause, {"PcontrDb": null}, {"PcontrDb": 5}) == expected
+
+
+def test_vector_criteria_null_values():
+    first = {"PcontrDb": [1, NAN, 7, NAN], "Name": ["a", None, "c", "d"]}
+    second = {"PcontrDb": [2, 2, NAN, NAN], "Name": ["b", "b", None, None]}
+    assert selectColumns("PcontrDb < PcontrDb_1", first, second) == [True, False, False, False]
+    assert selectColumns("NOT PcontrDb < PcontrDb_1", first, second) == [False, False, False, False]
+    assert selectColumns("PcontrDb < PcontrDb_1 OR PcontrDb IS NULL", first, second) == [True, True, False, True]
+    assert selectColumns("Name IS NULL OR Name_1 IS NULL", first, second) == [False, True, True, True]
+    assert selectColumns("Name <> Name_1 AND PcontrDb_1 IS NOT NULL", first, second) == [True, False, False, False]
+
+
+def test_single_and_vector_criteria_agree():
+    # The row selected by the vectorized criteria is the one selected for each pair of dark targets
+    first = {"PcontrDb": [1, NAN, 7, 3, NAN]}
+    second = {"PcontrDb": [2, 2, NAN, 3, NAN]}
+    for where_clause in ("PcontrDb < PcontrDb_1", "PcontrDb <= PcontrDb_1 OR PcontrDb_1 IS NULL", "NOT PcontrDb > PcontrDb_1"):
+        selected = selectColumns(where_clause, first, second)
+        for i in range(5):
+            assert select(where_clause, {"PcontrDb": first["PcontrDb"][i]}, {"PcontrDb": second["PcontrDb"][i]}) == selected[i]
+
+
+@pytest.mark.parametrize("where_clause, expected", [
+    ("Name = 'A and B is None'", True),
+    ("Name = 'NULL'", False),
+    ("Name_1 = 'it''s IS NOT NULL'", True),
+    ("Name <> 'OR' AND Name_1 <> 'NOT'", True),
+])
+def test_string_literals_with_keywords(where_clause, expected):
+    assert select(where_clause, {"Name": "A and B is None"}, {"Name": "it's IS NOT NULL"}) == expected
+
+
+@pytest.mark.parametrize("where_clause, expected", [("1 = 1", True), ("1 = 0", False), ("2 * 3 > 5", True), ("NULL IS NULL", True),
+                                                    ("'a' = 'a'", True), ("NULL = NULL", False)])
+def test_constant_expressions(where_clause, expected):
+    assert select(where_clause, {"PcontrDb": 3}, {"PcontrDb": 5}) == expected
+    assert selectColumns(where_clause, {"PcontrDb": [3, 4, NAN]}, {"PcontrDb": [5, 1, 2]}) == [expected] * 3
+
+
+@pytest.mark.parametrize("where_clause", [
+    "Name LIKE 'a%'",
+    "PcontrDb IN (1, 2)",
+    "PcontrDb BETWEEN 1 AND 2",
+    "PcontrDb IS 3",
+    "PcontrDb < PcontrDb_1 < 3",
+    "PcontrDb (3)",
+    "PcontrDb = 3;",
+    "PcontrDb <",
+    "ABS(PcontrDb) > 1",
+])
+def test_unsupported_criteria(where_clause):
+    with pytest.raises(ValueError):
+        sqlCriteria.criteriaCode(where_clause)
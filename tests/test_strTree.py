@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Tests of "strTree.py" against a brute-force comparison of every pair of boxes."""
+import random
+
+import pytest
+
+from strTree import strTree, intersectingPairs, selfPairs
+
+
+def randomBoxes(generator, count, prefix):
+    """Random boxes on an integer grid, so that touching boxes are frequent."""
+    boxes = []
+    for i in range(count):
+        x = generator.randint(0, 50)
+        y = generator.randint(0, 50)
+        boxes.append((x, y, x + generator.randint(0, 6), y + generator.randint(0, 6), prefix + str(i)))
+
+    return boxes
+
+
+def intersects(a, b):
+    return not (a[0] > b[2] or a[2] < b[0] or a[1] > b[3] or a[3] < b[1])
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("nodeCapacity", [2, 4, 8])
+def test_intersectingPairs(seed, nodeCapacity):
+    generator = random.Random(seed)
+    itemsA = randomBoxes(generator, generator.randint(0, 60), "a")
+    itemsB = randomBoxes(generator, generator.randint(0, 120), "b")
+
+    expected = sorted([(a[4], b[4]) for a in itemsA for b in itemsB if intersects(a, b)])
+    assert sorted(intersectingPairs(itemsA, itemsB, nodeCapacity)) == expected
+    # The smaller list is queried against the tree of the larger one, the pairs keep the order of the arguments
+    assert sorted(intersectingPairs(itemsB, itemsA, nodeCapacity)) == sorted([(b, a) for a, b in expected])
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("nodeCapacity", [2, 4, 8])
+def test_selfPairs(seed, nodeCapacity):
+    generator = random.Random(seed)
+    items = randomBoxes(generator, generator.randint(0, 150), "")
+
+    expected = [(i, j) for i in range(len(items)) for j in range(i + 1, len(items)) if intersects(items[i], items[j])]
+    assert selfPairs(items, nodeCapacity) == expected
+
+
+def test_touching_boxes():
+    items = [(0, 0, 1, 1, "a"), (1, 1, 2, 2, "b"), (2.5, 0, 3, 1, "c")]
+    assert selfPairs(items) == [(0, 1)]
+    assert strTree([]).query(0, 0, 1, 1) == []
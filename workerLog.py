@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#==============================================================================#
+# HISTORY                                                                      #
+# -------                                                                      #
+# Developed for the GEM2 dark targets conditioning tools, 2017.                #
+#==============================================================================#
+"""USAGE
+Module imported and used by the "loadDarkTargets.py" and "applyChloro.py" scripts
+to log the worker processes of their parallel mode.
+
+SUMMARY
+Each worker process writes its own log file ("<prefix>_worker_<pid>.log"), beside
+the log of the tool ("<prefix>.log", e.g. "conditionData.log" or "chloro.log").
+Once every worker is finished, the worker logs are appended to the log of the tool
+and deleted.
+
+INPUT
+- Log Folder (automated input): Folder containing the log of the tool.
+
+- Log Prefix (automated input): Name of the log of the tool, without extension.
+
+OUTPUT
+- Worker Logs (automated output): Log file of each worker process, merged into the
+log of the tool.
+
+ADDITIONAL FUNCTIONS (explained in script below)
+- initWorkerLog
+- mergeWorkerLogs"""
+
+# Libraries
+# =========
+import os
+import glob
+import logging
+
+
+def initWorkerLog(logPath, logPrefix):
+    """Initialize the log of a worker process (parallel mode), replacing the handlers inherited from the tool.
+
+    Parameters:
+        logPath = Folder in which the worker log is written (merged into "<logPrefix>.log" once every worker is finished).
+        logPrefix = Name of the log of the tool, without extension (e.g. "conditionData").
+
+    Return:
+        Returns the name of the worker ("worker_<pid>")."""
+    workerName = "worker_" + str(os.getpid())
+    rootLogger = logging.getLogger()
+    for handler in list(rootLogger.handlers):
+        rootLogger.removeHandler(handler)
+    logging.basicConfig(filename=os.path.join(logPath, logPrefix + "_" + workerName + ".log"), format='%(asctime)s -- %(message)s', datefmt='%d/%m/%Y %H:%M:%S', level=logging.INFO)
+
+    return workerName
+
+
+def mergeWorkerLogs(logPath, logPrefix):
+    """Append the logs written by the worker processes to the log of the tool (through its open log handler) and delete them.
+
+    Parameters:
+        logPath = Folder containing the log of the tool and the worker logs.
+        logPrefix = Name of the log of the tool, without extension (e.g. "conditionData").
+
+    Return:
+        No return"""
+    logFile = os.path.abspath(os.path.join(logPath, logPrefix + ".log"))
+    handlers = [handler for handler in logging.getLogger().handlers
+                if isinstance(handler, logging.FileHandler) and handler.baseFilename == logFile]
+    for workerLog in sorted(glob.glob(os.path.join(logPath, logPrefix + "_worker_*.log"))):
+        with open(workerLog, 'r') as workerFile:
+            content = "---- " + os.path.basename(workerLog) + " ----\n" + workerFile.read()
+        if len(handlers) > 0:
+            handlers[0].acquire()
+            try:
+                handlers[0].stream.write(content)
+                handlers[0].flush()
+            finally:
+                handlers[0].release()
+        else:
+            with open(logFile, 'a') as mainLog:
+                mainLog.write(content)
+        os.remove(workerLog)
\ No newline at end of file